@@ -0,0 +1,11 @@
+# __main__.py
+
+import sys
+from pathlib import Path
+
+# Modules in this folder import each other by bare name, as they do when main.py is run directly
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from cp_cli import main
+
+sys.exit(main())
@@ -0,0 +1,272 @@
+# cp_analytics.py
+
+"""
+Latency and throughput statistics per model and per prompt.
+
+Runs are folded into streaming quantile sketches (relative-error log buckets, as in
+DDSketch), so p50/p95/p99 are within 1% of the exact value and memory does not grow with
+the number of runs. Rolling windows keep one set of sketches per time bucket: minutes for
+the last hour, hours for the last week, plus an all-time total.
+
+    analytics = RunAnalytics.from_history(history)
+    for row in analytics.summary(DIMENSION_MODEL, "24h"):
+        print(row.key, row.latency_p95, row.tokens_per_second)
+"""
+
+from dataclasses import dataclass, asdict, fields
+from typing import Iterable, Optional, TextIO
+import csv
+import json
+import math
+import threading
+import time
+import logging
+
+# Logger Configuration
+logger = logging.getLogger(__name__)
+
+DIMENSION_MODEL = "model"
+DIMENSION_PROMPT = "prompt"
+DIMENSIONS = (DIMENSION_MODEL, DIMENSION_PROMPT)
+
+WINDOW_ALL = "all"
+WINDOWS = {"1h": 3600, "24h": 86400, "7d": 7 * 86400, WINDOW_ALL: None}  # name -> seconds
+
+DEFAULT_RELATIVE_ACCURACY = 0.01
+
+# (bucket seconds, retention seconds); a window uses the finest tier that covers it
+_TIERS = ((60, 3600), (3600, 7 * 86400))
+
+
+class QuantileSketch:
+    """
+    Quantiles of positive values with bounded relative error. Values are counted in
+    logarithmic buckets, so a sketch holds at most a few hundred counters for anything
+    from milliseconds to hours.
+    """
+    __slots__ = ("relative_accuracy", "_log_gamma", "bins", "zero_count", "count")
+
+    def __init__(self, relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self._log_gamma = math.log((1 + relative_accuracy) / (1 - relative_accuracy))
+        self.bins: dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def add(self, value: float):
+        self.count += 1
+        if value <= 0:
+            self.zero_count += 1
+            return
+        index = math.ceil(math.log(value) / self._log_gamma)
+        self.bins[index] = self.bins.get(index, 0) + 1
+
+    def merge(self, other: "QuantileSketch"):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches with different accuracy")
+        for index, count in other.bins.items():
+            self.bins[index] = self.bins.get(index, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Value at quantile ``q`` (0..1), None for an empty sketch."""
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if rank < seen:
+                # Midpoint of the bucket (gamma^(i-1), gamma^i], within the relative accuracy
+                return 2 * math.exp(index * self._log_gamma) / (1 + math.exp(self._log_gamma))
+        return 2 * math.exp(max(self.bins) * self._log_gamma) / (1 + math.exp(self._log_gamma))
+
+
+class GroupStats:
+    """Aggregates for one model or prompt over one time bucket."""
+    __slots__ = ("runs", "errors", "latency", "ttft", "throughput", "completion_tokens", "generation_seconds")
+
+    def __init__(self):
+        self.runs = 0
+        self.errors = 0
+        self.latency = QuantileSketch()
+        self.ttft = QuantileSketch()
+        self.throughput = QuantileSketch()  # completion tokens per second of each run
+        self.completion_tokens = 0
+        self.generation_seconds = 0.0
+
+    def add(self, ok: bool, latency: Optional[float], ttft: Optional[float], completion_tokens: Optional[int]):
+        self.runs += 1
+        if not ok:
+            self.errors += 1
+            return  # failed calls would skew latency and throughput
+        if latency is not None:
+            self.latency.add(latency)
+        if ttft is not None:
+            self.ttft.add(ttft)
+        if completion_tokens and latency:
+            self.throughput.add(completion_tokens / latency)
+            self.completion_tokens += completion_tokens
+            self.generation_seconds += latency
+
+    def merge(self, other: "GroupStats"):
+        self.runs += other.runs
+        self.errors += other.errors
+        self.latency.merge(other.latency)
+        self.ttft.merge(other.ttft)
+        self.throughput.merge(other.throughput)
+        self.completion_tokens += other.completion_tokens
+        self.generation_seconds += other.generation_seconds
+
+
+class _RollingStats:
+    """GroupStats per time bucket, dropping buckets older than the retention."""
+    __slots__ = ("bucket_seconds", "retention", "buckets")
+
+    def __init__(self, bucket_seconds: int, retention: int):
+        self.bucket_seconds = bucket_seconds
+        self.retention = retention
+        self.buckets: dict[int, GroupStats] = {}
+
+    def bucket(self, created: float) -> Optional[GroupStats]:
+        start = int(created // self.bucket_seconds) * self.bucket_seconds
+        stats = self.buckets.get(start)
+        if stats is None:
+            oldest = start - self.retention
+            if self.buckets and min(self.buckets) < oldest:
+                self.buckets = {key: value for key, value in self.buckets.items() if key >= oldest}
+            if self.buckets and start < max(self.buckets) - self.retention:
+                return None  # older than anything kept
+            stats = self.buckets[start] = GroupStats()
+        return stats
+
+    def merged(self, since: float) -> GroupStats:
+        total = GroupStats()
+        first = int(since // self.bucket_seconds) * self.bucket_seconds
+        for start, stats in self.buckets.items():
+            if start >= first:
+                total.merge(stats)
+        return total
+
+
+class _KeyStats:
+    __slots__ = ("tiers", "total")
+
+    def __init__(self):
+        self.tiers = [_RollingStats(bucket_seconds, retention) for bucket_seconds, retention in _TIERS]
+        self.total = GroupStats()
+
+
+@dataclass
+class AnalyticsRow:
+    key: str
+    runs: int
+    errors: int
+    error_rate: float
+    latency_p50: Optional[float]
+    latency_p95: Optional[float]
+    latency_p99: Optional[float]
+    ttft_p50: Optional[float]
+    ttft_p95: Optional[float]
+    tokens_per_second: Optional[float]      # completion tokens over generation time, all runs
+    tokens_per_second_p50: Optional[float]  # median of the per-run rate
+
+    @classmethod
+    def from_stats(cls, key: str, stats: GroupStats) -> "AnalyticsRow":
+        return cls(
+            key=key, runs=stats.runs, errors=stats.errors,
+            error_rate=stats.errors / stats.runs if stats.runs else 0.0,
+            latency_p50=stats.latency.quantile(0.50),
+            latency_p95=stats.latency.quantile(0.95),
+            latency_p99=stats.latency.quantile(0.99),
+            ttft_p50=stats.ttft.quantile(0.50),
+            ttft_p95=stats.ttft.quantile(0.95),
+            tokens_per_second=(stats.completion_tokens / stats.generation_seconds
+                               if stats.generation_seconds else None),
+            tokens_per_second_p50=stats.throughput.quantile(0.50),
+        )
+
+
+ROW_FIELDS = [f.name for f in fields(AnalyticsRow)]
+
+
+class RunAnalytics:
+    """Thread safe; runs can be added live while summaries are read."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: dict[tuple[str, str], _KeyStats] = {}
+
+    @classmethod
+    def from_history(cls, history) -> "RunAnalytics":
+        """Fold every run of a cp_history.RunHistory, streamed in chunks."""
+        analytics = cls()
+        for record in history.iter_runs():
+            analytics.add_record(record)
+        return analytics
+
+    def add_record(self, record):
+        """Add a cp_history.RunRecord."""
+        from cp_history import STATUS_OK
+        self.add(record.created, record.model, record.prompt_name, record.status == STATUS_OK,
+                 record.latency, record.ttft, record.completion_tokens)
+
+    def add(self, created: float, model: str, prompt_name: str, ok: bool = True, latency: Optional[float] = None,
+            ttft: Optional[float] = None, completion_tokens: Optional[int] = None):
+        with self._lock:
+            for key in ((DIMENSION_MODEL, model), (DIMENSION_PROMPT, prompt_name)):
+                key_stats = self._stats.get(key)
+                if key_stats is None:
+                    key_stats = self._stats[key] = _KeyStats()
+                key_stats.total.add(ok, latency, ttft, completion_tokens)
+                for tier in key_stats.tiers:
+                    stats = tier.bucket(created)
+                    if stats is not None:
+                        stats.add(ok, latency, ttft, completion_tokens)
+
+    def keys(self, dimension: str) -> list[str]:
+        with self._lock:
+            return sorted(key for dim, key in self._stats if dim == dimension)
+
+    def summary(self, dimension: str = DIMENSION_MODEL, window: str = WINDOW_ALL,
+                now: Optional[float] = None) -> list[AnalyticsRow]:
+        """One row per model or prompt with runs in the window, busiest first."""
+        if dimension not in DIMENSIONS:
+            raise ValueError(f"Unknown dimension '{dimension}', expected one of {', '.join(DIMENSIONS)}")
+        if window not in WINDOWS:
+            raise ValueError(f"Unknown window '{window}', expected one of {', '.join(WINDOWS)}")
+        seconds = WINDOWS[window]
+        since = (time.time() if now is None else now) - seconds if seconds else None
+
+        rows = []
+        with self._lock:
+            for (dim, key), key_stats in self._stats.items():
+                if dim != dimension:
+                    continue
+                if since is None:
+                    stats = key_stats.total
+                else:
+                    tier = next(t for t in key_stats.tiers if t.retention >= seconds)
+                    stats = tier.merged(since)
+                if stats.runs:
+                    rows.append(AnalyticsRow.from_stats(key, stats))
+        rows.sort(key=lambda row: (-row.runs, row.key))
+        return rows
+
+
+def export_csv(rows: Iterable[AnalyticsRow], file: TextIO):
+    writer = csv.DictWriter(file, fieldnames=ROW_FIELDS)
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(asdict(row))
+
+
+def export_json(rows: Iterable[AnalyticsRow], file: TextIO):
+    json.dump([asdict(row) for row in rows], file, indent=4)
+    file.write("\n")
+
+
+def format_seconds(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:.2f}"
@@ -0,0 +1,153 @@
+# cp_async.py
+
+"""
+asyncio API for running library prompts::
+
+    async with AsyncPromptExecutor(library, api_key, max_concurrency=16) as executor:
+        result = await executor.run("Summarize", {"topic": "AI"}, model="venice-uncensored")
+        results = await asyncio.gather(*(executor.run("Summarize", {"topic": t}) for t in topics))
+
+Prompts resolve exactly like the editor and the command line (includes, system prompts,
+attributes, layout). WrapAI's clients are synchronous, so model calls run on one shared pool
+of ``max_concurrency`` threads; any number of coroutines can await ``run`` and wait on a
+semaphore instead of holding a thread.
+
+Identical runs (same prompt, values and model) awaited at the same time share one call;
+the duplicates do not take a slot. Cancelling one of them only detaches that caller: the
+call goes on for the others and is cancelled only when every caller has cancelled.
+
+Cancelling a ``run`` that is still waiting frees its slot immediately. A call already sent
+cannot be interrupted; its response is discarded when it arrives.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Iterable, Optional
+import asyncio
+import json
+import time
+import logging
+
+# Logger Configuration
+logger = logging.getLogger(__name__)
+
+from cp_core import DEFAULT_AI_MODEL, PROMPT_TYPE_QUESTION
+from cp_history import prompt_version
+from cp_render import RunSettings, resolve_run_settings, render_prompt_text, strip_output_placeholders, missing_values
+from cp_runner import ResponseCall, api_response_call
+
+DEFAULT_MAX_CONCURRENCY = 8
+
+
+@dataclass
+class PromptResult:
+    prompt: str
+    text: str
+    model: str
+    seconds: float
+
+
+class _SharedRun:
+    __slots__ = ("task", "callers")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.callers = 0
+
+
+class AsyncPromptExecutor:
+    def __init__(self, library, api_key: Optional[str] = None, model: str = DEFAULT_AI_MODEL,
+                 max_concurrency: int = DEFAULT_MAX_CONCURRENCY, call: Optional[ResponseCall] = None,
+                 history=None, coalesce: bool = True):
+        if call is None and not api_key:
+            raise ValueError("An API key or a call function is required")
+        self.library = library
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.call = call or api_response_call(api_key, coalesce)
+        self.history = history  # cp_history.RunHistory, every call is recorded when set
+        self.coalesce = coalesce
+        self.coalesced = 0  # runs answered by another run's call
+        self._in_flight: dict[tuple, _SharedRun] = {}
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="prompt")
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def __aenter__(self) -> "AsyncPromptExecutor":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Stop accepting calls. Calls already sent finish on their threads."""
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def prepare(self, prompt_name: str) -> RunSettings:
+        """Resolve a prompt on the event loop thread, where the library is read."""
+        return resolve_run_settings(self.library.prompts, prompt_name, self.library.includes)
+
+    def _render_and_call(self, prompt_name: str, version: str, settings: RunSettings, values: dict, model: str) -> str:
+        # File placeholders are extracted here, off the event loop
+        prompt_text = strip_output_placeholders(settings.prompt_text)
+        missing = missing_values(prompt_text, values)
+        if missing:
+            logger.warning(f"No value supplied for placeholders: {', '.join(missing)}")
+        settings.prompt_text = render_prompt_text(prompt_text, values, layout=settings.layout)
+        if self.history is not None:
+            response, _ = self.history.record_call(prompt_name, version, model, PROMPT_TYPE_QUESTION, settings,
+                                                   self.call)
+        else:
+            response, _ = self.call(settings, model)
+        return response.response
+
+    async def run(self, prompt_name: str, values: Optional[dict] = None, model: Optional[str] = None) -> PromptResult:
+        """
+        Render and send one prompt. Raises KeyError / ValueError for prompts that cannot be
+        run and passes on errors from the model call; asyncio.CancelledError when cancelled.
+        Runs sharing a call get the same PromptResult.
+        """
+        settings = self.prepare(prompt_name)
+        version = prompt_version(self.library.prompts[prompt_name])
+        model = model or self.model
+        values = dict(values or {})
+        if not self.coalesce:
+            return await self._send(prompt_name, version, settings, values, model)
+
+        key = (prompt_name, version, model, json.dumps(values, sort_keys=True, default=str))
+        shared = self._in_flight.get(key)
+        if shared is None:
+            shared = _SharedRun(asyncio.ensure_future(self._send(prompt_name, version, settings, values, model)))
+            self._in_flight[key] = shared
+            shared.task.add_done_callback(lambda task: self._land(key, shared))
+        else:
+            self.coalesced += 1
+        shared.callers += 1
+        try:
+            return await asyncio.shield(shared.task)
+        except asyncio.CancelledError:
+            shared.callers -= 1
+            if shared.callers == 0 and not shared.task.done():
+                self._land(key, shared)  # a run arriving now must not join a cancelled call
+                shared.task.cancel()
+            raise
+
+    async def _send(self, prompt_name: str, version: str, settings: RunSettings, values: dict,
+                    model: str) -> PromptResult:
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            start = time.perf_counter()
+            text = await loop.run_in_executor(self._pool, self._render_and_call, prompt_name, version, settings,
+                                              values, model)
+            return PromptResult(prompt_name, text, model, time.perf_counter() - start)
+
+    def _land(self, key: tuple, shared: _SharedRun):
+        if self._in_flight.get(key) is shared:
+            del self._in_flight[key]
+        if shared.task.done() and not shared.task.cancelled():
+            shared.task.exception()  # retrieved, even when every caller had cancelled
+
+    async def run_many(self, requests: Iterable[tuple[str, Optional[dict]]], model: Optional[str] = None,
+                       return_exceptions: bool = False) -> list:
+        """Run ``(prompt name, values)`` pairs concurrently; results are in request order."""
+        return await asyncio.gather(*(self.run(name, values, model=model) for name, values in requests),
+                                    return_exceptions=return_exceptions)
@@ -0,0 +1,254 @@
+# cp_autosave.py
+
+"""
+Write-behind autosave for a prompt library.
+
+``AutosaveWriter.submit(library)`` takes a snapshot of the library on the calling thread
+(a shallow copy: prompts are immutable records) and queues it; it does not touch the disk.
+A background thread writes the newest queued snapshot once edits have stopped for
+``quiet_period`` seconds, or after ``max_delay`` seconds of continuous editing, so a burst
+of edits becomes one write and older snapshots are never written. Files are replaced
+atomically and synced (cp_library.write_file_durably).
+
+``flush()`` writes pending edits now and waits for them; ``close()`` flushes and stops the
+thread. Pending edits are only guaranteed to be on disk after one of them returned True.
+
+The writer never overwrites changes made by someone else: if the file changed since the
+snapshot's library last read or wrote it, the write fails with LibraryChangedOnDisk and the
+owner is expected to merge the file and submit again.
+"""
+
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Callable, Optional
+import threading
+import time
+import logging
+
+# Logger Configuration
+logger = logging.getLogger(__name__)
+
+from cp_library import dumps_library_file, write_file_durably
+from cp_sync import file_signature
+
+DEFAULT_QUIET_PERIOD = 2.0  # seconds without edits before pending edits are written
+DEFAULT_MAX_DELAY = 30.0    # longest time an edit waits while edits keep coming
+
+
+class LibraryChangedOnDisk(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class SaveJob:
+    revision: int
+    file_path: Path
+    header: dict
+    prompts: dict
+    expected_signature: Optional[tuple[int, int]]  # the file as the library last saw it
+
+
+@dataclass(frozen=True)
+class SavedVersion:
+    job: SaveJob
+    content: bytes
+    signature: Optional[tuple[int, int]]
+
+
+@dataclass(frozen=True)
+class AutosaveStatus:
+    pending: int = 0                       # edits submitted and not written yet
+    writing: bool = False
+    saved_revision: Optional[int] = None   # revision of the last write
+    saved_at: Optional[float] = None       # time.time() of the last write
+    error: Optional[str] = None            # why the last write failed, until one succeeds
+    conflict: bool = False                 # the last write failed because the file changed on disk
+
+
+class AutosaveWriter:
+    """
+    Coalescing background writer. ``on_status(AutosaveStatus)`` and ``on_saved(SavedVersion)``
+    are called on the writer thread; the owner applies a saved version to its library with
+    ``library.mark_saved`` on its own thread.
+    """
+    def __init__(self, quiet_period: float = DEFAULT_QUIET_PERIOD, max_delay: float = DEFAULT_MAX_DELAY,
+                 on_status: Optional[Callable[[AutosaveStatus], None]] = None,
+                 on_saved: Optional[Callable[[SavedVersion], None]] = None):
+        self.quiet_period = quiet_period
+        self.max_delay = max_delay
+        self.on_status = on_status
+        self.on_saved = on_saved
+
+        self._condition = threading.Condition()
+        self._write_lock = threading.Lock()  # held while writing; also taken by paused()
+        self._thread: Optional[threading.Thread] = None
+        self._pending: Optional[SaveJob] = None
+        self._pending_count = 0
+        self._first_submit = 0.0
+        self._last_submit = 0.0
+        self._flush_requested = False
+        self._closing = False
+        self._writes_done = 0  # finished write attempts, successful or not
+        self._generation = 0   # incremented by paused(); jobs taken before it are dropped
+        self._written: dict[Path, tuple[int, int]] = {}  # signature of our own last write per file
+        self._status = AutosaveStatus()
+
+    @property
+    def status(self) -> AutosaveStatus:
+        return self._status
+
+    def submit(self, library):
+        """Queue the library as it is now; call on the thread that owns the library."""
+        if not library.file_path:
+            raise ValueError("No prompt library file set")
+        job = SaveJob(library.revision, Path(library.file_path), dict(library.header), dict(library.prompts),
+                      library.base.signature)
+        with self._condition:
+            if self._closing:
+                raise RuntimeError("Autosave is closed")
+            now = time.monotonic()
+            if self._pending is None:
+                self._first_submit = now
+            self._pending = job
+            self._pending_count += 1
+            self._last_submit = now
+            self._start_thread()
+            self._condition.notify_all()
+        self._set_status(pending=self._pending_count)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Write pending edits now and wait. True if everything submitted is on disk."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            attempts = self._writes_done
+            self._flush_requested = True
+            self._condition.notify_all()
+            while self._pending is not None or self._status.writing:
+                if self._status.error and not self._status.writing and self._writes_done > attempts:
+                    break  # the write failed; it is retried after the quiet period
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            self._flush_requested = False
+            return self._pending is None and not self._status.writing and not self._status.error
+
+    def close(self, timeout: Optional[float] = None) -> bool:
+        """Flush and stop the writer thread. True if everything submitted is on disk."""
+        flushed = self.flush(timeout)
+        with self._condition:
+            self._closing = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        return flushed
+
+    @contextmanager
+    def paused(self):
+        """
+        Hold off background writes, e.g. around a manual save that writes the library itself.
+        Waits for a write in progress; pending edits are dropped, as the save includes them.
+        """
+        with self._write_lock:
+            with self._condition:
+                self._generation += 1
+                self._pending = None
+                self._pending_count = 0
+                self._condition.notify_all()
+            self._set_status(pending=0, error=None, conflict=False)
+            yield
+
+    # Writer thread methods
+    def _start_thread(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="autosave", daemon=True)
+            self._thread.start()
+
+    def _next_job(self) -> Optional[tuple[SaveJob, int, int]]:
+        """Wait until the pending job is due; None when closing with nothing left to write."""
+        with self._condition:
+            while True:
+                if self._pending is None:
+                    if self._closing:
+                        return None
+                    self._condition.wait()
+                    continue
+                due = min(self._last_submit + self.quiet_period, self._first_submit + self.max_delay)
+                now = time.monotonic()
+                if self._flush_requested or self._closing or now >= due:
+                    job, self._pending = self._pending, None
+                    count, self._pending_count = self._pending_count, 0
+                    self._status = replace(self._status, pending=0, writing=True)
+                    return job, count, self._generation
+                self._condition.wait(due - now)
+
+    def _run(self):
+        while True:
+            next_job = self._next_job()
+            if next_job is None:
+                return
+            job, count, generation = next_job
+            self._notify_status()
+
+            with self._write_lock:
+                if generation != self._generation:
+                    saved, error = None, None  # a manual save wrote a newer version meanwhile
+                else:
+                    try:
+                        saved, error = self._write(job), None
+                    except Exception as e:
+                        saved, error = None, e
+
+            with self._condition:
+                self._writes_done += 1
+                if saved is None and error is None:
+                    self._status = replace(self._status, pending=self._pending_count, writing=False)
+                elif error is None:
+                    self._status = replace(self._status, pending=self._pending_count, writing=False,
+                                            saved_revision=job.revision, saved_at=time.time(),
+                                            error=None, conflict=False)
+                else:
+                    conflict = isinstance(error, LibraryChangedOnDisk)
+                    if self._pending is None and not conflict:
+                        # Retry after the quiet period unless newer edits replaced it
+                        self._pending, self._pending_count = job, count
+                        self._first_submit = self._last_submit = time.monotonic()
+                    self._status = replace(self._status, pending=self._pending_count, writing=False,
+                                            error=str(error), conflict=conflict)
+                self._condition.notify_all()
+
+            if saved is not None:
+                logger.info(f"Autosaved {len(job.prompts)} prompts to {job.file_path}")
+                if self.on_saved is not None:
+                    self._call(self.on_saved, saved)
+            elif error is not None:
+                logger.error(f"Autosave to {job.file_path} failed: {error}")
+            self._notify_status()
+
+    def _write(self, job: SaveJob) -> SavedVersion:
+        current = file_signature(job.file_path)
+        if current != job.expected_signature and current != self._written.get(job.file_path):
+            raise LibraryChangedOnDisk(f"{job.file_path.name} was changed by another program")
+        content = dumps_library_file(job.file_path, job.header, job.prompts)
+        write_file_durably(job.file_path, content)
+        signature = file_signature(job.file_path)
+        self._written[job.file_path] = signature
+        return SavedVersion(job, content, signature)
+
+    def _set_status(self, **changes):
+        with self._condition:
+            self._status = replace(self._status, **changes)
+        self._notify_status()
+
+    def _notify_status(self):
+        if self.on_status is not None:
+            self._call(self.on_status, self._status)
+
+    @staticmethod
+    def _call(callback, argument):
+        try:
+            callback(argument)
+        except Exception as e:
+            logger.error(f"Autosave callback failed: {e}")
@@ -0,0 +1,281 @@
+# cp_binlib.py
+
+"""
+Compact binary library format (``.crpl``).
+
+    magic        "CRPL\\x02"
+    header       u32 length + deflated JSON header
+    records      u32 length + deflated JSON [name, prompt], one per prompt
+    name table   (u64 name hash, u64 offset, u32 length) per prompt, sorted by hash
+    footer       u64 table offset, u32 prompt count, "CRPX"
+
+Records are deflated one by one with a preset dictionary of the keys and values all
+prompts share, so the file is a fraction of the indented JSON. Loading one prompt looks
+its name up in the table with a binary search and reads that record only. Loading the
+whole library reads the file once and parses all records with a single json.loads.
+
+Libraries are saved in this format when the file name ends in ``.crpl``; loading detects
+it from the magic bytes. Conversion both ways is lossless.
+"""
+
+from pathlib import Path
+from typing import BinaryIO, Iterator, Optional, Union
+import hashlib
+import json
+import os
+import struct
+import tempfile
+import time
+import zlib
+import logging
+
+# Logger Configuration
+logger = logging.getLogger(__name__)
+
+from cp_core import DEFAULT_SYSTEM_PROMPT
+from cp_jsonstream import EVENT_HEADER, EVENT_PROMPT, EVENT_ERROR, LibraryFormatError
+from cp_record import to_json_object
+
+BINARY_SUFFIX = ".crpl"
+MAGIC = b"CRPL\x02"
+FOOTER_MAGIC = b"CRPX"
+COMPRESSION_LEVEL = 6
+
+# Raw deflate with a 4 KiB window: most records are small, and a small window makes the
+# per-record compressor cheap to set up
+_WBITS = -12
+_MEM_LEVEL = 4
+
+_LENGTH = struct.Struct("<I")
+_TABLE_ENTRY = struct.Struct("<QQI")
+_FOOTER = struct.Struct("<QI4s")
+
+# Preset dictionary: text most prompt records contain, so small records compress well too.
+# Part of the format: changing it needs a new MAGIC version.
+_ZDICT = "".join((
+    '"enable_web_search":"auto"', '"include_venice_system_prompt":true', '"venice_parameters":{',
+    '"custom_system_prompt_name":"', '"response_format":{"type":"json_schema","json_schema":{"name":"',
+    '"strict":true,"schema":{"type":"object","properties":{', '"required":[', '"max_completion_tokens":',
+    '"presence_penalty":', '"frequency_penalty":', '"top_p":', '"temperature":', '"prompt_layout":"stable_prefix"',
+    '"subtype":"evaluate"', '"subtype":"query"', '"type":"system"', f'"prompt_system_text":"{DEFAULT_SYSTEM_PROMPT}"',
+    '"prompt_system_use":false', '"default_attributes":{', '"notes":""', '"subtype":"summary"', '"type":"user"',
+    '{"prompt_text":"',
+)).encode("utf-8")
+
+
+def _compress(data: bytes) -> bytes:
+    compressor = zlib.compressobj(COMPRESSION_LEVEL, zlib.DEFLATED, _WBITS, _MEM_LEVEL, zdict=_ZDICT)
+    return compressor.compress(data) + compressor.flush()
+
+
+def _decompress(data) -> bytes:
+    decompressor = zlib.decompressobj(_WBITS, zdict=_ZDICT)
+    return decompressor.decompress(data) + decompressor.flush()
+
+
+def _encode_json(value) -> bytes:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def name_hash(name: str) -> int:
+    return int.from_bytes(hashlib.blake2b(name.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def is_binary_library(file_path: Union[str, Path]) -> bool:
+    try:
+        with open(file_path, "rb") as file:
+            return file.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def dumps_binary_library(doc: dict) -> bytes:
+    """Serialise a ``{"header": ..., "data": ...}`` library document in the binary format."""
+    parts = [MAGIC]
+    offset = len(MAGIC)
+
+    def add_block(payload: bytes):
+        nonlocal offset
+        parts.append(_LENGTH.pack(len(payload)))
+        parts.append(payload)
+        offset += _LENGTH.size + len(payload)
+
+    add_block(_compress(_encode_json(doc.get("header", {}))))
+
+    table = []
+    for name, data in doc.get("data", {}).items():
+        payload = _compress(_encode_json([name, to_json_object(data)]))
+        table.append((name_hash(name), offset, _LENGTH.size + len(payload)))
+        add_block(payload)
+
+    table.sort()
+    parts.extend(_TABLE_ENTRY.pack(*entry) for entry in table)
+    parts.append(_FOOTER.pack(offset, len(table), FOOTER_MAGIC))
+    return b"".join(parts)
+
+
+def _fingerprint(raw: bytes) -> str:
+    """Hash of a record's stored JSON text, like cp_jsonstream.fingerprint of a prompt's source."""
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+
+class BinaryLibraryReader:
+    """Random access to a binary library; only the footer is read up front."""
+    def __init__(self, file_path: Union[str, Path]):
+        self.file_path = Path(file_path)
+        self._file: BinaryIO = open(self.file_path, "rb")
+        try:
+            self._read_footer()
+        except Exception:
+            self._file.close()
+            raise
+
+    def __enter__(self) -> "BinaryLibraryReader":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._file.close()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _read_footer(self):
+        if self._file.read(len(MAGIC)) != MAGIC:
+            raise LibraryFormatError(f"{self.file_path} is not a binary prompt library")
+        self._file.seek(0, os.SEEK_END)
+        size = self._file.tell()
+        if size < len(MAGIC) + _FOOTER.size:
+            raise LibraryFormatError(f"{self.file_path} is truncated")
+        self._file.seek(size - _FOOTER.size)
+        self.table_offset, self.count, footer_magic = _FOOTER.unpack(self._file.read(_FOOTER.size))
+        if footer_magic != FOOTER_MAGIC or self.table_offset + self.count * _TABLE_ENTRY.size + _FOOTER.size != size:
+            raise LibraryFormatError(f"{self.file_path} is truncated or corrupt")
+
+    def _read_block(self, offset: int) -> bytes:
+        self._file.seek(offset)
+        (length,) = _LENGTH.unpack(self._file.read(_LENGTH.size))
+        return _decompress(self._file.read(length))
+
+    def _table_entry(self, position: int) -> tuple[int, int, int]:
+        self._file.seek(self.table_offset + position * _TABLE_ENTRY.size)
+        return _TABLE_ENTRY.unpack(self._file.read(_TABLE_ENTRY.size))
+
+    def header(self) -> dict:
+        return json.loads(self._read_block(len(MAGIC)))
+
+    def read(self, name: str) -> dict:
+        """One prompt: a binary search of the name table, then a single record read."""
+        target = name_hash(name)
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._table_entry(middle)[0] < target:
+                low = middle + 1
+            else:
+                high = middle
+        # Names with the same hash sit next to each other
+        for position in range(low, self.count):
+            entry_hash, offset, length = self._table_entry(position)
+            if entry_hash != target:
+                break
+            record_name, data = json.loads(self._read_block(offset))
+            if record_name == name:
+                return data
+        raise KeyError(f"Prompt '{name}' not found in library")
+
+    def iter_events(self) -> Iterator[tuple]:
+        """The events of cp_jsonstream.iter_library_events, in file order."""
+        self._file.seek(0)
+        content = memoryview(self._file.read())
+        position = len(MAGIC)
+
+        def next_block():
+            nonlocal position
+            (length,) = _LENGTH.unpack_from(content, position)
+            start = position + _LENGTH.size
+            position = start + length
+            return _decompress(content[start:position])
+
+        yield EVENT_HEADER, json.loads(next_block())
+
+        records = []
+        try:
+            while position < self.table_offset:
+                records.append(next_block())
+        except (zlib.error, struct.error) as e:
+            yield EVENT_ERROR, f"record {len(records) + 1}", f"Corrupt record, the rest of the file is skipped: {e}"
+
+        try:
+            # One parse for all records is much faster than one per record
+            decoded = json.loads(b"[" + b",".join(records) + b"]")
+        except ValueError:
+            decoded = None
+        for index, raw in enumerate(records):
+            try:
+                name, data = decoded[index] if decoded is not None else json.loads(raw)
+            except (ValueError, TypeError) as e:
+                yield EVENT_ERROR, f"record {index + 1}", f"Corrupt record: {e}"
+                continue
+            if isinstance(data, dict):
+                yield EVENT_PROMPT, name, data, _fingerprint(raw)
+            else:
+                yield EVENT_ERROR, name, f"Expected an object, got {type(data).__name__}"
+
+    def document(self) -> dict:
+        """The whole library as a ``{"header": ..., "data": ...}`` document."""
+        doc = {"header": {}, "data": {}}
+        for event in self.iter_events():
+            if event[0] == EVENT_HEADER:
+                doc["header"] = event[1]
+            elif event[0] == EVENT_PROMPT:
+                doc["data"][event[1]] = event[2]
+        return doc
+
+
+def iter_binary_events(file_path: Union[str, Path]) -> Iterator[tuple]:
+    with BinaryLibraryReader(file_path) as reader:
+        yield from reader.iter_events()
+
+
+def benchmark_formats(counts=(1_000, 10_000, 100_000), directory: Optional[Union[str, Path]] = None) -> list[dict]:
+    """Save time, full load time, single prompt load time and file size, JSON vs binary."""
+    from cp_library import PromptLibrary
+
+    rows = []
+    with tempfile.TemporaryDirectory(dir=directory) as temp_dir:
+        for count in counts:
+            library = PromptLibrary()
+            library.prompts = {f"Prompt {index}": {
+                "prompt_text": f"Summarize <<topic>> for the {index} report in %% document %%. " * 4,
+                "type": "user", "subtype": "summary", "notes": f"Note {index}",
+                "default_attributes": {"temperature": 0.7, "max_completion_tokens": 512},
+                "prompt_system_use": False, "prompt_system_text": DEFAULT_SYSTEM_PROMPT,
+            } for index in range(count)}
+            probe = f"Prompt {count // 2}"
+
+            for suffix in (".json", BINARY_SUFFIX):
+                path = Path(temp_dir) / f"library_{count}{suffix}"
+                start = time.perf_counter()
+                library.save(path, backup=False)
+                save_seconds = time.perf_counter() - start
+
+                start = time.perf_counter()
+                PromptLibrary.from_file(path)
+                load_seconds = time.perf_counter() - start
+
+                start = time.perf_counter()
+                if suffix == BINARY_SUFFIX:
+                    with BinaryLibraryReader(path) as reader:
+                        reader.read(probe)
+                else:
+                    with open(path, encoding="utf-8") as file:
+                        json.load(file)["data"][probe]
+                single_seconds = time.perf_counter() - start
+
+                rows.append({"format": suffix.lstrip("."), "prompts": count, "bytes": path.stat().st_size,
+                             "save_seconds": save_seconds, "load_seconds": load_seconds,
+                             "single_prompt_seconds": single_seconds})
+    return rows
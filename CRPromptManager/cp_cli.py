@@ -0,0 +1,648 @@
+# cp_cli.py
+
+"""
+Command line interface for running library prompts without a display.
+
+    python -m CRPromptManager list -l prompts.json
+    python -m CRPromptManager render "My Prompt" -l prompts.json --set topic=AI --file doc=notes.pdf
+    python -m CRPromptManager run "My Prompt" -l prompts.json --set topic=AI --model venice-uncensored
+    python -m CRPromptManager sweep "My Prompt" -l prompts.json --grid temperature=0,0.7 --range top_p=0.5:1:0.25 --samples 3
+    python -m CRPromptManager analytics --by model --window 24h [--format csv]
+    python -m CRPromptManager eval golden.json -l prompts.json --subtype evaluate --baseline baseline.json
+    python -m CRPromptManager validate -l prompts.json
+    python -m CRPromptManager backups -l prompts.json [--restore HASH -o restored.json]
+    python -m CRPromptManager check-imports
+    python -m CRPromptManager benchmark records --count 100000
+    python -m CRPromptManager convert prompts.json prompts.crpl
+    python -m CRPromptManager benchmark editor --size-mb 5
+    CRPM_TRACE=trace.json python -m CRPromptManager run "My Prompt" -l prompts.json
+    python -m CRPromptManager trace trace.json
+
+Only standard library modules are imported up front. WrapAI and WrapConfig are imported
+when a command needs them, and PySide6 / WrapSideSix are never imported, except by
+``benchmark editor``, which measures the editor widget offscreen.
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+# Logger Configuration
+logger = logging.getLogger(__name__)
+
+from cp_core import (API_KEY_NAME, SECRETS_FILE_NAME, DEFAULT_AI_MODEL, PROMPT_TYPES, PROMPT_TYPE_QUESTION,
+                     PROMPT_TYPE_CHAT)
+from cp_library import PromptLibrary
+from cp_render import (resolve_run_settings, render_prompt_text, strip_output_placeholders, missing_values,
+                       read_file_placeholder)
+from cp_history import prompt_version
+from cp_trace import tracer, configure_from_env, summarize_trace
+
+INI_SECTION = "CRPromptManager"
+
+
+def _read_ini_value(option: str) -> str:
+    """Read a value from the editor's INI file, or "" when WrapConfig is unavailable."""
+    try:
+        from WrapConfig import RuntimeConfig, INIHandler
+    except ImportError:
+        return ""
+    ini_handler = INIHandler(RuntimeConfig().ini_file_name)
+    return ini_handler.read_value(INI_SECTION, option) or ""
+
+
+def load_api_key() -> str:
+    """API key from the environment, falling back to the editor's secrets file."""
+    api_key = os.environ.get(API_KEY_NAME)
+    if api_key:
+        return api_key
+    try:
+        from WrapConfig import SecretsManager
+    except ImportError:
+        return ""
+    return SecretsManager(SECRETS_FILE_NAME).get_secret(API_KEY_NAME) or ""
+
+
+def _parse_pairs(pairs: list[str], option: str) -> dict:
+    values = {}
+    for pair in pairs or []:
+        key, sep, value = pair.partition("=")
+        if not sep:
+            raise SystemExit(f"{option} expects NAME=VALUE, got '{pair}'")
+        values[key.strip()] = value
+    return values
+
+
+def _load_library(args) -> PromptLibrary:
+    file_path = args.library or _read_ini_value("default_prompt_file")
+    if not file_path:
+        raise SystemExit("No prompt library given. Use --library or set a default prompt file in Settings.")
+    return PromptLibrary.from_file(file_path)
+
+
+def _render(args, library: PromptLibrary):
+    settings = resolve_run_settings(library.prompts, args.name, library.includes)
+    values = _parse_pairs(args.set, "--set")
+    values.update(_parse_pairs(args.file, "--file"))
+
+    prompt_text = strip_output_placeholders(settings.prompt_text)
+    missing = missing_values(prompt_text, values)
+    if missing:
+        logger.warning(f"No value supplied for placeholders: {', '.join(missing)}")
+
+    file_reader = read_file_placeholder
+    if args.isolate_files:
+        from cp_extract import FileExtractor
+        file_reader = FileExtractor(timeout=args.file_timeout)
+    settings.prompt_text = render_prompt_text(prompt_text, values, file_reader=file_reader, layout=settings.layout)
+    return settings
+
+
+# Commands
+def cmd_list(args) -> int:
+    library = _load_library(args)
+    for name in library.names(prompt_type=args.type):
+        data = library.prompts[name]
+        if args.long:
+            print(f"{name}\t{data.get('type', 'user')}\t{data.get('subtype', '')}")
+        else:
+            print(name)
+    return 0
+
+
+def cmd_render(args) -> int:
+    settings = _render(args, _load_library(args))
+    if args.json:
+        print(json.dumps({
+            "system_prompt": settings.system_prompt,
+            "prompt_text": settings.prompt_text,
+            "attributes": settings.attributes,
+        }, indent=4))
+    else:
+        print(settings.prompt_text)
+    return 0
+
+
+def cmd_run(args) -> int:
+    from cp_runner import create_runner, format_response_text, record_usage
+
+    library = _load_library(args)
+    settings = _render(args, library)
+
+    api_key = load_api_key()
+    if not api_key:
+        raise SystemExit(f"No API key found. Set {API_KEY_NAME} in the environment or in {SECRETS_FILE_NAME}.")
+    model = args.model or _read_ini_value("default_model") or DEFAULT_AI_MODEL
+
+    if args.type == PROMPT_TYPE_CHAT and settings.attributes.get("response_format") is not None:
+        raise SystemExit("You cannot use a JSON-formatted response (response_format) with chat prompts.")
+
+    history = _open_history(args)
+    runner = create_runner(api_key, model, args.type, settings.attributes)
+    start = time.perf_counter()
+    try:
+        response = runner.prompt(settings.prompt_text, system_prompt=settings.system_prompt)
+    except Exception as e:
+        if history:
+            history.record(args.name, prompt_version(library.get(args.name)), model, args.type,
+                           {"prompt_text": settings.prompt_text, "system_prompt": settings.system_prompt,
+                            "parameters": settings.attributes},
+                           latency=time.perf_counter() - start, error=str(e))
+        raise
+    latency = time.perf_counter() - start
+    if not response:
+        print("No response returned from the API.", file=sys.stderr)
+        return 1
+    record_usage(response)
+    if history:
+        history.record_response(args.name, prompt_version(library.get(args.name)), model, args.type,
+                                settings.prompt_text, settings.system_prompt, response,
+                                latency=latency, parameters=settings.attributes)
+
+    if args.json:
+        print(json.dumps(response.to_dict() if hasattr(response, "to_dict") else {}, indent=4))
+    else:
+        print(format_response_text(response, settings.attributes))
+    return 0
+
+
+def cmd_pipeline(args) -> int:
+    from cp_pipeline import Pipeline, PipelineError, PipelineExecutor, ResponseCache
+    from cp_runner import api_response_call, session_usage, in_flight
+
+    library = _load_library(args)
+    pipeline = Pipeline.from_file(args.pipeline)
+
+    api_key = load_api_key()
+    if not api_key:
+        raise SystemExit(f"No API key found. Set {API_KEY_NAME} in the environment or in {SECRETS_FILE_NAME}.")
+    model = args.model or _read_ini_value("default_model") or DEFAULT_AI_MODEL
+
+    def on_node_done(result):
+        source = "cached" if result.cached else f"{result.seconds:.2f}s"
+        print(f"{result.name}: done ({source})", file=sys.stderr)
+
+    executor = PipelineExecutor(library, api_response_call(api_key), model, max_workers=args.workers,
+                                cache=ResponseCache(args.cache), history=_open_history(args))
+    try:
+        results = executor.run(pipeline, on_node_done=on_node_done)
+    except PipelineError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    if args.json:
+        print(json.dumps({name: {"text": result.text, "cached": result.cached, "seconds": result.seconds}
+                          for name, result in results.items()}, indent=4))
+    else:
+        # Print the final nodes, the ones no other node is bound to
+        upstream = {source for node in pipeline.nodes.values() for source in node.upstream()}
+        for name in pipeline.order():
+            if name not in upstream:
+                print(f"=== {name} ===\n{results[name].text}\n")
+    print(f"Usage: {session_usage.summary()}", file=sys.stderr)
+    if in_flight.coalesced:
+        print(f"Coalesced: {in_flight.summary()}", file=sys.stderr)
+    return 0
+
+
+def cmd_eval(args) -> int:
+    from cp_eval import EvalRunner, load_suites, select_suites, load_baseline
+
+    if args.update_baseline and not args.baseline:
+        raise SystemExit("--update-baseline needs the baseline file to write, given with --baseline FILE.")
+    library = _load_library(args)
+    suites, without_cases = select_suites(library, load_suites(args.suites), prompt=args.prompt, subtype=args.subtype)
+    for name in without_cases:
+        print(f"{name}: no golden set", file=sys.stderr)
+    if not suites:
+        raise SystemExit("No prompts with a golden set selected.")
+
+    api_key = load_api_key()
+    if not api_key:
+        raise SystemExit(f"No API key found. Set {API_KEY_NAME} in the environment or in {SECRETS_FILE_NAME}.")
+    model = args.model or _read_ini_value("default_model") or DEFAULT_AI_MODEL
+
+    runner = EvalRunner(library, api_key, model, max_concurrency=args.concurrency, history=_open_history(args))
+    report = runner.run(suites)
+
+    if args.json:
+        print(json.dumps({name: {"version": prompt_report.version, "score": prompt_report.score,
+                                 "error": prompt_report.error, "cases": [vars(case) for case in prompt_report.cases]}
+                          for name, prompt_report in report.prompts.items()}, indent=4))
+    else:
+        for name, prompt_report in report.prompts.items():
+            if prompt_report.error:
+                print(f"{name}\tnot run: {prompt_report.error}")
+                continue
+            print(f"{name}\t{prompt_report.version[:8]}\t{prompt_report.score:.3f}\t"
+                  f"{prompt_report.passed}/{len(prompt_report.cases)} passed")
+            for case in prompt_report.cases:
+                if not case.passed:
+                    print(f"  {case.id}: {case.error or f'score {case.score:.2f}'}")
+
+    regressions = []
+    if args.baseline:
+        regressions = report.compare(load_baseline(args.baseline), tolerance=args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}", file=sys.stderr)
+        if args.update_baseline and not regressions:
+            report.save_baseline(args.baseline)
+            print(f"Baseline {args.baseline} updated", file=sys.stderr)
+    below = [name for name, prompt_report in report.prompts.items() if prompt_report.score < args.min_score]
+    for name in below:
+        print(f"{name}: score below --min-score {args.min_score}", file=sys.stderr)
+    return 1 if regressions or below or report.failed_suites else 0
+
+
+def cmd_sweep(args) -> int:
+    from cp_sweep import SweepRunner, parse_axes, export_csv, export_json
+    from cp_runner import api_response_call, session_usage
+
+    library = _load_library(args)
+    settings = _render(args, library)
+    axes = parse_axes([*(args.grid or []), *(args.range or [])])
+    if not axes:
+        raise SystemExit("Nothing to sweep. Give at least one --grid NAME=V1,V2 or --range NAME=START:STOP:STEP.")
+
+    api_key = load_api_key()
+    if not api_key:
+        raise SystemExit(f"No API key found. Set {API_KEY_NAME} in the environment or in {SECRETS_FILE_NAME}.")
+    model = args.model or _read_ini_value("default_model") or DEFAULT_AI_MODEL
+
+    # Samples must be sent separately, so identical requests are not coalesced
+    runner = SweepRunner(api_response_call(api_key, coalesce=False), model, max_concurrency=args.concurrency,
+                         samples=args.samples, history=_open_history(args), prompt_name=args.name,
+                         prompt_version=prompt_version(library.get(args.name)), max_requests=args.max_requests)
+
+    def on_sample_done(result):
+        outcome = f"error: {result.error}" if result.error else f"{result.seconds:.2f}s"
+        print(f"point {result.point + 1}, sample {result.sample + 1}: {outcome}", file=sys.stderr)
+
+    report = runner.run(settings, axes, on_sample_done=on_sample_done)
+
+    if args.json:
+        export_json(report, sys.stdout)
+    elif args.csv:
+        export_csv(report, sys.stdout)
+    else:
+        def number(value, spec):
+            return "-" if value is None else format(value, spec)
+
+        summaries = sorted(report.summaries(), key=lambda summary: (summary.latency_p50 is None, summary.latency_p50 or 0.0))
+        print("\t".join([axis.name for axis in axes] + ["samples", "errors", "p50", "mean", "max",
+                                                         "prompt tok", "completion tok", "valid"]))
+        for summary in summaries:
+            print("\t".join([str(summary.params[axis.name]) for axis in axes] + [
+                str(summary.samples), str(summary.errors), number(summary.latency_p50, ".2f"),
+                number(summary.latency_mean, ".2f"), number(summary.latency_max, ".2f"),
+                number(summary.prompt_tokens, ".0f"), number(summary.completion_tokens, ".0f"),
+                number(summary.valid_rate, ".0%")]))
+
+    best = report.best(min_valid_rate=args.min_valid)
+    print(f"{len(report.points)} point(s) x {args.samples} sample(s) in {report.seconds:.1f}s; "
+          f"usage: {session_usage.summary()}", file=sys.stderr)
+    if best is None:
+        print(f"No configuration ran without errors with a valid rate of at least {args.min_valid:.0%}", file=sys.stderr)
+        return 1
+    print(f"Fastest: {best.label} (p50 {best.latency_p50:.2f}s)", file=sys.stderr)
+    return 0
+
+
+def _open_history(args):
+    if getattr(args, "no_history", False):
+        return None
+    from cp_history import RunHistory, default_history_path
+    return RunHistory(args.history or default_history_path())
+
+
+def cmd_history(args) -> int:
+    from cp_history import HistoryFilter
+    from datetime import datetime
+
+    history = _open_history(args)
+    if args.show is not None:
+        record = history.get(args.show)
+        print(json.dumps(dict(vars(record)), indent=4, default=str))
+        return 0
+
+    history_filter = HistoryFilter(prompt_name=args.prompt, model=args.model, status=args.status)
+    for record in history.page(history_filter, before_id=args.before, limit=args.limit):
+        created = datetime.fromtimestamp(record.created).strftime("%Y-%m-%d %H:%M:%S")
+        latency = f"{record.latency:.2f}s" if record.latency is not None else "-"
+        print(f"{record.id}\t{created}\t{record.prompt_name}\t{record.prompt_version[:8]}\t"
+              f"{record.model}\t{record.status}\t{latency}")
+    print(f"{history.count(history_filter)} run(s) match", file=sys.stderr)
+    return 0
+
+
+def cmd_analytics(args) -> int:
+    from cp_analytics import RunAnalytics, export_csv, export_json, format_seconds
+
+    analytics = RunAnalytics.from_history(_open_history(args))
+    rows = analytics.summary(args.by, args.window)
+    if args.format == "csv":
+        export_csv(rows, sys.stdout)
+    elif args.format == "json":
+        export_json(rows, sys.stdout)
+    else:
+        print(f"{args.by}\truns\terror rate\tp50\tp95\tp99\tttft p50\ttokens/s")
+        for row in rows:
+            tokens_per_second = f"{row.tokens_per_second:.1f}" if row.tokens_per_second is not None else "-"
+            print(f"{row.key}\t{row.runs}\t{row.error_rate:.1%}\t{format_seconds(row.latency_p50)}\t"
+                  f"{format_seconds(row.latency_p95)}\t{format_seconds(row.latency_p99)}\t"
+                  f"{format_seconds(row.ttft_p50)}\t{tokens_per_second}")
+    return 0
+
+
+def cmd_validate(args) -> int:
+    from cp_validate import validate_library
+
+    library = _load_library(args)
+    models, model = None, None
+    if args.check_models:
+        from WrapConfig import RuntimeConfig
+        from cp_core import populate_runtime_models
+
+        api_key = load_api_key()
+        if not api_key:
+            raise SystemExit(f"No API key found. Set {API_KEY_NAME} in the environment or in {SECRETS_FILE_NAME}.")
+        models = populate_runtime_models(api_key, RuntimeConfig())
+        model = args.model or _read_ini_value("default_model") or DEFAULT_AI_MODEL
+
+    report = validate_library(library, models, model)
+    if args.json:
+        print(json.dumps(report.to_dict(), indent=4))
+    else:
+        for issue in report.issues:
+            print(f"{issue.severity}\t{issue.check}\t{issue}")
+    print(report.summary(), file=sys.stderr)
+    return 1 if report.errors or (args.strict and report.warnings) else 0
+
+
+def cmd_backups(args) -> int:
+    from datetime import datetime
+    from file_backup import BackupStore
+    from cp_binlib import MAGIC as BINARY_MAGIC
+
+    file_path = args.library or _read_ini_value("default_prompt_file")
+    if not file_path:
+        raise SystemExit("No prompt library given. Use --library or set a default prompt file in Settings.")
+    store = BackupStore(file_path)
+
+    if args.restore:
+        matches = [s["hash"] for s in store.snapshots() if s["hash"].startswith(args.restore)]
+        if len(set(matches)) != 1:
+            raise SystemExit(f"'{args.restore}' matches {len(set(matches))} backups")
+        content = store.restore(matches[0])
+        if args.output:
+            with open(args.output, "wb") as file:
+                file.write(content)
+        elif content.startswith(BINARY_MAGIC):
+            raise SystemExit("This backup is a binary library. Use -o to write it to a file.")
+        else:
+            sys.stdout.write(content.decode("utf-8"))
+        return 0
+
+    for snapshot in store.snapshots():
+        saved = datetime.fromtimestamp(snapshot["time"]).strftime("%Y-%m-%d %H:%M:%S")
+        print(f"{snapshot['hash'][:12]}\t{saved}\t{snapshot['size']} bytes")
+    return 0
+
+
+def cmd_check_imports(args) -> int:
+    from cp_importtime import check_import_budgets
+
+    problems = check_import_budgets(repeat=args.repeat)
+    for problem in problems:
+        print(problem)
+    print(f"{len(problems)} import budget problem(s) found", file=sys.stderr)
+    return 1 if problems else 0
+
+
+def cmd_benchmark(args) -> int:
+    if args.subject == "editor":
+        try:
+            from editor_text import benchmark_typing, KEYSTROKE_BUDGET_MS
+        except ImportError as e:
+            print(f"benchmark editor needs the GUI dependencies: {e}", file=sys.stderr)
+            return 2
+
+        result = benchmark_typing(int(args.size_mb * 1_000_000), args.count or 200)
+        print(f"{result['chars'] / 1e6:.1f} MB prompt, large mode {'on' if result['large_mode'] else 'off'}, "
+              f"loaded in {result['load_seconds']:.3f}s")
+        print(f"{result['keystrokes']} keystrokes: p50 {result['p50_ms']:.2f} ms, p95 {result['p95_ms']:.2f} ms, "
+              f"max {result['max_ms']:.2f} ms (budget {KEYSTROKE_BUDGET_MS:.0f} ms)")
+        print(f"text read after edits {result['edited_read_seconds'] * 1000:.1f} ms, "
+              f"unchanged {result['unchanged_read_seconds'] * 1000:.3f} ms")
+        print(result["placeholders"])
+        return 0 if result["p95_ms"] <= KEYSTROKE_BUDGET_MS else 1
+
+    if args.subject == "formats":
+        from cp_binlib import benchmark_formats
+
+        counts = [args.count] if args.count else [1_000, 10_000, 100_000]
+        print("format\tprompts\tsize\tsave\tload\tone prompt")
+        for row in benchmark_formats(counts):
+            print(f"{row['format']}\t{row['prompts']}\t{row['bytes'] / 1024:.0f} KiB\t{row['save_seconds']:.3f}s\t"
+                  f"{row['load_seconds']:.3f}s\t{row['single_prompt_seconds'] * 1000:.2f}ms")
+        return 0
+
+    from cp_record import measure_footprint
+
+    for as_records in (False, True):
+        result = measure_footprint(args.count or 100_000, as_records=as_records)
+        print(f"{result['kind']}\t{result['prompts']} prompts\t{result['bytes'] / 1024 / 1024:.1f} MiB\t"
+              f"{result['bytes_per_prompt']:.0f} bytes/prompt\t{result['seconds']:.2f}s")
+    return 0
+
+
+def cmd_convert(args) -> int:
+    library = PromptLibrary.from_file(args.source)
+    for name, message in library.load_errors:
+        print(f"Skipped {name}: {message}", file=sys.stderr)
+    library.save(args.destination, backup=False)
+    print(f"{len(library)} prompts written to {args.destination}", file=sys.stderr)
+    return 1 if library.load_errors else 0
+
+
+def cmd_trace(args) -> int:
+    with open(args.trace, encoding="utf-8") as f:
+        document = json.load(f)
+    rows = summarize_trace(document, args.limit)
+    width = max((len(name) for name, *_ in rows), default=4)
+    print(f"{'span':<{width}}  {'calls':>7}  {'total ms':>10}  {'max ms':>9}")
+    for name, calls, total, longest in rows:
+        print(f"{name:<{width}}  {calls:>7}  {total:>10.1f}  {longest:>9.1f}")
+    dropped = document.get("otherData", {}).get("dropped_events", 0)
+    if dropped:
+        print(f"{dropped} older span(s) were dropped while recording", file=sys.stderr)
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="CRPromptManager", description="ChatRecall Prompt Manager (headless)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Show info logging")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def add_library_option(sub):
+        sub.add_argument("-l", "--library", help="Prompt library JSON file (default: file from Settings)")
+
+    def add_value_options(sub):
+        sub.add_argument("name", help="Prompt name")
+        sub.add_argument("--set", action="append", metavar="NAME=VALUE", help="Value for a << text >> placeholder")
+        sub.add_argument("--file", action="append", metavar="NAME=PATH", help="File for a %%%% file %%%% placeholder")
+        sub.add_argument("--json", action="store_true", help="Print JSON instead of plain text")
+        sub.add_argument("--isolate-files", action="store_true",
+                         help="Read file placeholders in worker processes with a timeout and memory cap")
+        sub.add_argument("--file-timeout", type=float, default=120.0, metavar="SECONDS",
+                         help="Time allowed per file with --isolate-files")
+
+    list_parser = subparsers.add_parser("list", help="List prompts in the library")
+    add_library_option(list_parser)
+    list_parser.add_argument("--type", choices=["user", "system"], help="Only list prompts of this type")
+    list_parser.add_argument("--long", action="store_true", help="Show type and subtype")
+    list_parser.set_defaults(func=cmd_list)
+
+    render_parser = subparsers.add_parser("render", help="Print a prompt with placeholders filled in")
+    add_library_option(render_parser)
+    add_value_options(render_parser)
+    render_parser.set_defaults(func=cmd_render)
+
+    run_parser = subparsers.add_parser("run", help="Send a prompt to the model and print the response")
+    add_library_option(run_parser)
+    add_value_options(run_parser)
+    run_parser.add_argument("--model", help="Model to use (default: model from Settings)")
+    run_parser.add_argument("--no-history", action="store_true", help="Do not record the run in the run history")
+    run_parser.add_argument("--history", help=argparse.SUPPRESS)
+    run_parser.add_argument("--type", choices=PROMPT_TYPES, default=PROMPT_TYPE_QUESTION, help="Response type")
+    run_parser.set_defaults(func=cmd_run)
+
+    pipeline_parser = subparsers.add_parser("pipeline", help="Run a pipeline of prompts, feeding responses into later prompts")
+    pipeline_parser.add_argument("pipeline", help="Pipeline JSON file")
+    add_library_option(pipeline_parser)
+    pipeline_parser.add_argument("--model", help="Model for nodes without their own (default: model from Settings)")
+    pipeline_parser.add_argument("--workers", type=int, default=4, help="Nodes sent to the model at the same time")
+    pipeline_parser.add_argument("--cache", help="JSON file of cached responses; unchanged nodes are not sent again")
+    pipeline_parser.add_argument("--json", action="store_true", help="Print every node's response as JSON")
+    pipeline_parser.add_argument("--no-history", action="store_true", help="Do not record the runs in the run history")
+    pipeline_parser.add_argument("--history", help=argparse.SUPPRESS)
+    pipeline_parser.set_defaults(func=cmd_pipeline)
+
+    sweep_parser = subparsers.add_parser("sweep", help="Run a prompt with every combination of attribute values "
+                                                       "and compare latency, tokens and schema validity")
+    add_library_option(sweep_parser)
+    add_value_options(sweep_parser)
+    sweep_parser.add_argument("--grid", action="append", metavar="NAME=V1,V2",
+                              help="Values to try for an attribute, e.g. temperature=0,0.7 or "
+                                   "venice_parameters.enable_web_search=off,auto")
+    sweep_parser.add_argument("--range", action="append", metavar="NAME=START:STOP:STEP",
+                              help="Evenly spaced values to try, both ends included, e.g. top_p=0.5:1:0.25")
+    sweep_parser.add_argument("--samples", type=int, default=1, help="Requests per combination")
+    sweep_parser.add_argument("--concurrency", type=int, default=4, help="Requests sent at the same time")
+    sweep_parser.add_argument("--max-requests", type=int, default=1000, help="Refuse sweeps with more requests")
+    sweep_parser.add_argument("--min-valid", type=float, default=1.0,
+                              help="Share of responses that must match the response schema for a "
+                                   "combination to count as the fastest")
+    sweep_parser.add_argument("--csv", action="store_true", help="Print the results as CSV")
+    sweep_parser.add_argument("--model", help="Model to use (default: model from Settings)")
+    sweep_parser.add_argument("--no-history", action="store_true", help="Do not record the runs in the run history")
+    sweep_parser.add_argument("--history", help=argparse.SUPPRESS)
+    sweep_parser.set_defaults(func=cmd_sweep)
+
+    history_parser = subparsers.add_parser("history", help="List past runs or show one of them")
+    history_parser.add_argument("--history", help="History database (default: next to the settings file)")
+    history_parser.add_argument("--prompt", help="Only runs of this prompt")
+    history_parser.add_argument("--model", help="Only runs with this model")
+    history_parser.add_argument("--status", choices=["ok", "error"], help="Only runs with this status")
+    history_parser.add_argument("--limit", type=int, default=50, help="Number of runs to list")
+    history_parser.add_argument("--before", type=int, metavar="ID", help="List runs older than this run id")
+    history_parser.add_argument("--show", type=int, metavar="ID", help="Print one run with its full response")
+    history_parser.set_defaults(func=cmd_history)
+
+    eval_parser = subparsers.add_parser("eval", help="Score prompts against golden sets; fails on regressions")
+    add_library_option(eval_parser)
+    eval_parser.add_argument("suites", help="Eval file with golden cases per prompt")
+    selection = eval_parser.add_mutually_exclusive_group()
+    selection.add_argument("--prompt", help="Only this prompt")
+    selection.add_argument("--subtype", help="Every prompt with this subtype, e.g. evaluate")
+    eval_parser.add_argument("--model", help="AI model (default: the default model in Settings)")
+    eval_parser.add_argument("--concurrency", type=int, default=8, help="Cases sent at the same time")
+    eval_parser.add_argument("--baseline", help="Baseline scores to compare with")
+    eval_parser.add_argument("--update-baseline", action="store_true",
+                             help="Save the scores to --baseline when nothing regressed")
+    eval_parser.add_argument("--tolerance", type=float, default=0.0, help="Allowed drop of a prompt's mean score")
+    eval_parser.add_argument("--min-score", type=float, default=0.0, help="Fail when a prompt's mean score is lower")
+    eval_parser.add_argument("--json", action="store_true", help="Print every case's result as JSON")
+    eval_parser.add_argument("--no-history", action="store_true", help="Do not record the runs in the run history")
+    eval_parser.add_argument("--history", help=argparse.SUPPRESS)
+    eval_parser.set_defaults(func=cmd_eval)
+
+    analytics_parser = subparsers.add_parser("analytics", help="Latency, throughput and error rates from the run history")
+    analytics_parser.add_argument("--history", help="History database (default: next to the settings file)")
+    analytics_parser.add_argument("--by", choices=["model", "prompt"], default="model", help="Group runs by")
+    analytics_parser.add_argument("--window", choices=["1h", "24h", "7d", "all"], default="all",
+                                  help="Only runs from this long ago")
+    analytics_parser.add_argument("--format", choices=["table", "csv", "json"], default="table", help="Output format")
+    analytics_parser.set_defaults(func=cmd_analytics)
+
+    validate_parser = subparsers.add_parser("validate", help="Check the library for problems")
+    add_library_option(validate_parser)
+    validate_parser.add_argument("--check-models", action="store_true",
+                                 help="Also check prompts against the model list (needs the API)")
+    validate_parser.add_argument("--model", help="Model to check against (default: the default model in Settings)")
+    validate_parser.add_argument("--strict", action="store_true", help="Fail on warnings as well as errors")
+    validate_parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    validate_parser.set_defaults(func=cmd_validate)
+
+    backups_parser = subparsers.add_parser("backups", help="List or restore saved versions of the library")
+    add_library_option(backups_parser)
+    backups_parser.add_argument("--restore", metavar="HASH", help="Restore the backup whose hash starts with HASH")
+    backups_parser.add_argument("-o", "--output", help="Write the restored library here instead of stdout")
+    backups_parser.set_defaults(func=cmd_backups)
+
+    imports_parser = subparsers.add_parser("check-imports", help="Check startup import times against the tracked budget")
+    imports_parser.add_argument("--repeat", type=int, default=3, help="Imports per module; the fastest is used")
+    imports_parser.set_defaults(func=cmd_check_imports)
+
+    benchmark_parser = subparsers.add_parser("benchmark",
+                                             help="Measure library memory use, file formats and editor latency")
+    benchmark_parser.add_argument("subject", choices=["records", "formats", "editor"],
+                                  help="records: memory per prompt, dicts vs records; "
+                                       "formats: size, save and load time, JSON vs binary; "
+                                       "editor: keystroke latency on a large prompt (needs PySide6)")
+    benchmark_parser.add_argument("--count", type=int,
+                                  help="Number of prompts (default: 100000; formats: 1000, 10000 and 100000) "
+                                       "or keystrokes (editor, default: 200)")
+    benchmark_parser.add_argument("--size-mb", type=float, default=5.0, help="Prompt size for editor (default: 5)")
+    benchmark_parser.set_defaults(func=cmd_benchmark)
+
+    convert_parser = subparsers.add_parser("convert", help="Convert a library between JSON and binary (.crpl)")
+    convert_parser.add_argument("source", help="Library to read, either format")
+    convert_parser.add_argument("destination", help="Library to write; .crpl writes the binary format")
+    convert_parser.set_defaults(func=cmd_convert)
+
+    trace_parser = subparsers.add_parser("trace", help="Summarize a trace written with CRPM_TRACE=FILE")
+    trace_parser.add_argument("trace", help="Chrome trace JSON file")
+    trace_parser.add_argument("--limit", type=int, default=20, help="Spans to show, slowest total first")
+    trace_parser.set_defaults(func=cmd_trace)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format='%(name)s - %(levelname)s - %(message)s',
+    )
+
+    configure_from_env()
+    try:
+        with tracer.span(f"cli.{args.command}", "cli"):
+            return args.func(args)
+    except (KeyError, ValueError, OSError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
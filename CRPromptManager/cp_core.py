@@ -1,10 +1,12 @@
 # cp_core.py
+from bisect import bisect_left
+from dataclasses import dataclass
 import logging
 
 # Logger Configuration
 logger = logging.getLogger(__name__)
 
-from WrapAI import VeniceModels
+from cp_trace import span
 
 # Constants and Values
 prompt_roles = ["user", "system"]
@@ -35,7 +37,46 @@ MODEL_ATTRIBUTES_STRING = "model_attributes_string"
 def display_label(ptype: str) -> str:
     return ptype.capitalize()
 
+@dataclass(frozen=True)
+class CatalogDiff:
+    """Model ids added, removed and changed between two model catalogs."""
+    added: tuple[str, ...] = ()
+    removed: tuple[str, ...] = ()
+    changed: tuple[str, ...] = ()
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.changed)
+
+    def summary(self) -> str:
+        if not self:
+            return "no model changes"
+        return f"{len(self.added)} added, {len(self.removed)} removed, {len(self.changed)} changed"
+
+
+def diff_model_catalogs(old: dict, new: dict) -> CatalogDiff:
+    old = old or {}
+    return CatalogDiff(added=tuple(sorted(new.keys() - old.keys())),
+                       removed=tuple(sorted(old.keys() - new.keys())),
+                       changed=tuple(sorted(model for model in new.keys() & old.keys() if new[model] != old[model])))
+
 # Helper functions
+def fetch_model_catalog(api_key) -> dict:
+    """Fetch the full model detail dict from the API; safe to call on a worker thread."""
+    from WrapAI import VeniceModels  # imported on first fetch so the headless CLI starts quickly
+    with span("models.fetch", "network") as fetch_span:
+        venice_models = VeniceModels(api_key)
+        venice_models.fetch_models()
+        full = venice_models.get_full_model_detail_dict()
+        fetch_span.set(models=len(full or {}))
+    return full
+
+def store_runtime_models(run_time, full) -> CatalogDiff:
+    """Replace the catalog held in runtime; returns what changed."""
+    diff = diff_model_catalogs(run_time.get_runtime_variable(MODEL_ATTRIBUTES_FULL), full)
+    run_time.add_runtime_variable(MODEL_ATTRIBUTES_FULL, full)
+    logger.info(f"Model details stored: {len(full)} models ({diff.summary()})")
+    return diff
+
 def populate_runtime_models(api_key, run_time, refresh=False):
     """
     Loads and stores the full detail dict in runtime.
@@ -43,42 +84,66 @@ def populate_runtime_models(api_key, run_time, refresh=False):
     """
     full = run_time.get_runtime_variable(MODEL_ATTRIBUTES_FULL)
     if refresh or not full:
-        venice_models = VeniceModels(api_key)
-        venice_models.fetch_models()
-        full = venice_models.get_full_model_detail_dict()
-        run_time.add_runtime_variable(MODEL_ATTRIBUTES_FULL, full)
-        logger.info(f"Model details stored: {len(full)} models")
+        full = fetch_model_catalog(api_key)
+        store_runtime_models(run_time, full)
     return full
 
+def model_display_text(model_id, model) -> str:
+    spec = model.get("model_spec", {})
+    caps = spec.get("capabilities", {})
+    tokens = spec.get("availableContextTokens", "N/A")
+    reasoning = caps.get("supportsReasoning", False)
+    schema = caps.get("supportsResponseSchema", False)
+    web = caps.get("supportsWebSearch", False)
+    return f"tokens: {tokens}, reasoning: {reasoning}, response_schema: {schema}, web_search: {web}"
+
 def get_available_models(api_key, run_time, refresh=False):
     # Only get the full dict now
     full_dict = populate_runtime_models(api_key, run_time, refresh=refresh)
     model_list = sorted(full_dict)
     # Build the display dict here for UI, as needed
-    display_dict = {}
-    for model_id, model in full_dict.items():
-        spec = model.get("model_spec", {})
-        caps = spec.get("capabilities", {})
-        tokens = spec.get("availableContextTokens", "N/A")
-        reasoning = caps.get("supportsReasoning", False)
-        schema = caps.get("supportsResponseSchema", False)
-        web = caps.get("supportsWebSearch", False)
-        display_dict[model_id] = (
-            f"tokens: {tokens}, reasoning: {reasoning}, response_schema: {schema}, web_search: {web}"
-        )
+    display_dict = {model_id: model_display_text(model_id, model) for model_id, model in full_dict.items()}
     return model_list, full_dict, display_dict
 
-def populate_model_combo_list(model_combobox, current_model, api_key, run_time, refresh=False):
-    model_list, _, display_dict = get_available_models(api_key, run_time, refresh=refresh)
-    model_combobox.clear()
-    for model in model_list:
-        display = f"{model} ({display_dict.get(model, '')})"
-        model_combobox.addItem(display, model)
+def update_model_combo_list(model_combobox, full_dict, current_model=None):
+    """
+    Make the combobox list the models of ``full_dict`` in sorted order, removing, inserting and
+    relabelling only the rows that differ. The selected model stays selected while it exists;
+    otherwise ``current_model`` or the first model is selected. Change signals fire only when
+    the selected model changes.
+    """
+    selected = model_combobox.currentData()
+    wanted = selected if selected in full_dict else current_model
+    was_blocked = model_combobox.blockSignals(True)
+    try:
+        for row in reversed(range(model_combobox.count())):
+            if model_combobox.itemData(row) not in full_dict:
+                model_combobox.removeItem(row)
+        rows = [model_combobox.itemData(row) for row in range(model_combobox.count())]
+        if rows != sorted(rows):  # filled by something else
+            model_combobox.clear()
+            rows = []
+        for model in sorted(full_dict):
+            display = f"{model} ({model_display_text(model, full_dict[model])})"
+            row = bisect_left(rows, model)
+            if row < len(rows) and rows[row] == model:
+                if model_combobox.itemText(row) != display:
+                    model_combobox.setItemText(row, display)
+            else:
+                model_combobox.insertItem(row, display, model)
+                rows.insert(row, model)
+        if model_combobox.currentData() != selected:
+            model_combobox.setCurrentIndex(-1)  # the selection is set below, with signals on
+    finally:
+        model_combobox.blockSignals(was_blocked)
+
+    if model_combobox.currentData() is None and model_combobox.count():
+        row = model_combobox.findData(wanted) if wanted in full_dict else -1
+        model_combobox.setCurrentIndex(max(row, 0))
 
-    if current_model in model_list:
-        model_combobox.setCurrentIndex(model_list.index(current_model))
-    else:
-        model_combobox.setCurrentIndex(0)
+def populate_model_combo_list(model_combobox, current_model, api_key, run_time, refresh=False):
+    full_dict = populate_runtime_models(api_key, run_time, refresh=refresh)
+    update_model_combo_list(model_combobox, full_dict, current_model)
 
 def get_model_attributes(model_name, api_key, run_time, refresh=False):
     """
@@ -86,4 +151,3 @@ def get_model_attributes(model_name, api_key, run_time, refresh=False):
     """
     full_dict = populate_runtime_models(api_key, run_time, refresh=refresh)
     return full_dict.get(model_name, {})
-
@@ -0,0 +1,296 @@
+# cp_eval.py
+
+"""
+Run prompts over golden sets and compare the scores with a stored baseline.
+
+An eval file maps prompt names to suites of cases and the scorer that grades them::
+
+    {"suites": {
+        "Rate Answer": {
+            "scorer": {"type": "numeric", "field": "score", "tolerance": 1},
+            "cases": [
+                {"id": "good", "values": {"answer": "Paris"}, "expected": {"score": 9}},
+                {"id": "bad", "values": {"answer": "Berlin"}, "expected": {"score": 1}}
+            ]
+        }
+    }}
+
+``cases`` may also be the path of a JSON Lines file, relative to the eval file. Scorers
+return 0..1; a case passes at ``pass_score`` (default 1.0). Scorers are pluggable with
+``register_scorer``.
+
+Cases run concurrently through AsyncPromptExecutor, each sent on its own: cases with the
+same values are not coalesced, so repeated samples of a nondeterministic prompt are scored
+separately. The baseline file holds each prompt's version, mean score and passed cases;
+``EvalReport.compare`` lists what got worse.
+"""
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Optional, Union
+import asyncio
+import json
+import math
+import logging
+
+# Logger Configuration
+logger = logging.getLogger(__name__)
+
+from cp_history import prompt_version
+from cp_pipeline import parse_fields
+
+DEFAULT_PASS_SCORE = 1.0
+DEFAULT_CONCURRENCY = 8
+
+# Scorer: (response text, expected output) -> score from 0 to 1
+Scorer = Callable[[str, object], float]
+
+SCORERS: dict[str, Callable[[dict], Scorer]] = {}
+
+
+def register_scorer(name: str):
+    """Decorator for a scorer factory; the factory gets the suite's scorer spec."""
+    def decorator(factory: Callable[[dict], Scorer]):
+        SCORERS[name] = factory
+        return factory
+    return decorator
+
+
+def create_scorer(spec: Union[str, dict, None]) -> Scorer:
+    """A scorer from a spec: a scorer name or a dict with "type" and its options."""
+    if spec is None:
+        spec = {"type": "exact"}
+    elif isinstance(spec, str):
+        spec = {"type": spec}
+    factory = SCORERS.get(spec.get("type"))
+    if factory is None:
+        raise ValueError(f"Unknown scorer '{spec.get('type')}', expected one of {', '.join(sorted(SCORERS))}")
+    return factory(spec)
+
+
+def _normalize(text: str, spec: dict) -> str:
+    text = text.strip()
+    return text.lower() if spec.get("ignore_case") else text
+
+
+@register_scorer("exact")
+def exact_match(spec: dict) -> Scorer:
+    """Whole response equals the expected text, or the expected object for JSON responses."""
+    def score(text: str, expected) -> float:
+        if isinstance(expected, (dict, list)):
+            try:
+                return float(json.loads(text) == expected)
+            except ValueError:
+                return 0.0
+        return float(_normalize(text, spec) == _normalize(str(expected), spec))
+    return score
+
+
+@register_scorer("fields")
+def field_match(spec: dict) -> Scorer:
+    """Share of fields in a structured response equal to the expected ones ("fields" limits which)."""
+    def score(text: str, expected) -> float:
+        if not isinstance(expected, dict):
+            raise ValueError("The fields scorer needs an object as expected output")
+        names = spec.get("fields") or list(expected)
+        if not names:
+            return 1.0
+        actual = parse_fields(text)
+        return sum(name in actual and actual[name] == expected.get(name) for name in names) / len(names)
+    return score
+
+
+@register_scorer("numeric")
+def numeric_tolerance(spec: dict) -> Scorer:
+    """A number (the whole response, or "field" of a structured one) within "tolerance" of the expected one."""
+    tolerance = float(spec.get("tolerance", 0))
+    field_name = spec.get("field")
+
+    def score(text: str, expected) -> float:
+        actual = parse_fields(text).get(field_name) if field_name else text.strip()
+        if isinstance(expected, dict) and field_name:
+            expected = expected.get(field_name)
+        try:
+            actual, expected = float(actual), float(expected)
+        except (TypeError, ValueError):
+            return 0.0
+        return float(math.isfinite(actual) and abs(actual - expected) <= tolerance)
+    return score
+
+
+@dataclass
+class EvalCase:
+    id: str
+    values: dict
+    expected: object
+
+
+@dataclass
+class EvalSuite:
+    prompt: str
+    cases: list[EvalCase]
+    scorer_spec: Union[str, dict, None] = None
+    pass_score: float = DEFAULT_PASS_SCORE
+
+    @classmethod
+    def from_dict(cls, prompt: str, data: dict, base_dir: Path = Path(".")) -> "EvalSuite":
+        cases = data.get("cases", [])
+        if isinstance(cases, str):
+            with open(base_dir / cases, encoding="utf-8") as file:
+                cases = [json.loads(line) for line in file if line.strip()]
+        return cls(
+            prompt=prompt,
+            cases=[EvalCase(str(case.get("id", index)), case.get("values", {}), case.get("expected"))
+                   for index, case in enumerate(cases)],
+            scorer_spec=data.get("scorer"),
+            pass_score=data.get("pass_score", DEFAULT_PASS_SCORE),
+        )
+
+
+def load_suites(file_path: Union[str, Path]) -> dict[str, EvalSuite]:
+    path = Path(file_path)
+    with open(path, encoding="utf-8") as file:
+        data = json.load(file)
+    return {prompt: EvalSuite.from_dict(prompt, suite, path.parent) for prompt, suite in data.get("suites", {}).items()}
+
+
+@dataclass
+class CaseResult:
+    id: str
+    score: float
+    passed: bool
+    output: str = ""
+    error: Optional[str] = None
+
+
+@dataclass
+class PromptReport:
+    prompt: str
+    version: str
+    cases: list[CaseResult]
+    error: Optional[str] = None  # the suite could not run; every case failed with it
+
+    @property
+    def score(self) -> float:
+        return sum(case.score for case in self.cases) / len(self.cases) if self.cases else 0.0
+
+    @property
+    def passed(self) -> int:
+        return sum(case.passed for case in self.cases)
+
+
+@dataclass
+class EvalReport:
+    prompts: dict[str, PromptReport] = field(default_factory=dict)
+
+    @property
+    def failed_suites(self) -> list[str]:
+        return [name for name, report in self.prompts.items() if report.error]
+
+    def to_baseline(self) -> dict:
+        """Scores of the suites that ran; a suite that could not run keeps its previous baseline."""
+        return {name: {"version": report.version, "score": report.score,
+                       "passed": sorted(case.id for case in report.cases if case.passed)}
+                for name, report in self.prompts.items() if not report.error}
+
+    def save_baseline(self, file_path: Union[str, Path], merge: bool = True):
+        """Write the scores as the new baseline; other prompts in an existing file are kept."""
+        baseline = load_baseline(file_path) if merge else {}
+        baseline.update(self.to_baseline())
+        with open(file_path, "w", encoding="utf-8") as file:
+            json.dump(baseline, file, indent=4, sort_keys=True)
+
+    def compare(self, baseline: dict, tolerance: float = 0.0) -> list[str]:
+        """Regressions against a baseline: lower mean scores and cases that no longer pass."""
+        regressions = []
+        for name, report in self.prompts.items():
+            previous = baseline.get(name)
+            if previous is None:
+                continue
+            if report.score < previous.get("score", 0.0) - tolerance:
+                regressions.append(f"{name}: score {report.score:.3f} is below the baseline "
+                                   f"{previous['score']:.3f} (version {previous.get('version', '?')})")
+            current_ids = {case.id: case for case in report.cases}
+            for case_id in previous.get("passed", []):
+                case = current_ids.get(case_id)
+                if case is not None and not case.passed:
+                    reason = case.error or f"score {case.score:.2f}"
+                    regressions.append(f"{name}: case '{case_id}' no longer passes ({reason})")
+        return regressions
+
+
+def load_baseline(file_path: Union[str, Path]) -> dict:
+    try:
+        with open(file_path, encoding="utf-8") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+class EvalRunner:
+    """Runs suites with one shared AsyncPromptExecutor, so all cases share the concurrency limit."""
+    def __init__(self, library, api_key: Optional[str] = None, model: Optional[str] = None,
+                 max_concurrency: int = DEFAULT_CONCURRENCY, call=None, history=None):
+        self.library = library
+        self.api_key = api_key
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.call = call
+        self.history = history
+
+    def run(self, suites: list[EvalSuite]) -> EvalReport:
+        return asyncio.run(self.run_async(suites))
+
+    async def run_async(self, suites: list[EvalSuite]) -> EvalReport:
+        from cp_async import AsyncPromptExecutor
+
+        kwargs = {"model": self.model} if self.model else {}
+        # Cases with the same values are repeated samples of the prompt, each to be sent and scored
+        async with AsyncPromptExecutor(self.library, self.api_key, max_concurrency=self.max_concurrency,
+                                       call=self.call, history=self.history, coalesce=False, **kwargs) as executor:
+            reports = await asyncio.gather(*(self._run_suite(executor, suite) for suite in suites))
+        return EvalReport({report.prompt: report for report in reports})
+
+    async def _run_suite(self, executor, suite: EvalSuite) -> PromptReport:
+        # Reported as a failed suite rather than raised, which would abort every other suite
+        if suite.prompt not in self.library:
+            return self._failed_suite(suite, f"Prompt '{suite.prompt}' not found")
+        try:
+            scorer = create_scorer(suite.scorer_spec)
+        except ValueError as e:
+            return self._failed_suite(suite, str(e))
+        version = prompt_version(self.library.prompts[suite.prompt])
+        results = await executor.run_many([(suite.prompt, case.values) for case in suite.cases],
+                                          return_exceptions=True)
+
+        cases = []
+        for case, result in zip(suite.cases, results):
+            if isinstance(result, Exception):
+                cases.append(CaseResult(case.id, 0.0, False, error=str(result)))
+                continue
+            try:
+                score = scorer(result.text, case.expected)
+            except ValueError as e:
+                cases.append(CaseResult(case.id, 0.0, False, result.text, error=str(e)))
+                continue
+            cases.append(CaseResult(case.id, score, score >= suite.pass_score, result.text))
+        logger.info(f"{suite.prompt}: {sum(c.passed for c in cases)}/{len(cases)} case(s) passed")
+        return PromptReport(suite.prompt, version, cases)
+
+    def _failed_suite(self, suite: EvalSuite, error: str) -> PromptReport:
+        logger.warning(f"{suite.prompt}: {error}")
+        version = prompt_version(self.library.prompts[suite.prompt]) if suite.prompt in self.library else ""
+        return PromptReport(suite.prompt, version, [CaseResult(case.id, 0.0, False, error=error) for case in suite.cases],
+                            error=error)
+
+
+def select_suites(library, suites: dict[str, EvalSuite], prompt: Optional[str] = None,
+                  subtype: Optional[str] = None) -> tuple[list[EvalSuite], list[str]]:
+    """Suites to run and the selected prompts that have no golden set."""
+    if prompt:
+        names = [prompt]
+    elif subtype:
+        names = [name for name in library.names() if library.prompts[name].get("subtype") == subtype]
+    else:
+        names = list(suites)
+    return [suites[name] for name in names if name in suites], [name for name in names if name not in suites]
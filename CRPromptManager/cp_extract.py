@@ -0,0 +1,157 @@
+# cp_extract.py
+
+"""
+Extract file placeholder text in a separate process.
+
+FILE_HANDLERS parse PDFs, DOCX and the like in pure Python. Run in the editor process
+that holds the GIL and can hang or crash the editor on a bad file. ``FileExtractor`` runs
+each extraction in a short-lived worker process with a timeout and an address space cap;
+a worker that runs out of time or memory is stopped and the placeholder gets an error
+marker, the same way read_file_placeholder reports unreadable files.
+
+Large results come back through shared memory instead of being pickled through the pipe.
+
+``CachedFileReader`` keeps extracted text for the session, keyed by the file's path, size
+and modification time and held against the memory budget, so running a prompt again with
+the same files does not extract them again.
+"""
+
+from multiprocessing import shared_memory
+from pathlib import Path
+from typing import Callable, Optional, Union
+import multiprocessing
+import threading
+import logging
+
+# Logger Configuration
+logger = logging.getLogger(__name__)
+
+from cp_render import read_file_placeholder
+from cp_memory import BudgetedLRU, PRIORITY_NORMAL, text_size
+
+DEFAULT_TIMEOUT = 120.0          # seconds per file
+DEFAULT_MEMORY_LIMIT_MB = 2048   # address space of a worker process (not enforced on Windows)
+DEFAULT_MAX_WORKERS = 2
+SHARED_MEMORY_THRESHOLD = 1 << 20  # results from 1 MiB up are passed through shared memory
+
+# Placeholder text for files that could not be read; never cached
+ERROR_MARKERS = ("[Missing file: ", "[Unsupported file type: ", "[Error reading file: ", "[Timed out reading file: ")
+
+# Worker messages
+_MESSAGE_TEXT = "text"
+_MESSAGE_SHARED = "shared"
+
+
+def _limit_memory(limit_bytes: Optional[int]):
+    if not limit_bytes:
+        return
+    try:
+        import resource
+    except ImportError:
+        return  # Windows
+    resource.setrlimit(resource.RLIMIT_AS, (limit_bytes, limit_bytes))
+
+
+def _extract_worker(file_path: str, reader: Callable[[str], str], limit_bytes: Optional[int], connection):
+    """Runs in the worker process."""
+    _limit_memory(limit_bytes)
+    text = reader(file_path)
+    data = text.encode("utf-8")
+    if len(data) < SHARED_MEMORY_THRESHOLD:
+        connection.send((_MESSAGE_TEXT, text))
+    else:
+        block = shared_memory.SharedMemory(create=True, size=len(data))
+        block.buf[:len(data)] = data
+        connection.send((_MESSAGE_SHARED, block.name, len(data)))
+        block.close()  # the parent unlinks it after reading
+    connection.close()
+
+
+def _receive_text(message) -> str:
+    if message[0] == _MESSAGE_TEXT:
+        return message[1]
+
+    _, name, size = message
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        view = block.buf[:size]
+        try:
+            return str(view, "utf-8")  # decode straight from the shared block
+        finally:
+            view.release()
+    finally:
+        block.close()
+        block.unlink()
+
+
+class FileExtractor:
+    """
+    Reads file placeholders like read_file_placeholder, one worker process per file and at
+    most ``max_workers`` at a time. Thread safe; call read() from worker threads, not the GUI thread.
+    """
+    def __init__(self, timeout: float = DEFAULT_TIMEOUT, memory_limit_mb: Optional[int] = DEFAULT_MEMORY_LIMIT_MB,
+                 max_workers: int = DEFAULT_MAX_WORKERS, reader: Callable[[str], str] = read_file_placeholder):
+        self.timeout = timeout
+        self.memory_limit_mb = memory_limit_mb
+        self.reader = reader  # must be importable by name in the worker process
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self._context = multiprocessing.get_context("spawn")  # never fork a process running Qt threads
+
+    def read(self, file_path: Union[str, Path]) -> str:
+        path = Path(file_path)
+        if not path.exists():
+            return f"[Missing file: {path.name}]"
+
+        limit_bytes = self.memory_limit_mb * 1024 * 1024 if self.memory_limit_mb else None
+        with self._slots:
+            receiver, sender = self._context.Pipe(duplex=False)
+            process = self._context.Process(target=_extract_worker, args=(str(path), self.reader, limit_bytes, sender),
+                                            name=f"extract-{path.name}", daemon=True)
+            process.start()
+            sender.close()
+            try:
+                if not receiver.poll(self.timeout):
+                    process.terminate()
+                    logger.error(f"Reading {path} timed out after {self.timeout:.0f}s")
+                    return f"[Timed out reading file: {path.name}]"
+                message = receiver.recv()
+            except EOFError:
+                # The worker died without answering: crash, memory cap or handler error
+                process.join()
+                logger.error(f"Reading {path} failed, worker exit code {process.exitcode}")
+                return f"[Error reading file: {path.name}]"
+            finally:
+                receiver.close()
+                process.join()
+
+        return _receive_text(message)
+
+    __call__ = read
+
+
+class CachedFileReader:
+    """A file placeholder reader that remembers extracted text until the file changes."""
+    def __init__(self, reader: Callable[[str], str] = read_file_placeholder):
+        self.reader = reader
+        # path -> ((size, mtime), text); a changed file replaces its old entry
+        self.cache = BudgetedLRU("Extracted files", PRIORITY_NORMAL, sizer=lambda entry: text_size(entry[1]))
+
+    def read(self, file_path: Union[str, Path]) -> str:
+        path = Path(file_path)
+        try:
+            stat = path.stat()
+            key = str(path.resolve())
+        except OSError:
+            return self.reader(str(file_path))
+        stamp = (stat.st_size, stat.st_mtime_ns)
+        entry = self.cache.get(key)
+        if entry is not None and entry[0] == stamp:
+            return entry[1]
+        text = self.reader(str(file_path))
+        if text.startswith(ERROR_MARKERS):
+            self.cache.pop(key)
+        else:
+            self.cache.put(key, (stamp, text))
+        return text
+
+    __call__ = read
@@ -0,0 +1,295 @@
+# cp_history.py
+
+"""
+Append-only run history in SQLite.
+
+Every run stores its summary columns (prompt, prompt version, model, time, latency, token
+usage, status) next to a zlib-compressed JSON payload with everything needed to show the
+result again: prompt text, system prompt, parameters, response, think text, citations and
+the raw usage. Browsing only reads the indexed summary columns and pages by id, so it stays
+fast with hundreds of thousands of runs; a payload is only read when a run is opened.
+
+Old runs are dropped, oldest first, when the payloads exceed the size budget.
+"""
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional, Union
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+import logging
+
+# Logger Configuration
+logger = logging.getLogger(__name__)
+
+HISTORY_FILE_NAME = "run_history.sqlite3"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024  # payload budget before the oldest runs are dropped
+PRUNE_EVERY = 100                      # inserts between retention checks
+DEFAULT_PAGE_SIZE = 200
+
+STATUS_OK = "ok"
+STATUS_ERROR = "error"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created REAL NOT NULL,
+    prompt_name TEXT NOT NULL,
+    prompt_version TEXT NOT NULL,
+    model TEXT NOT NULL,
+    response_type TEXT NOT NULL,
+    status TEXT NOT NULL,
+    latency REAL,
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER,
+    cached_tokens INTEGER,
+    ttft REAL,
+    size INTEGER NOT NULL,
+    payload BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_prompt ON runs (prompt_name, id);
+CREATE INDEX IF NOT EXISTS runs_version ON runs (prompt_version, id);
+CREATE INDEX IF NOT EXISTS runs_model ON runs (model, id);
+CREATE INDEX IF NOT EXISTS runs_created ON runs (created);
+"""
+
+_SUMMARY_COLUMNS = ("id, created, prompt_name, prompt_version, model, response_type, status, latency, "
+                    "prompt_tokens, completion_tokens, cached_tokens, ttft")
+
+
+def prompt_version(prompt_data: dict) -> str:
+    """Short hash of a stored prompt; runs of the same prompt text and settings share it."""
+    from cp_record import to_json_object
+    payload = json.dumps(to_json_object(prompt_data), sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def default_history_path() -> Path:
+    """The history database next to the application's INI file."""
+    from WrapConfig import RuntimeConfig
+    return Path(RuntimeConfig().ini_file_name).resolve().parent / HISTORY_FILE_NAME
+
+
+@dataclass
+class RunRecord:
+    id: int
+    created: float
+    prompt_name: str
+    prompt_version: str
+    model: str
+    response_type: str
+    status: str
+    latency: Optional[float] = None
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    cached_tokens: Optional[int] = None
+    ttft: Optional[float] = None  # time to first token, when the response reports it
+    details: dict = field(default_factory=dict)  # payload, only filled by RunHistory.get
+
+
+@dataclass
+class HistoryFilter:
+    prompt_name: Optional[str] = None
+    prompt_version: Optional[str] = None
+    model: Optional[str] = None
+    status: Optional[str] = None
+    since: Optional[float] = None
+    until: Optional[float] = None
+
+    def where(self) -> tuple[str, list]:
+        clauses, params = [], []
+        for column in ("prompt_name", "prompt_version", "model", "status"):
+            value = getattr(self, column)
+            if value:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if self.since is not None:
+            clauses.append("created >= ?")
+            params.append(self.since)
+        if self.until is not None:
+            clauses.append("created < ?")
+            params.append(self.until)
+        return " AND ".join(clauses), params
+
+
+class RunHistory:
+    """Thread safe; runs can be recorded from worker threads."""
+    def __init__(self, db_path: Union[str, Path], max_bytes: int = DEFAULT_MAX_BYTES):
+        self.db_path = Path(db_path)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._inserts = 0
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._connection.execute("PRAGMA auto_vacuum = INCREMENTAL")  # only applies to a new file
+        self._connection.execute("PRAGMA journal_mode = WAL")
+        self._connection.execute("PRAGMA synchronous = NORMAL")
+        self._connection.executescript(_SCHEMA)
+        self._connection.commit()
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    # Writing methods
+    def record(self, prompt_name: str, prompt_version: str, model: str, response_type: str,
+               details: dict, latency: Optional[float] = None, usage: Optional[dict] = None,
+               error: Optional[str] = None, created: Optional[float] = None, ttft: Optional[float] = None) -> int:
+        """
+        Append a run. ``details`` holds what is shown when the run is reopened (prompt_text,
+        system_prompt, parameters, response, think, citations); usage and error are added.
+        """
+        from cp_runner import cached_prompt_tokens
+
+        usage = usage or {}
+        details = dict(details, usage=usage)
+        if error:
+            details["error"] = error
+        payload = zlib.compress(json.dumps(details, default=str).encode("utf-8"), 6)
+
+        with self._lock:
+            cursor = self._connection.execute(
+                f"INSERT INTO runs (created, prompt_name, prompt_version, model, response_type, status, latency, "
+                f"prompt_tokens, completion_tokens, cached_tokens, ttft, size, payload) "
+                f"VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (time.time() if created is None else created, prompt_name, prompt_version, model or "",
+                 response_type or "", STATUS_ERROR if error else STATUS_OK, latency,
+                 usage.get("prompt_tokens"), usage.get("completion_tokens"), cached_prompt_tokens(usage),
+                 ttft, len(payload), payload))
+            self._connection.commit()
+            self._inserts += 1
+            if self._inserts % PRUNE_EVERY == 0:
+                self._prune_locked()
+            return cursor.lastrowid
+
+    def record_response(self, prompt_name: str, prompt_version: str, model: str, response_type: str,
+                        prompt_text: str, system_prompt: str, response, latency: Optional[float] = None,
+                        parameters: Optional[dict] = None, shared: bool = False) -> int:
+        """
+        Append a run from a WrapAI response object. A ``shared`` response answered a coalesced
+        request; its usage is left out, as the run that made the call already counts it.
+        """
+        details = {
+            "prompt_text": prompt_text,
+            "system_prompt": system_prompt,
+            "parameters": getattr(response, "parameters", None) or parameters or {},
+            "response": getattr(response, "response", None),
+            "think": getattr(response, "think", None),
+            "citations": getattr(response, "citations", None) or [],
+            "response_model": getattr(response, "model", None),
+        }
+        if shared:
+            details["coalesced"] = True
+        return self.record(prompt_name, prompt_version, model, response_type, details, latency=latency,
+                           usage=None if shared else getattr(response, "usage", None) or {},
+                           ttft=getattr(response, "time_to_first_token", None))
+
+    def record_call(self, prompt_name: str, prompt_version: str, model: str, response_type: str,
+                    settings, call) -> tuple[object, bool]:
+        """Send rendered settings through a cp_runner.ResponseCall, record the outcome and return it."""
+        start = time.perf_counter()
+        try:
+            response, shared = call(settings, model)
+        except Exception as e:
+            self.record(prompt_name, prompt_version, model, response_type,
+                        {"prompt_text": settings.prompt_text, "system_prompt": settings.system_prompt,
+                         "parameters": settings.attributes},
+                        latency=time.perf_counter() - start, error=str(e))
+            raise
+        self.record_response(prompt_name, prompt_version, model, response_type, settings.prompt_text,
+                             settings.system_prompt, response, latency=time.perf_counter() - start,
+                             parameters=settings.attributes, shared=shared)
+        return response, shared
+
+    def prune(self):
+        with self._lock:
+            self._prune_locked()
+
+    def _prune_locked(self):
+        total = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM runs").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        # Walk from the oldest run until enough payload bytes are covered
+        excess = total - self.max_bytes
+        freed, last_id = 0, None
+        for run_id, size in self._connection.execute("SELECT id, size FROM runs ORDER BY id"):
+            freed += size
+            last_id = run_id
+            if freed >= excess:
+                break
+        deleted = self._connection.execute("DELETE FROM runs WHERE id <= ?", (last_id,)).rowcount
+        self._connection.commit()
+        self._connection.executescript("PRAGMA incremental_vacuum;")  # execute() would free a single page
+        logger.info(f"Run history over {self.max_bytes} bytes, dropped {deleted} oldest run(s)")
+
+    # Reading methods
+    def page(self, history_filter: Optional[HistoryFilter] = None, before_id: Optional[int] = None,
+             limit: int = DEFAULT_PAGE_SIZE) -> list[RunRecord]:
+        """Newest runs first. Pass the last id of a page as ``before_id`` to get the next one."""
+        where, params = (history_filter or HistoryFilter()).where()
+        if before_id is not None:
+            where = f"{where} AND id < ?" if where else "id < ?"
+            params.append(before_id)
+        sql = f"SELECT {_SUMMARY_COLUMNS} FROM runs"
+        if where:
+            sql += f" WHERE {where}"
+        sql += " ORDER BY id DESC LIMIT ?"
+        with self._lock:
+            rows = self._connection.execute(sql, (*params, limit)).fetchall()
+        return [RunRecord(*row) for row in rows]
+
+    def iter_runs(self, since: Optional[float] = None, chunk_size: int = 5000):
+        """Every run (summary columns only) oldest first, read in chunks without holding the lock."""
+        last_id = 0
+        while True:
+            sql = f"SELECT {_SUMMARY_COLUMNS} FROM runs WHERE id > ?"
+            params = [last_id]
+            if since is not None:
+                sql += " AND created >= ?"
+                params.append(since)
+            with self._lock:
+                rows = self._connection.execute(sql + " ORDER BY id LIMIT ?", (*params, chunk_size)).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield RunRecord(*row)
+            last_id = rows[-1][0]
+
+    def count(self, history_filter: Optional[HistoryFilter] = None) -> int:
+        where, params = (history_filter or HistoryFilter()).where()
+        sql = "SELECT COUNT(*) FROM runs" + (f" WHERE {where}" if where else "")
+        with self._lock:
+            return self._connection.execute(sql, params).fetchone()[0]
+
+    def distinct(self, column: str) -> list[str]:
+        """Values of prompt_name or model for filter lists."""
+        if column not in ("prompt_name", "model"):
+            raise ValueError(f"Cannot list values of {column}")
+        with self._lock:
+            # Skip-scan over the index: one lookup per distinct value instead of a full scan
+            values, last = [], None
+            while True:
+                row = self._connection.execute(
+                    f"SELECT MIN({column}) FROM runs" + (f" WHERE {column} > ?" if last is not None else ""),
+                    () if last is None else (last,)).fetchone()
+                if row[0] is None:
+                    return values
+                last = row[0]
+                values.append(last)
+
+    def get(self, run_id: int) -> RunRecord:
+        """A run with its full details, read from the local store only."""
+        with self._lock:
+            row = self._connection.execute(
+                f"SELECT {_SUMMARY_COLUMNS}, payload FROM runs WHERE id = ?", (run_id,)).fetchone()
+        if row is None:
+            raise KeyError(f"No run with id {run_id}")
+        record = RunRecord(*row[:-1])
+        record.details = json.loads(zlib.decompress(row[-1]))
+        return record
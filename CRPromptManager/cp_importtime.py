@@ -0,0 +1,90 @@
+# cp_importtime.py
+
+"""
+Import-time budget checks based on ``python -X importtime`` output.
+
+The budgets below are tracked in git so that an increase in startup cost shows up as a
+failing ``python -m CRPromptManager check-imports`` rather than as a slow editor.
+"""
+
+from dataclasses import dataclass
+from pathlib import Path
+import subprocess
+import sys
+
+PACKAGE_DIR = Path(__file__).resolve().parent
+
+# Cumulative import time budget per entry module, in microseconds
+IMPORT_BUDGETS_US = {
+    "cp_cli": 100_000,
+}
+
+# Modules an entry module must never pull in at import time
+FORBIDDEN_IMPORTS = {
+    "cp_cli": ("PySide6", "WrapSideSix", "WrapAI", "WrapConfig"),
+    "cp_library": ("PySide6", "WrapSideSix", "WrapAI"),
+    "cp_render": ("PySide6", "WrapSideSix", "WrapAI"),
+}
+
+
+@dataclass
+class ImportTiming:
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def parse_importtime(output: str) -> list[ImportTiming]:
+    """Parse the ``import time: self | cumulative | name`` lines written to stderr."""
+    timings = []
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # header line
+        name = fields[2].rstrip()
+        stripped = name.lstrip()
+        timings.append(ImportTiming(
+            module=stripped,
+            self_us=int(fields[0]),
+            cumulative_us=int(fields[1]),
+            depth=(len(name) - len(stripped) - 1) // 2,
+        ))
+    return timings
+
+
+def measure_import(module: str) -> list[ImportTiming]:
+    """Import ``module`` in a fresh interpreter and return its import timings."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PACKAGE_DIR, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+    return parse_importtime(result.stderr)
+
+
+def check_import_budgets(budgets: dict = None, forbidden: dict = None, repeat: int = 3) -> list[str]:
+    """
+    Problems found, one message per module over budget or importing a forbidden module.
+    Each module is imported ``repeat`` times and the fastest run is compared to the budget.
+    """
+    budgets = IMPORT_BUDGETS_US if budgets is None else budgets
+    forbidden = FORBIDDEN_IMPORTS if forbidden is None else forbidden
+
+    problems = []
+    for module in sorted(set(budgets) | set(forbidden)):
+        runs = [measure_import(module) for _ in range(max(1, repeat))]
+        imported = {timing.module.split(".")[0] for timing in runs[0]}
+
+        for banned in forbidden.get(module, ()):
+            if banned in imported:
+                problems.append(f"{module}: imports {banned} at import time")
+
+        totals = [t.cumulative_us for timings in runs for t in timings if t.module == module and t.depth == 0]
+        budget = budgets.get(module)
+        if totals and budget is not None and min(totals) > budget:
+            problems.append(f"{module}: {min(totals) / 1000:.1f} ms exceeds budget of {budget / 1000:.1f} ms")
+    return problems
@@ -0,0 +1,141 @@
+# cp_include.py
+
+"""
+Prompt composition: ``[[ name ]]`` is replaced by the text of the library prompt ``name``.
+
+Included prompts are expanded recursively. Every expansion is memoized together with the
+prompts it used, so a change to one prompt only drops the cached text of the prompts that
+include it (directly or through other includes).
+"""
+
+from typing import Iterable, Optional
+import re
+import logging
+
+# Logger Configuration
+logger = logging.getLogger(__name__)
+
+from cp_memory import memory_budget, text_size, PRIORITY_LOW
+
+INCLUDE_PLACEHOLDER_RE = re.compile(r"\[\[\s*([^\[\]\n]+?)\s*\]\]")  # [[ prompt name ]]
+
+
+def get_include_placeholders(prompt_text: str) -> list[str]:
+    """Names of [[ include ]] placeholders in order of first appearance."""
+    if not isinstance(prompt_text, str) or "[[" not in prompt_text:
+        return []
+    return list(dict.fromkeys(INCLUDE_PLACEHOLDER_RE.findall(prompt_text)))
+
+
+def rename_includes(prompt_text: str, old_name: str, new_name: str) -> str:
+    """``prompt_text`` with every include of ``old_name`` pointing at ``new_name``."""
+    def replace(match):
+        if match.group(1) != old_name:
+            return match.group(0)
+        start, end = match.span(1)
+        text = match.group(0)
+        return text[:start - match.start()] + new_name + text[end - match.start():]
+
+    return INCLUDE_PLACEHOLDER_RE.sub(replace, prompt_text)
+
+
+def _prompt_text(data) -> Optional[str]:
+    """Text of a stored prompt; None for a malformed entry, which validation reports."""
+    prompt_text = data.get("prompt_text", "") if hasattr(data, "get") else None
+    return prompt_text if isinstance(prompt_text, str) else None
+
+
+class IncludeCycleError(ValueError):
+    def __init__(self, cycle: list[str]):
+        self.cycle = cycle
+        super().__init__(f"Prompt include cycle: {' -> '.join(cycle)}")
+
+
+class IncludeExpander:
+    """
+    Expands include placeholders against a prompts dict. Placeholders naming a prompt that
+    does not exist, or whose prompt_text is not text, are kept as-is, like text placeholders
+    without a value.
+    The owner of the prompts dict must call invalidate() whenever a prompt changes.
+    Cached expansions are accounted against the memory budget and dropped first when it is exceeded.
+    """
+    def __init__(self, prompts: dict):
+        self.account = memory_budget.register(self, "Include expansions", PRIORITY_LOW)
+        self.reset(prompts)
+
+    def reset(self, prompts: dict):
+        self._prompts = prompts
+        self._expanded: dict[str, str] = {}
+        self._includes: dict[str, set[str]] = {}   # prompt -> names its expansion used
+        self._includers: dict[str, set[str]] = {}  # name -> prompts whose expansion used it
+        self.account.reset()
+
+    def evict_memory(self, nbytes: int) -> int:
+        """Drop every cached expansion; they are recomputed when next used."""
+        freed = self.account.size
+        self._expanded.clear()
+        self.account.reset()
+        return freed
+
+    def expand(self, name: str) -> str:
+        """Text of prompt ``name`` with every include expanded. Raises IncludeCycleError."""
+        return self._expand(name, [])
+
+    def expand_text(self, prompt_text: str) -> str:
+        """Expand includes in text that is not (or not yet) stored in the library."""
+        return self._substitute(prompt_text, [], set())
+
+    def invalidate(self, name: str):
+        """Drop the cached expansion of ``name`` and of every prompt that includes it."""
+        pending = [name]
+        seen = set()
+        while pending:
+            current = pending.pop()
+            if current in seen:
+                continue
+            seen.add(current)
+            dropped = self._expanded.pop(current, None)
+            if dropped is not None:
+                self.account.charge(-text_size(dropped), -1)
+            pending.extend(self._includers.get(current, ()))
+
+    def _expand(self, name: str, stack: list[str]) -> str:
+        cached = self._expanded.get(name)
+        if cached is not None:
+            return cached
+        if name in stack:
+            raise IncludeCycleError(stack[stack.index(name):] + [name])
+
+        used = set()
+        stack.append(name)
+        try:
+            prompt_text = _prompt_text(self._prompts[name])
+            if prompt_text is None:
+                raise ValueError(f"Prompt '{name}' has no valid prompt_text")
+            expanded = self._substitute(prompt_text, stack, used)
+        finally:
+            stack.pop()
+
+        self._set_includes(name, used)
+        cached = name in self._expanded
+        self._expanded[name] = expanded
+        if not cached:
+            self.account.charge(text_size(expanded), 1)
+        return expanded
+
+    def _substitute(self, prompt_text: str, stack: list[str], used: set[str]) -> str:
+        def replace(match):
+            target = match.group(1)
+            used.add(target)
+            if target not in self._prompts or _prompt_text(self._prompts[target]) is None:
+                return match.group(0)
+            return self._expand(target, stack)
+
+        return INCLUDE_PLACEHOLDER_RE.sub(replace, prompt_text)
+
+    def _set_includes(self, name: str, used: Iterable[str]):
+        for target in self._includes.get(name, ()):
+            self._includers[target].discard(name)
+        self._includes[name] = set(used)
+        for target in used:
+            self._includers.setdefault(target, set()).add(name)
@@ -0,0 +1,138 @@
+# cp_index.py
+
+from collections import defaultdict
+from collections.abc import Mapping
+from dataclasses import dataclass
+from typing import Optional
+import logging
+
+# Logger Configuration
+logger = logging.getLogger(__name__)
+
+from cp_include import get_include_placeholders, rename_includes
+
+CUSTOM_SYSTEM_PROMPT_KEY = "custom_system_prompt_name"
+
+# Integrity issue kinds
+ISSUE_MISSING_REFERENCE = "missing_reference"
+ISSUE_NOT_SYSTEM_PROMPT = "not_system_prompt"
+
+
+def prompt_type(data: dict) -> str:
+    return data.get("type", "user")
+
+
+def system_prompt_reference(data: dict) -> Optional[str]:
+    """Name of the system prompt a prompt points at through custom_system_prompt_name."""
+    attributes = data.get("default_attributes")
+    if not isinstance(attributes, Mapping):
+        return None  # malformed attributes are reported by validation
+    target = attributes.get(CUSTOM_SYSTEM_PROMPT_KEY)
+    return target if isinstance(target, str) and target else None
+
+
+@dataclass
+class IntegrityIssue:
+    prompt: str
+    kind: str
+    target: str
+    message: str
+
+
+class PromptIndex:
+    """
+    Type index and reverse-reference indexes (system prompt references and includes) over a
+    library's prompts, kept up to date by the library on every add, update, rename and delete
+    instead of scanning all prompts.
+    """
+    def __init__(self):
+        self.by_type: dict[str, set[str]] = defaultdict(set)
+        self.referrers: dict[str, set[str]] = defaultdict(set)  # target -> prompts referencing it
+        self.includers: dict[str, set[str]] = defaultdict(set)  # name -> prompts including it
+        self._type_of: dict[str, str] = {}
+        self._reference_of: dict[str, str] = {}
+        self._includes_of: dict[str, list[str]] = {}
+
+    def rebuild(self, prompts: dict):
+        self.__init__()
+        for name, data in prompts.items():
+            self.add(name, data)
+
+    def add(self, name: str, data: dict):
+        ptype = prompt_type(data)
+        self.by_type[ptype].add(name)
+        self._type_of[name] = ptype
+
+        target = system_prompt_reference(data)
+        if target:
+            self.referrers[target].add(name)
+            self._reference_of[name] = target
+
+        prompt_text = data.get("prompt_text")
+        included = get_include_placeholders(prompt_text) if isinstance(prompt_text, str) else []
+        if included:
+            for target in included:
+                self.includers[target].add(name)
+            self._includes_of[name] = included
+
+    def remove(self, name: str):
+        ptype = self._type_of.pop(name, None)
+        if ptype is not None:
+            self.by_type[ptype].discard(name)
+
+        target = self._reference_of.pop(name, None)
+        if target is not None:
+            self.referrers[target].discard(name)
+            if not self.referrers[target]:
+                del self.referrers[target]
+
+        for target in self._includes_of.pop(name, ()):
+            self.includers[target].discard(name)
+            if not self.includers[target]:
+                del self.includers[target]
+
+    def names_of_type(self, ptype: str) -> list[str]:
+        return sorted(self.by_type.get(ptype, ()), key=lambda k: k.casefold())
+
+    def referrers_of(self, name: str) -> list[str]:
+        return sorted(self.referrers.get(name, ()), key=lambda k: k.casefold())
+
+    def includers_of(self, name: str) -> list[str]:
+        return sorted(self.includers.get(name, ()), key=lambda k: k.casefold())
+
+    def integrity_report(self) -> list[IntegrityIssue]:
+        """Every dangling or invalid system prompt reference, in one pass over the reference index."""
+        issues = []
+        for target, referrers in self.referrers.items():
+            target_type = self._type_of.get(target)
+            if target_type == "system":
+                continue
+            for name in referrers:
+                if target_type is None:
+                    issues.append(IntegrityIssue(name, ISSUE_MISSING_REFERENCE, target,
+                                                 f"custom system prompt '{target}' does not exist"))
+                else:
+                    issues.append(IntegrityIssue(name, ISSUE_NOT_SYSTEM_PROMPT, target,
+                                                 f"custom system prompt '{target}' is not a system prompt"))
+        return sorted(issues, key=lambda issue: issue.prompt.casefold())
+
+
+def with_system_prompt_reference(data: dict, target: Optional[str]) -> dict:
+    """Copy of ``data`` pointing at ``target``; None removes the reference."""
+    attributes = dict(data.get("default_attributes", {}))
+    if target is None:
+        attributes.pop(CUSTOM_SYSTEM_PROMPT_KEY, None)
+        venice_parameters = dict(attributes.get("venice_parameters", {}))
+        venice_parameters.pop("include_venice_system_prompt", None)
+        if venice_parameters:
+            attributes["venice_parameters"] = venice_parameters
+        else:
+            attributes.pop("venice_parameters", None)
+    else:
+        attributes[CUSTOM_SYSTEM_PROMPT_KEY] = target
+    return dict(data, default_attributes=attributes)
+
+
+def with_include_renamed(data: dict, old_name: str, new_name: str) -> dict:
+    """Copy of ``data`` whose prompt text includes ``new_name`` wherever it included ``old_name``."""
+    return dict(data, prompt_text=rename_includes(data.get("prompt_text") or "", old_name, new_name))
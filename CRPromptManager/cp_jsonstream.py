@@ -0,0 +1,235 @@
+# cp_jsonstream.py
+
+"""
+Incremental reader for prompt library files.
+
+The file is read in chunks and the ``data`` object is decoded one prompt at a time, so
+callers can show prompts while the rest of the file is still being read, and a malformed
+prompt only loses that prompt instead of the whole library.
+"""
+
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Iterator, TextIO, Union
+import hashlib
+import json
+import re
+import logging
+
+# Logger Configuration
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 1 << 16
+
+_WHITESPACE = " \t\r\n"
+_STRUCTURE_RE = re.compile(r'["{}\[\]]')   # characters that matter outside a string
+_STRING_END_RE = re.compile(r'["\\]')       # characters that matter inside a string
+_LITERAL_END_RE = re.compile(r'[,}\]\s]')
+_DECODER = json.JSONDecoder()
+
+# Events yielded by iter_library_events
+EVENT_HEADER = "header"
+EVENT_PROMPT = "prompt"
+EVENT_ERROR = "error"
+
+
+class LibraryFormatError(ValueError):
+    """The file is not a ``{"header": ..., "data": {...}}`` library at all."""
+
+
+def fingerprint(raw: str) -> str:
+    """Short hash of a prompt's source text, used to tell unchanged prompts apart cheaply."""
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class _ChunkReader:
+    def __init__(self, file, chunk_size: int):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.last_raw = ""  # source text of the value last read by decode_value
+
+    def _fill(self) -> bool:
+        """Append the next chunk; indices into the buffer stay valid."""
+        if self.eof:
+            return False
+        chunk = self.file.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf += chunk
+        return True
+
+    def _compact(self):
+        """Drop consumed text. Only called between values, never while one is being scanned."""
+        if self.pos > self.chunk_size:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+
+    def peek(self) -> str:
+        """Next non-whitespace character without consuming it ("" at end of file)."""
+        self._compact()
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char: str):
+        found = self.peek()
+        if found != char:
+            raise LibraryFormatError(f"Expected '{char}' but found '{found or 'end of file'}'")
+        self.pos += 1
+
+    def _scan(self, start: int, pattern) -> int:
+        """Index of the next ``pattern`` match at or after ``start``, reading more as needed."""
+        while True:
+            match = pattern.search(self.buf, start)
+            if match:
+                return match.start()
+            start = max(start, len(self.buf))
+            if not self._fill():
+                return -1
+
+    def _string_end(self, start: int) -> int:
+        """Index just past the closing quote of the string whose opening quote is at ``start``."""
+        index = start + 1
+        while True:
+            index = self._scan(index, _STRING_END_RE)
+            if index < 0:
+                raise LibraryFormatError("Unterminated string")
+            if self.buf[index] == '"':
+                return index + 1
+            index += 2  # skip the escaped character
+
+    def read_raw_value(self) -> str:
+        """Consume one JSON value and return its source text without decoding it."""
+        first = self.peek()
+        start = self.pos
+        if first == '"':
+            end = self._string_end(start)
+        elif first in ("{", "["):
+            depth = 0
+            index = start
+            while True:
+                index = self._scan(index, _STRUCTURE_RE)
+                if index < 0:
+                    raise LibraryFormatError("Unexpected end of file inside an object")
+                char = self.buf[index]
+                if char == '"':
+                    index = self._string_end(index)
+                    continue
+                depth += 1 if char in "{[" else -1
+                index += 1
+                if depth == 0:
+                    end = index
+                    break
+        elif first == "":
+            raise LibraryFormatError("Unexpected end of file")
+        else:
+            index = self._scan(start, _LITERAL_END_RE)
+            end = index if index >= 0 else len(self.buf)
+
+        # An escape at the very end of a chunk can leave the end index past the buffer
+        while end > len(self.buf) and self._fill():
+            pass
+        raw = self.buf[start:end]
+        self.pos = end
+        return raw
+
+    def decode_value(self):
+        """Consume and decode one JSON value; raises json.JSONDecodeError for a malformed value."""
+        self.peek()
+        start = self.pos
+        try:
+            # Fast path: the whole value is already buffered
+            value, end = _DECODER.raw_decode(self.buf, start)
+            if end < len(self.buf):
+                self.last_raw = self.buf[start:end]
+                self.pos = end
+                return value
+        except json.JSONDecodeError:
+            pass  # incomplete or malformed, find its extent first
+        self.last_raw = self.read_raw_value()
+        return json.loads(self.last_raw)
+
+    def read_key(self) -> str:
+        if self.peek() != '"':
+            raise LibraryFormatError(f"Expected a quoted key but found '{self.peek() or 'end of file'}'")
+        key = json.loads(self.read_raw_value())
+        self.expect(":")
+        return key
+
+    def next_member(self, close: str) -> bool:
+        """Consume the separator after a member; False once the closing bracket is reached."""
+        char = self.peek()
+        if char == ",":
+            self.pos += 1
+            if self.peek() != close:
+                return True
+            char = close  # tolerate a trailing comma
+        if char == close:
+            self.pos += 1
+            return False
+        raise LibraryFormatError(f"Expected ',' or '{close}' but found '{char or 'end of file'}'")
+
+
+def iter_library_events(source: Union[str, Path, TextIO], chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[tuple]:
+    """
+    Yield ``("header", header)``, ``("prompt", name, data, fingerprint)`` and
+    ``("error", name, message)`` events while reading a library file or open text stream.
+    Raises LibraryFormatError if the overall structure is broken; problems inside a single
+    prompt are reported as error events. Binary (.crpl) library files are read too.
+    """
+    if not hasattr(source, "read"):
+        from cp_binlib import is_binary_library, iter_binary_events
+        if is_binary_library(source):
+            yield from iter_binary_events(source)
+            return
+
+    opened = nullcontext(source) if hasattr(source, "read") else open(source, "r", encoding="utf-8")
+    with opened as file:
+        reader = _ChunkReader(file, chunk_size)
+        reader.expect("{")
+        if reader.peek() == "}":
+            return
+
+        while True:
+            key = reader.read_key()
+            if key == "data" and reader.peek() == "{":
+                yield from _iter_data(reader)
+            else:
+                try:
+                    value = reader.decode_value()
+                    if key == "header":
+                        yield EVENT_HEADER, value
+                except json.JSONDecodeError as e:
+                    yield EVENT_ERROR, key, f"Invalid JSON: {e}"
+            if not reader.next_member("}"):
+                break
+
+
+def _iter_data(reader: _ChunkReader) -> Iterator[tuple]:
+    reader.expect("{")
+    if reader.peek() == "}":
+        reader.pos += 1
+        return
+
+    while True:
+        name = reader.read_key()
+        try:
+            data = reader.decode_value()
+        except json.JSONDecodeError as e:
+            logger.debug(f"Skipping malformed prompt '{name}': {e}")
+            yield EVENT_ERROR, name, f"Invalid JSON: {e}"
+        else:
+            if isinstance(data, dict):
+                yield EVENT_PROMPT, name, data, fingerprint(reader.last_raw)
+            else:
+                yield EVENT_ERROR, name, f"Expected an object, got {type(data).__name__}"
+        if not reader.next_member("}"):
+            break
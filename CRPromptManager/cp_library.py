@@ -0,0 +1,357 @@
+# cp_library.py
+
+from pathlib import Path
+from typing import Optional, Union
+import json
+import os
+import stat
+import logging
+
+# Logger Configuration
+logger = logging.getLogger(__name__)
+
+from file_backup import BackupStore, dumps_library
+from cp_jsonstream import iter_library_events, EVENT_HEADER, EVENT_PROMPT
+from cp_sync import LibrarySnapshot, MergeResult, file_signature, merge_libraries, read_snapshot
+from cp_index import PromptIndex, IntegrityIssue, with_include_renamed, with_system_prompt_reference
+from cp_include import IncludeExpander
+from cp_record import PromptRecord, to_json_object
+from cp_binlib import BINARY_SUFFIX, dumps_binary_library, is_binary_library
+from cp_trace import traced
+
+_MISSING = object()
+
+
+def compact_prompt(data):
+    """The stored form of a prompt: a PromptRecord, or the value as-is if it is not an object."""
+    return PromptRecord.from_json(data) if isinstance(data, dict) else data
+
+
+@traced("library.serialize", "library")
+def dumps_library_file(file_path: Union[str, Path], header: dict, prompts: dict) -> bytes:
+    """The file content for a library: binary for ``.crpl`` files, indented JSON otherwise."""
+    doc = {"header": header, "data": {name: to_json_object(data) for name, data in prompts.items()}}
+    if Path(file_path).suffix.lower() == BINARY_SUFFIX:
+        return dumps_binary_library(doc)
+    return dumps_library(doc)
+
+
+@traced("library.write", "library")
+def write_file_durably(file_path: Union[str, Path], content: bytes):
+    """
+    Replace a file so that it is either the old or the new content, even after a crash:
+    the content is written to a temporary file next to it, synced, and renamed over it.
+    """
+    file_path = Path(file_path)
+    temp_path = file_path.with_name(f".{file_path.name}.{os.getpid()}.tmp")
+    try:
+        with open(temp_path, "wb") as file:
+            file.write(content)
+            file.flush()
+            os.fsync(file.fileno())
+        if file_path.exists():
+            os.chmod(temp_path, stat.S_IMODE(os.stat(file_path).st_mode))
+        os.replace(temp_path, file_path)
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
+
+    if hasattr(os, "O_DIRECTORY"):  # make the rename itself durable; not possible on Windows
+        directory = os.open(file_path.parent, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(directory)
+        finally:
+            os.close(directory)
+
+
+def default_header() -> dict:
+    return {
+        "app_name": "",
+        "data_version": "",
+        "file_type": ""
+    }
+
+
+class PromptLibrary:
+    """
+    Headless prompt library: the ``{"header": ..., "data": ...}`` JSON file used by the editor.
+    Holds no Qt state so it can be shared by the GUI and the command line.
+    """
+    def __init__(self, file_path: Optional[Union[str, Path]] = None):
+        self.file_path = Path(file_path) if file_path else None
+        self.header = default_header()
+        self.index = PromptIndex()
+        self._prompts: dict = {}
+        self.includes = IncludeExpander(self._prompts)  # memoized [[ include ]] expansion
+        self.load_errors: list[tuple[str, str]] = []  # (prompt name, message) skipped on the last load
+        self._backup_store: Optional[BackupStore] = None
+        self._original_backed_up: Optional[Path] = None
+        self.base = LibrarySnapshot()  # the version last read from or written to disk
+        self.revision = 0        # incremented by every change to the prompts
+        self.saved_revision = 0  # the revision last read from or written to disk
+
+    @classmethod
+    def from_file(cls, file_path: Union[str, Path]) -> "PromptLibrary":
+        library = cls(file_path)
+        library.load()
+        return library
+
+    @property
+    def prompts(self) -> dict:
+        """
+        Prompt data by name, as read-only PromptRecord mappings. Change single prompts through
+        add/update/rename/delete.
+        """
+        return self._prompts
+
+    @prompts.setter
+    def prompts(self, prompts: dict):
+        prompts = {name: compact_prompt(data) for name, data in prompts.items()}
+        self._prompts = prompts
+        self.index.rebuild(prompts)
+        self.includes.reset(prompts)
+        self.revision += 1
+
+    @property
+    def dirty(self) -> bool:
+        """True if the prompts changed since they were last loaded or saved."""
+        return self.revision != self.saved_revision
+
+    # IO methods
+    @traced("library.load", "library")
+    def load(self, file_path: Optional[Union[str, Path]] = None):
+        """Read the library file, replacing the prompts held in memory."""
+        if file_path:
+            self.file_path = Path(file_path)
+        if not self.file_path:
+            raise ValueError("No prompt library file set")
+
+        self.load_errors = []
+        signature = file_signature(self.file_path)
+        if is_binary_library(self.file_path):
+            data = self._load_entries()
+        else:
+            data = self._load_json()
+
+        self.prompts = data.get("data", {})
+        self.header = data.get("header", default_header())
+        self.base = LibrarySnapshot(header=dict(self.header), prompts=dict(self.prompts), signature=signature)
+        self.saved_revision = self.revision
+        logger.info(f"Loaded {len(self.prompts)} prompts from {self.file_path}")
+
+    def _load_json(self) -> dict:
+        try:
+            with open(self.file_path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+        except json.JSONDecodeError as e:
+            # Salvage the well-formed prompts and report the rest individually
+            logger.warning(f"{self.file_path} is not valid JSON ({e}), loading prompt by prompt")
+            return self._load_entries()
+        if not isinstance(data, dict) or not isinstance(data.get("data", {}), dict):
+            raise ValueError(f"{self.file_path} is not a prompt library")
+
+        # Entries that are not objects are skipped and reported, as by the streaming reader
+        prompts = {}
+        for name, entry in data.get("data", {}).items():
+            if isinstance(entry, dict):
+                prompts[name] = entry
+            else:
+                self.load_errors.append((name, f"Expected an object, got {type(entry).__name__}"))
+        return dict(data, data=prompts)
+
+    def _load_entries(self) -> dict:
+        data = {"header": default_header(), "data": {}}
+        for event in iter_library_events(self.file_path):
+            if event[0] == EVENT_HEADER:
+                data["header"] = event[1]
+            elif event[0] == EVENT_PROMPT:
+                data["data"][event[1]] = event[2]
+            else:
+                self.load_errors.append((event[1], event[2]))
+        return data
+
+    def to_json_dict(self) -> dict:
+        return {
+            "header": self.header,
+            "data": {name: to_json_object(data) for name, data in self.prompts.items()}
+        }
+
+    @property
+    def backup_store(self) -> BackupStore:
+        if self._backup_store is None or self._backup_store.file_path != self.file_path:
+            if self._backup_store is not None:
+                self._backup_store.flush()
+            self._backup_store = BackupStore(self.file_path)
+        return self._backup_store
+
+    def backup_original(self):
+        """Before the first save to a file without backups, keep the version that is on disk."""
+        if self._original_backed_up == self.file_path:
+            return
+        if not self.backup_store.snapshots() and self.file_path.exists():
+            self.backup_store.submit(self.file_path.read_bytes())
+        self._original_backed_up = self.file_path
+
+    @traced("library.save", "library")
+    def save(self, file_path: Optional[Union[str, Path]] = None, backup: bool = True):
+        """Write header and prompts to the library file and snapshot it in the background."""
+        if file_path:
+            self.file_path = Path(file_path)
+        if not self.file_path:
+            raise ValueError("No prompt library file set")
+
+        header, prompts = dict(self.header), dict(self.prompts)
+        content = dumps_library_file(self.file_path, header, prompts)
+        if backup:
+            self.backup_original()
+
+        write_file_durably(self.file_path, content)
+        self.mark_saved(self.revision, header, prompts, file_signature(self.file_path), content if backup else None)
+        logger.info(f"Saved {len(self.prompts)} prompts to {self.file_path}")
+
+    def mark_saved(self, revision: int, header: dict, prompts: dict, signature, content: Optional[bytes] = None) -> bool:
+        """
+        Record that the library as of ``revision`` was written to the file, for saves made
+        elsewhere (cp_autosave). ``content`` is also snapshotted to the backup store. Returns
+        False for a write older than the last recorded one, which changes nothing.
+        """
+        if revision < self.saved_revision:
+            return False
+        self.saved_revision = revision
+        self.base = LibrarySnapshot(header=header, prompts=prompts, signature=signature)
+        if content is not None:
+            self.backup_store.submit(content)
+        return True
+
+    # External change methods
+    def changed_on_disk(self) -> bool:
+        """True if the file was modified since this library last read or wrote it."""
+        if not self.file_path:
+            return False
+        return file_signature(self.file_path) != self.base.signature
+
+    def merge_from_disk(self, theirs: Optional[LibrarySnapshot] = None) -> MergeResult:
+        """
+        Merge the version on disk into memory. Non-conflicting changes are applied; conflicting
+        prompts keep the in-memory version until resolve_conflict is called.
+        """
+        if theirs is None:
+            theirs = read_snapshot(self.file_path)
+        theirs.prompts = {name: compact_prompt(data) for name, data in theirs.prompts.items()}
+        result = merge_libraries(self.base, self.header, self.prompts, theirs)
+        self.prompts = result.prompts
+        self.header = result.header
+        self.base = theirs
+        return result
+
+    def resolve_conflict(self, name: str, value: Optional[dict]):
+        """Keep ``value`` for a conflicting prompt; None deletes it."""
+        if value is None:
+            self.delete(name)
+        else:
+            self.update(name, value)
+
+    def flush_backups(self):
+        """Wait for background snapshots to finish, e.g. before the application exits."""
+        if self._backup_store is not None:
+            self._backup_store.flush()
+
+    # Lookup methods
+    def __contains__(self, name: str) -> bool:
+        return name in self.prompts
+
+    def __len__(self) -> int:
+        return len(self.prompts)
+
+    def names(self, prompt_type: Optional[str] = None) -> list[str]:
+        """Prompt names sorted case-insensitively, optionally limited to one type."""
+        if prompt_type is not None:
+            return self.index.names_of_type(prompt_type)
+        return sorted(self.prompts, key=lambda k: k.casefold())
+
+    def referrers(self, name: str) -> list[str]:
+        """Prompts that use ``name`` as their custom system prompt."""
+        return self.index.referrers_of(name)
+
+    def includers(self, name: str) -> list[str]:
+        """Prompts whose text includes ``name``."""
+        return self.index.includers_of(name)
+
+    def integrity_report(self) -> list[IntegrityIssue]:
+        return self.index.integrity_report()
+
+    def get(self, name: str) -> dict:
+        if name not in self.prompts:
+            raise KeyError(f"Prompt '{name}' not found in library")
+        return self.prompts[name]
+
+    # CRUD methods
+    def add(self, name: str, data: Optional[dict] = None):
+        if name in self.prompts:
+            raise ValueError(f"A prompt named '{name}' already exists.")
+        self.update(name, data if data is not None else {"prompt_text": "", "default_attributes": {}})
+
+    def update(self, name: str, data: dict):
+        data = compact_prompt(data)
+        if self._prompts.get(name, _MISSING) == data:
+            return
+        self.revision += 1
+        self.index.remove(name)
+        self._prompts[name] = data
+        self.index.add(name, data)
+        self.includes.invalidate(name)
+
+    def rename(self, old_name: str, new_name: str) -> list[str]:
+        """
+        Rename a prompt and point every prompt that referenced it, as custom system prompt or
+        through an include, at the new name. Returns the prompts that were rewritten.
+        """
+        if new_name in self.prompts:
+            raise ValueError(f"A prompt named '{new_name}' already exists.")
+        if old_name not in self.prompts:
+            raise KeyError(f"Prompt '{old_name}' not found in library")
+
+        # Build every rewritten prompt before changing anything
+        referrers = set(self.index.referrers_of(old_name))
+        includers = set(self.index.includers_of(old_name))
+
+        def rewrite(name: str) -> dict:
+            data = self.prompts[name]
+            if name in referrers:
+                data = with_system_prompt_reference(data, new_name)
+            if name in includers:
+                data = with_include_renamed(data, old_name, new_name)
+            return data
+
+        dependents = sorted((referrers | includers) - {old_name}, key=lambda k: k.casefold())
+        rewritten = {name: rewrite(name) for name in dependents}
+        data = rewrite(old_name)
+
+        self.revision += 1
+        self.index.remove(old_name)
+        del self._prompts[old_name]
+        self.includes.invalidate(old_name)
+        self.update(new_name, data)
+        for name, rewritten_data in rewritten.items():
+            self.update(name, rewritten_data)
+
+        if dependents:
+            logger.info(f"Renamed '{old_name}' to '{new_name}', updated {len(dependents)} referencing prompt(s)")
+        return dependents
+
+    def delete(self, name: str, detach_references: bool = False) -> list[str]:
+        """
+        Delete a prompt. With ``detach_references`` the prompts that used it as their custom
+        system prompt drop the reference. Returns the prompts that referenced it.
+        """
+        dependents = [referrer for referrer in self.index.referrers_of(name) if referrer != name]
+        if name in self._prompts:
+            self.revision += 1
+        self.index.remove(name)
+        self._prompts.pop(name, None)
+        self.includes.invalidate(name)
+
+        if detach_references:
+            for referrer in dependents:
+                self.update(referrer, with_system_prompt_reference(self.prompts[referrer], None))
+        return dependents
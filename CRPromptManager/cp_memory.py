@@ -0,0 +1,315 @@
+# cp_memory.py
+
+"""
+Memory accounting for what an editor session keeps in memory besides the library itself:
+response caches, extracted file text, include expansions, chat histories and copies of
+large prompt texts.
+
+Each of these registers with the process-wide ``memory_budget`` and gets a MemoryAccount,
+to which it charges the approximate size of what it adds and credits what it drops.
+Sizes are estimates (mostly ``sys.getsizeof`` of the strings held, which dominate), kept
+incrementally so a charge is cheap. When the total goes over the budget, owners are asked
+to free memory, lowest priority first and largest first within a priority, until the total
+is back under LOW_WATER of the budget. An owner decides what it can give up: caches drop
+their least recently used entries, a chat history keeps its latest turns.
+
+Owners are held weakly; an owner that is garbage collected leaves the accounting with it.
+
+``MemoryDiagnostics`` adds tracemalloc snapshots (allocation sites and their growth since
+the previous snapshot) for the Memory Usage dialog. tracemalloc is only started on request,
+as it slows allocations down.
+"""
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Hashable, Optional
+import os
+import sys
+import threading
+import weakref
+import logging
+
+# Logger Configuration
+logger = logging.getLogger(__name__)
+
+BUDGET_ENV = "CRPM_MEMORY_BUDGET_MB"
+DEFAULT_BUDGET_MB = 512
+LOW_WATER = 0.9  # eviction stops at this share of the budget
+
+PRIORITY_LOW = 0       # recomputed on demand: expansions, copies of text held elsewhere
+PRIORITY_NORMAL = 50   # costly to recompute: responses, extracted files
+PRIORITY_HIGH = 100    # user-visible state: chat histories
+
+
+def text_size(text) -> int:
+    """Approximate bytes held by a string (or bytes), 0 for anything else."""
+    return sys.getsizeof(text) if isinstance(text, (str, bytes)) else 0
+
+
+@dataclass(frozen=True)
+class AccountUsage:
+    name: str
+    priority: int
+    size: int
+    entries: int
+    evicted: int  # bytes freed by eviction over the session
+
+
+@dataclass(frozen=True)
+class MemoryReport:
+    limit: int
+    total: int
+    accounts: tuple[AccountUsage, ...]
+    evictions: int
+
+    def summary(self) -> str:
+        return (f"{self.total / 2**20:.1f} MB of {self.limit / 2**20:.0f} MB in {len(self.accounts)} cache(s), "
+                f"{self.evictions} eviction(s)")
+
+
+class MemoryAccount:
+    """An owner's share of the budget; created by MemoryBudget.register."""
+    def __init__(self, budget: "MemoryBudget", owner, name: str, priority: int):
+        self.budget = budget
+        self.name = name
+        self.priority = priority
+        self.size = 0
+        self.entries = 0
+        self.evicted = 0
+        self._owner = weakref.ref(owner, lambda ref: budget._release(self))
+
+    @property
+    def owner(self):
+        return self._owner()
+
+    def charge(self, size: int, entries: int = 0):
+        """Add ``size`` bytes (negative to credit); may evict from this or other owners."""
+        self.budget._charge(self, size, entries)
+
+    def reset(self, size: int = 0, entries: int = 0):
+        """Set the account to the owner's current size, e.g. after it was cleared."""
+        self.budget._charge(self, size - self.size, entries - self.entries)
+
+    def close(self):
+        self.budget._release(self)
+
+
+class MemoryBudget:
+    """
+    Process-wide memory budget. Owners implement ``evict_memory(nbytes) -> int``, freeing about
+    ``nbytes`` and returning (after crediting their account) how much they freed.
+    """
+    def __init__(self, limit: int = DEFAULT_BUDGET_MB * 2**20):
+        self._limit = limit
+        self._accounts: list[MemoryAccount] = []
+        self._total = 0
+        self._evictions = 0
+        self._lock = threading.RLock()
+        self._enforcing = False
+
+    @property
+    def limit(self) -> int:
+        return self._limit
+
+    @limit.setter
+    def limit(self, limit: int):
+        self._limit = max(0, int(limit))
+        self.enforce()
+
+    @property
+    def total(self) -> int:
+        return self._total
+
+    def register(self, owner, name: str, priority: int = PRIORITY_NORMAL) -> MemoryAccount:
+        account = MemoryAccount(self, owner, name, priority)
+        with self._lock:
+            self._accounts.append(account)
+        return account
+
+    def report(self) -> MemoryReport:
+        with self._lock:
+            accounts = tuple(AccountUsage(account.name, account.priority, account.size, account.entries,
+                                          account.evicted)
+                             for account in sorted(self._accounts, key=lambda a: (-a.size, a.name)))
+            return MemoryReport(self._limit, self._total, accounts, self._evictions)
+
+    def enforce(self, target: Optional[int] = None) -> int:
+        """Evict until the total is at most ``target`` (default: LOW_WATER of the budget); bytes freed."""
+        with self._lock:
+            if self._enforcing:
+                return 0
+            target = int(self._limit * LOW_WATER) if target is None else target
+            if self._total <= target:
+                return 0
+            self._enforcing = True
+            candidates = sorted(self._accounts, key=lambda account: (account.priority, -account.size))
+        freed = 0
+        try:
+            for account in candidates:
+                excess = self._total - target
+                if excess <= 0:
+                    break
+                owner = account.owner
+                if owner is None or account.size <= 0:
+                    continue
+                try:
+                    released = owner.evict_memory(excess)
+                except Exception as e:
+                    logger.error(f"Evicting from {account.name} failed: {e}")
+                    continue
+                if released > 0:
+                    freed += released
+                    with self._lock:
+                        account.evicted += released
+                        self._evictions += 1
+                    logger.info(f"Evicted {released / 2**20:.1f} MB from {account.name}")
+        finally:
+            with self._lock:
+                self._enforcing = False
+        return freed
+
+    def _charge(self, account: MemoryAccount, size: int, entries: int):
+        with self._lock:
+            account.size += size
+            account.entries += entries
+            if account in self._accounts:
+                self._total += size
+            over = size > 0 and self._total > self._limit
+        if over:
+            self.enforce()
+
+    def _release(self, account: MemoryAccount):
+        with self._lock:
+            if account in self._accounts:
+                self._accounts.remove(account)
+                self._total -= account.size
+
+
+def _budget_from_env() -> MemoryBudget:
+    try:
+        megabytes = float(os.environ.get(BUDGET_ENV) or DEFAULT_BUDGET_MB)
+    except ValueError:
+        logger.warning(f"{BUDGET_ENV} must be a number of megabytes, using {DEFAULT_BUDGET_MB}")
+        megabytes = DEFAULT_BUDGET_MB
+    return MemoryBudget(int(megabytes * 2**20))
+
+
+memory_budget = _budget_from_env()
+
+
+class BudgetedLRU:
+    """
+    A thread-safe mapping of strings (or values sized by ``sizer``) accounted against a budget;
+    eviction drops the least recently used entries.
+    """
+    def __init__(self, name: str, priority: int = PRIORITY_NORMAL, budget: Optional[MemoryBudget] = None,
+                 sizer: Callable[[object], int] = text_size):
+        self.sizer = sizer
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.RLock()
+        self.account = (budget or memory_budget).register(self, name, priority)
+
+    def get(self, key: Hashable, default=None):
+        with self._lock:
+            if key not in self._entries:
+                return default
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key: Hashable, value):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            self._entries[key] = value
+            delta = self._entry_size(key, value) - (self._entry_size(key, old) if old is not None else 0)
+        self.account.charge(delta, 0 if old is not None else 1)
+
+    def pop(self, key: Hashable, default=None):
+        with self._lock:
+            if key not in self._entries:
+                return default
+            value = self._entries.pop(key)
+        self.account.charge(-self._entry_size(key, value), -1)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        self.account.reset()
+
+    def items(self) -> list:
+        with self._lock:
+            return list(self._entries.items())
+
+    def __contains__(self, key) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def evict_memory(self, nbytes: int) -> int:
+        freed, count = 0, 0
+        with self._lock:
+            while self._entries and freed < nbytes:
+                key, value = self._entries.popitem(last=False)
+                freed += self._entry_size(key, value)
+                count += 1
+        self.account.charge(-freed, -count)
+        return freed
+
+    def _entry_size(self, key, value) -> int:
+        return self.sizer(value) + text_size(key)
+
+
+@dataclass(frozen=True)
+class AllocationSite:
+    location: str   # file:line
+    size: int       # bytes currently allocated there
+    count: int
+    growth: int     # bytes since the previous snapshot
+
+
+class MemoryDiagnostics:
+    """tracemalloc snapshots: top allocation sites and their growth since the last snapshot."""
+    def __init__(self, frames: int = 1):
+        self.frames = frames
+        self._previous = None
+
+    @property
+    def tracing(self) -> bool:
+        import tracemalloc
+        return tracemalloc.is_tracing()
+
+    def start(self):
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._previous = None
+            logger.info("tracemalloc started")
+
+    def stop(self):
+        import tracemalloc
+        tracemalloc.stop()
+        self._previous = None
+
+    def traced_memory(self) -> tuple[int, int]:
+        """(current, peak) bytes allocated since tracing started."""
+        import tracemalloc
+        return tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (0, 0)
+
+    def snapshot(self, limit: int = 25) -> list[AllocationSite]:
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            return []
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<unknown>"),
+        ))
+        growth = {}
+        if self._previous is not None:
+            growth = {str(stat.traceback): stat.size_diff
+                      for stat in snapshot.compare_to(self._previous, "lineno")}
+        self._previous = snapshot
+        return [AllocationSite(str(stat.traceback), stat.size, stat.count, growth.get(str(stat.traceback), stat.size))
+                for stat in snapshot.statistics("lineno")[:limit]]
@@ -0,0 +1,267 @@
+# cp_pipeline.py
+
+"""
+Run library prompts as a pipeline: a DAG of nodes where fields of one node's response fill
+text placeholders of the nodes after it.
+
+A pipeline file looks like::
+
+    {
+        "nodes": {
+            "summary":  {"prompt": "Summarize", "values": {"document": "..."}},
+            "evaluate": {"prompt": "Evaluate", "bind": {"summary": "summary.summary_text"}},
+            "query":    {"prompt": "Query", "bind": {"summary": "summary", "score": "evaluate.score"}}
+        }
+    }
+
+``bind`` maps a placeholder of the node to ``node`` (the whole response text) or
+``node.field`` (a field of a structured response, i.e. one of its @@ output @@ placeholders).
+``values`` are fixed text or file placeholder values. A node may set its own ``model``.
+
+Nodes whose inputs are ready run concurrently. Responses are cached by everything sent to
+the model, so a node is only sent again when its rendered prompt, system prompt, attributes
+or model changed.
+"""
+
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Optional, Union
+import json
+import threading
+import time
+import logging
+
+# Logger Configuration
+logger = logging.getLogger(__name__)
+
+from cp_render import (RunSettings, resolve_run_settings, render_prompt_text, strip_output_placeholders,
+                       missing_values)
+from cp_runner import ResponseCall, request_key
+from cp_core import PROMPT_TYPE_QUESTION
+from cp_history import prompt_version
+from cp_memory import BudgetedLRU, PRIORITY_NORMAL
+
+DEFAULT_MAX_WORKERS = 4
+
+class PipelineError(Exception):
+    def __init__(self, node: str, message: str):
+        self.node = node
+        super().__init__(f"Pipeline node '{node}': {message}")
+
+
+@dataclass
+class PipelineNode:
+    name: str
+    prompt: str
+    values: dict = field(default_factory=dict)
+    bind: dict = field(default_factory=dict)  # placeholder -> "node" or "node.field"
+    model: Optional[str] = None
+
+    def upstream(self) -> list[str]:
+        return list(dict.fromkeys(source.split(".", 1)[0] for source in self.bind.values()))
+
+
+@dataclass
+class Pipeline:
+    nodes: dict[str, PipelineNode] = field(default_factory=dict)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Pipeline":
+        nodes = {}
+        for name, node in data.get("nodes", {}).items():
+            if "prompt" not in node:
+                raise ValueError(f"Pipeline node '{name}' has no prompt")
+            nodes[name] = PipelineNode(name=name, prompt=node["prompt"], values=dict(node.get("values", {})),
+                                       bind=dict(node.get("bind", {})), model=node.get("model"))
+        pipeline = cls(nodes)
+        pipeline.order()  # reject unknown sources and cycles up front
+        return pipeline
+
+    @classmethod
+    def from_file(cls, file_path: Union[str, Path]) -> "Pipeline":
+        with open(file_path, "r", encoding="utf-8") as file:
+            return cls.from_dict(json.load(file))
+
+    def order(self) -> list[str]:
+        """Node names in dependency order. Raises ValueError for unknown nodes and cycles."""
+        downstream = {name: [] for name in self.nodes}
+        waiting = {}
+        for name, node in self.nodes.items():
+            upstream = node.upstream()
+            for source in upstream:
+                if source not in self.nodes:
+                    raise ValueError(f"Pipeline node '{name}' is bound to unknown node '{source}'")
+                downstream[source].append(name)
+            waiting[name] = len(upstream)
+
+        ready = [name for name, count in waiting.items() if count == 0]
+        ordered = []
+        while ready:
+            name = ready.pop(0)
+            ordered.append(name)
+            for child in downstream[name]:
+                waiting[child] -= 1
+                if waiting[child] == 0:
+                    ready.append(child)
+
+        if len(ordered) != len(self.nodes):
+            cyclic = sorted(name for name in self.nodes if name not in ordered)
+            raise ValueError(f"Pipeline has a cycle between: {', '.join(cyclic)}")
+        return ordered
+
+
+@dataclass
+class NodeResult:
+    name: str
+    text: str
+    fields: dict = field(default_factory=dict)  # parsed structured response, if any
+    cached: bool = False
+    seconds: float = 0.0
+
+    def output(self, field_name: Optional[str]) -> str:
+        if field_name is None:
+            return self.text
+        if field_name not in self.fields:
+            raise PipelineError(self.name, f"response has no field '{field_name}'")
+        value = self.fields[field_name]
+        return value if isinstance(value, str) else json.dumps(value)
+
+
+class ResponseCache:
+    """
+    Response text by request key, optionally persisted to a JSON file between runs. Held
+    against the memory budget; the least recently used responses go first when it is exceeded.
+    """
+    def __init__(self, file_path: Optional[Union[str, Path]] = None):
+        self.file_path = Path(file_path) if file_path else None
+        self._lock = threading.Lock()
+        self._responses = BudgetedLRU("Pipeline responses", PRIORITY_NORMAL)
+        if self.file_path and self.file_path.exists():
+            with open(self.file_path, "r", encoding="utf-8") as file:
+                for key, text in json.load(file).items():
+                    self._responses.put(key, text)
+
+    @staticmethod
+    def key(settings: RunSettings, model: str) -> str:
+        return request_key(settings, model)
+
+    def get(self, key: str) -> Optional[str]:
+        return self._responses.get(key)
+
+    def put(self, key: str, text: str):
+        self._responses.put(key, text)
+
+    def save(self):
+        if not self.file_path:
+            return
+        with self._lock:
+            with open(self.file_path, "w", encoding="utf-8") as file:
+                json.dump(dict(self._responses.items()), file, indent=1)
+
+
+def parse_fields(text: str) -> dict:
+    """Top level fields of a JSON object response; empty for plain text."""
+    try:
+        parsed = json.loads(text)
+    except ValueError:
+        return {}
+    return parsed if isinstance(parsed, dict) else {}
+
+
+class PipelineExecutor:
+    def __init__(self, library, call: ResponseCall, model: str, max_workers: int = DEFAULT_MAX_WORKERS,
+                 cache: Optional[ResponseCache] = None, history=None):
+        self.library = library
+        self.call = call
+        self.model = model
+        self.max_workers = max_workers
+        self.cache = cache if cache is not None else ResponseCache()
+        self.history = history  # cp_history.RunHistory; nodes answered from the cache are not recorded
+
+    def render_node(self, node: PipelineNode, results: dict[str, NodeResult]) -> RunSettings:
+        """Settings for ``node`` with its fixed values and the outputs it is bound to filled in."""
+        settings = resolve_run_settings(self.library.prompts, node.prompt, self.library.includes)
+        values = dict(node.values)
+        for placeholder, source in node.bind.items():
+            source_node, _, field_name = source.partition(".")
+            values[placeholder] = results[source_node].output(field_name or None)
+
+        prompt_text = strip_output_placeholders(settings.prompt_text)
+        missing = missing_values(prompt_text, values)
+        if missing:
+            logger.warning(f"Pipeline node '{node.name}' has no value for: {', '.join(missing)}")
+        settings.prompt_text = render_prompt_text(prompt_text, values, layout=settings.layout)
+        return settings
+
+    def _run_node(self, node: PipelineNode, settings: RunSettings, model: str, version: str) -> NodeResult:
+        start = time.perf_counter()
+        if self.history is not None:
+            response, _ = self.history.record_call(node.prompt, version, model, PROMPT_TYPE_QUESTION, settings,
+                                                   self.call)
+        else:
+            response, _ = self.call(settings, model)
+        text = response.response
+        return NodeResult(node.name, text, parse_fields(text), seconds=time.perf_counter() - start)
+
+    def run(self, pipeline: Pipeline, on_node_done: Optional[Callable[[NodeResult], None]] = None
+            ) -> dict[str, NodeResult]:
+        """
+        Run every node once its upstream nodes finished, independent nodes concurrently.
+        Rendering happens on the calling thread; only model calls run on the workers.
+        Raises PipelineError for the first node that fails; nodes not yet started are skipped.
+        """
+        order = pipeline.order()
+        results: dict[str, NodeResult] = {}
+        pending = list(order)
+        running: dict[Future, tuple[PipelineNode, str]] = {}
+
+        def finish(result: NodeResult):
+            results[result.name] = result
+            if on_node_done:
+                on_node_done(result)
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="pipeline") as pool:
+                while pending or running:
+                    for name in [name for name in pending if all(up in results for up in pipeline.nodes[name].upstream())]:
+                        pending.remove(name)
+                        node = pipeline.nodes[name]
+                        try:
+                            settings = self.render_node(node, results)
+                        except (KeyError, ValueError) as e:
+                            self._cancel(running)
+                            raise PipelineError(name, str(e)) from e
+
+                        model = node.model or self.model
+                        key = self.cache.key(settings, model)
+                        cached = self.cache.get(key)
+                        if cached is not None:
+                            logger.info(f"Pipeline node '{name}' unchanged, using cached response")
+                            finish(NodeResult(name, cached, parse_fields(cached), cached=True))
+                            continue
+                        version = prompt_version(self.library.prompts[node.prompt])
+                        running[pool.submit(self._run_node, node, settings, model, version)] = (node, key)
+
+                    if not running:
+                        continue  # nodes finished from cache may have unblocked others
+
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        node, key = running.pop(future)
+                        try:
+                            result = future.result()
+                        except Exception as e:
+                            self._cancel(running)
+                            raise PipelineError(node.name, str(e)) from e
+                        self.cache.put(key, result.text)
+                        logger.info(f"Pipeline node '{node.name}' finished in {result.seconds:.2f}s")
+                        finish(result)
+        finally:
+            self.cache.save()  # keep the responses of finished nodes even if a later one failed
+        return results
+
+    @staticmethod
+    def _cancel(running: dict):
+        for future in running:
+            future.cancel()
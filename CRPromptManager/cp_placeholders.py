@@ -0,0 +1,167 @@
+# cp_placeholders.py
+
+"""
+Line-incremental placeholder index for the prompt editor.
+
+Placeholders never span lines, so a prompt text is lexed line by line and an edit only
+re-lexes the lines it touched. ``PlaceholderIndex`` keeps each line's tokens and running
+counts per placeholder kind, so the editor can show the placeholders of a prompt while it
+is typed and hand them to Build Response or the run dialog without parsing the text again.
+
+The names it reports are those of cp_render.parse_template for the same text, except for a
+placeholder whose delimiters are on different lines: the editor reports those delimiters
+as unmatched instead.
+"""
+
+from collections import Counter
+from functools import lru_cache
+from typing import Iterable, NamedTuple
+import logging
+
+# Logger Configuration
+logger = logging.getLogger(__name__)
+
+from cp_render import TemplateFields, TEXT_PLACEHOLDER_RE, FILE_PLACEHOLDER_RE, OUTPUT_PLACEHOLDER_RE
+from cp_include import INCLUDE_PLACEHOLDER_RE
+
+KIND_TEXT = "text"        # << name >>
+KIND_FILE = "file"        # %% name %%
+KIND_OUTPUT = "output"    # @@ name @@
+KIND_INCLUDE = "include"  # [[ prompt name ]]
+PLACEHOLDER_KINDS = ((KIND_TEXT, TEXT_PLACEHOLDER_RE), (KIND_FILE, FILE_PLACEHOLDER_RE),
+                     (KIND_OUTPUT, OUTPUT_PLACEHOLDER_RE), (KIND_INCLUDE, INCLUDE_PLACEHOLDER_RE))
+DELIMITERS = ("<<", ">>", "%%", "@@")  # underlined when outside any placeholder
+# Include brackets are highlighted but never reported unmatched: [[ and ]] are common in
+# nested JSON arrays and wiki links, and an include of no prompt is kept as text anyway
+INCLUDE_OPEN = "[["
+
+LINE_CACHE_SIZE = 4096  # the highlighter and the index lex the same edited lines
+
+
+class Token(NamedTuple):
+    kind: str
+    name: str
+    start: int
+    end: int
+
+
+class LineScan(NamedTuple):
+    tokens: tuple[Token, ...]
+    unmatched: tuple[tuple[int, int], ...]  # (start, length) of delimiters outside any placeholder
+
+
+EMPTY_SCAN = LineScan((), ())
+
+
+@lru_cache(maxsize=LINE_CACHE_SIZE)
+def scan_line(text: str) -> LineScan:
+    """Placeholders and unmatched delimiters of one line."""
+    if INCLUDE_OPEN not in text and not any(delimiter in text for delimiter in DELIMITERS):
+        return EMPTY_SCAN
+
+    tokens = []
+    for kind, pattern in PLACEHOLDER_KINDS:
+        tokens += [Token(kind, match.group(1), match.start(), match.end()) for match in pattern.finditer(text)]
+    tokens.sort(key=lambda token: token.start)
+
+    unmatched = []
+    for delimiter in DELIMITERS:
+        position = text.find(delimiter)
+        while position != -1:
+            if not any(token.start <= position < token.end for token in tokens):
+                unmatched.append((position, len(delimiter)))
+                position = text.find(delimiter, position + len(delimiter))
+            else:
+                position = text.find(delimiter, position + 1)
+    unmatched.sort()
+    return LineScan(tuple(tokens), tuple(unmatched))
+
+
+class PlaceholderIndex:
+    """Placeholders of a text kept up to date line by line; line numbers start at 0."""
+    def __init__(self, text: str = ""):
+        self._lines: list[LineScan] = []
+        self._counts: dict[str, Counter] = {kind: Counter() for kind, _ in PLACEHOLDER_KINDS}
+        self._unmatched = 0
+        self._fields = None  # fields() of the current text, until the next edit
+        self.reset(text)
+
+    def reset(self, text: str):
+        self._lines = []
+        for counts in self._counts.values():
+            counts.clear()
+        self._unmatched = 0
+        self.replace_lines(0, 0, text.split("\n"))
+
+    def replace_lines(self, first: int, removed: int, lines: Iterable[str]):
+        """Replace ``removed`` lines starting at ``first`` with ``lines``, re-lexing only those."""
+        scans = [scan_line(line) for line in lines]
+        for scan in self._lines[first:first + removed]:
+            self._count(scan, -1)
+        for scan in scans:
+            self._count(scan, 1)
+        self._lines[first:first + removed] = scans
+        self._fields = None
+
+    def _count(self, scan: LineScan, sign: int):
+        if scan is EMPTY_SCAN:
+            return
+        for token in scan.tokens:
+            counts = self._counts[token.kind]
+            counts[token.name] += sign
+            if counts[token.name] <= 0:
+                del counts[token.name]
+        self._unmatched += sign * len(scan.unmatched)
+
+    # Query methods
+    @property
+    def line_count(self) -> int:
+        return len(self._lines)
+
+    @property
+    def unmatched(self) -> int:
+        """Number of delimiters outside any placeholder."""
+        return self._unmatched
+
+    def counts(self, kind: str) -> dict[str, int]:
+        """Occurrences per placeholder name of one kind."""
+        return dict(self._counts[kind])
+
+    def unmatched_lines(self, limit: int = 10) -> list[int]:
+        lines = []
+        for number, scan in enumerate(self._lines):
+            if scan.unmatched:
+                lines.append(number)
+                if len(lines) >= limit:
+                    break
+        return lines
+
+    def names(self, kind: str) -> list[str]:
+        """Names of one kind in order of first appearance, like cp_render's get_*placeholders."""
+        if not self._counts[kind]:
+            return []
+        names = {}
+        for scan in self._lines:
+            for token in scan.tokens:
+                if token.kind == kind:
+                    names[token.name] = None
+        return list(names)
+
+    def fields(self) -> TemplateFields:
+        """The parse_template result for the indexed text."""
+        if self._fields is None:
+            self._fields = TemplateFields(tuple(self.names(KIND_TEXT)), tuple(self.names(KIND_FILE)),
+                                          tuple(self.names(KIND_OUTPUT)))
+        return self._fields
+
+    def summary(self) -> str:
+        parts = []
+        for kind, _ in PLACEHOLDER_KINDS:
+            counts = self._counts[kind]
+            if counts:
+                listed = ", ".join(name if count == 1 else f"{name} ({count})" for name, count in counts.items())
+                parts.append(f"{kind.capitalize()}: {listed}")
+        if self._unmatched:
+            lines = ", ".join(str(number + 1) for number in self.unmatched_lines(5))
+            parts.append(f"{self._unmatched} unmatched delimiter(s), line {lines}")
+        return " | ".join(parts) if parts else "No placeholders"
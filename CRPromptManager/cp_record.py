@@ -0,0 +1,166 @@
+# cp_record.py
+
+"""
+Compact in-memory prompt records.
+
+A prompt in the library file is a JSON object with the same handful of keys every time.
+``PromptRecord`` keeps those keys in ``__slots__`` instead of a per-prompt dict, interns
+the enum-like strings (type, subtype, layout), shares the default system prompt text and
+the empty attribute mapping, and shares one key-order tuple between all prompts with the
+same keys. Keys it does not know are kept in a small extras dict, so
+``PromptRecord.from_json(data).to_json() == data`` for any prompt object, key order included.
+
+Records are read-only Mappings: ``record.get("prompt_text")``, ``record["type"]``,
+``dict(record)`` and comparisons with dicts work as with the JSON object. To change a
+prompt, build a new dict and pass it to PromptLibrary.update.
+"""
+
+from collections.abc import Mapping
+from types import MappingProxyType
+from typing import Optional
+import sys
+import time
+import tracemalloc
+import logging
+
+# Logger Configuration
+logger = logging.getLogger(__name__)
+
+from cp_core import DEFAULT_SYSTEM_PROMPT
+
+_EMPTY_ATTRIBUTES = MappingProxyType({})
+_MISSING = object()
+
+# JSON key -> slot
+_FIELDS = {
+    "prompt_text": "prompt_text",
+    "type": "type",
+    "subtype": "subtype",
+    "notes": "notes",
+    "default_attributes": "default_attributes",
+    "prompt_system_use": "prompt_system_use",
+    "prompt_system_text": "prompt_system_text",
+    "prompt_layout": "prompt_layout",
+}
+_INTERNED_FIELDS = ("type", "subtype", "prompt_layout")
+_SHARED_TEXT = {DEFAULT_SYSTEM_PROMPT: DEFAULT_SYSTEM_PROMPT, "": ""}
+
+_key_orders: dict[tuple, tuple] = {}  # one shared tuple per distinct key order
+
+
+def _shared_key_order(keys: tuple) -> tuple:
+    return _key_orders.setdefault(keys, keys)
+
+
+class PromptRecord(Mapping):
+    __slots__ = ("_keys", "prompt_text", "type", "subtype", "notes", "default_attributes",
+                 "prompt_system_use", "prompt_system_text", "prompt_layout", "_extras")
+
+    def __init__(self, data: Mapping):
+        object.__setattr__(self, "_keys", _shared_key_order(tuple(data)))
+        extras = None
+        for key, value in data.items():
+            slot = _FIELDS.get(key)
+            if slot is None:
+                if extras is None:
+                    extras = {}
+                extras[key] = value
+                continue
+            if slot in _INTERNED_FIELDS and isinstance(value, str):
+                value = sys.intern(value)
+            elif slot == "default_attributes" and isinstance(value, dict) and not value:
+                value = _EMPTY_ATTRIBUTES
+            elif isinstance(value, str):
+                value = _SHARED_TEXT.get(value, value)
+            object.__setattr__(self, slot, value)
+        object.__setattr__(self, "_extras", extras)
+
+    @classmethod
+    def from_json(cls, data) -> "PromptRecord":
+        """A record for a JSON prompt object; records are returned unchanged."""
+        if isinstance(data, cls):
+            return data
+        if not isinstance(data, Mapping):
+            raise TypeError(f"A prompt must be a JSON object, not {type(data).__name__}")
+        return cls(data)
+
+    def to_json(self) -> dict:
+        """The prompt as a plain JSON object, identical to the one it was built from."""
+        result = {}
+        for key in self._keys:
+            value = self[key]
+            if value is _EMPTY_ATTRIBUTES:
+                value = {}
+            result[key] = value
+        return result
+
+    def __setattr__(self, name, value):
+        raise AttributeError("PromptRecord is read-only; update the library with a new dict instead")
+
+    # Mapping interface
+    def __getitem__(self, key):
+        slot = _FIELDS.get(key)
+        if slot is not None:
+            value = getattr(self, slot, _MISSING)
+        else:
+            value = self._extras.get(key, _MISSING) if self._extras else _MISSING
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key) -> bool:
+        return key in self._keys
+
+    def __repr__(self) -> str:
+        return f"PromptRecord({self.to_json()!r})"
+
+
+def to_json_object(data) -> dict:
+    """Plain dict for a record or a dict, for json.dump and hashing."""
+    return data.to_json() if isinstance(data, PromptRecord) else data
+
+
+def measure_footprint(count: int = 100_000, as_records: bool = True, sample: Optional[dict] = None) -> dict:
+    """
+    Memory held by ``count`` prompts as parsed from JSON, as dicts or as records.
+    Every prompt gets its own text strings, like prompts read from a library file.
+    """
+    import json
+
+    sample = sample or {
+        "prompt_text": "Summarize <<topic>> for %% document %% in three bullet points.",
+        "type": "user",
+        "subtype": "summary",
+        "notes": "",
+        "default_attributes": {},
+        "prompt_system_use": False,
+        "prompt_system_text": DEFAULT_SYSTEM_PROMPT,
+    }
+    encoded = [json.dumps(dict(sample, prompt_text=f"{sample['prompt_text']} #{index}")) for index in range(count)]
+
+    def build() -> dict:
+        prompts = {}
+        for index, text in enumerate(encoded):
+            data = json.loads(text)
+            prompts[f"prompt {index}"] = PromptRecord(data) if as_records else data
+        return prompts
+
+    start = time.perf_counter()
+    build()
+    seconds = time.perf_counter() - start  # timed without tracemalloc, which slows allocation down
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    prompts = build()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del prompts
+
+    return {"prompts": count, "kind": "record" if as_records else "dict", "bytes": used,
+            "bytes_per_prompt": used / count, "seconds": seconds}
@@ -0,0 +1,230 @@
+# cp_render.py
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, NamedTuple, Optional
+import hashlib
+import re
+import sys
+import logging
+
+# Logger Configuration
+logger = logging.getLogger(__name__)
+
+from cp_core import DEFAULT_SYSTEM_PROMPT
+from cp_include import IncludeExpander
+from cp_memory import BudgetedLRU, text_size, PRIORITY_LOW
+from cp_trace import traced
+
+# Placeholder syntax
+TEXT_PLACEHOLDER_RE = re.compile(r"<<\s*(.+?)\s*>>")      # << name >>
+FILE_PLACEHOLDER_RE = re.compile(r"%%\s*(.+?)\s*%%")      # %% name %%
+OUTPUT_PLACEHOLDER_RE = re.compile(r"@@\s*([\w.-]+)\s*@@")  # @@ name @@
+
+# Prompt layouts
+LAYOUT_INLINE = "inline"                # values replace their placeholders
+LAYOUT_STABLE_PREFIX = "stable_prefix"  # values are appended after the unchanged template
+PROMPT_LAYOUTS = [LAYOUT_INLINE, LAYOUT_STABLE_PREFIX]
+
+TEMPLATE_CACHE_SIZE = 65536  # parsed prompt texts kept; enough for a whole large library
+TEMPLATE_KEY_MAX_CHARS = 1024  # longer texts are cached under a digest instead of the text itself
+
+
+def _unique(matches) -> list[str]:
+    return list(dict.fromkeys(matches))
+
+
+class TemplateFields(NamedTuple):
+    placeholders: tuple[str, ...]
+    file_placeholders: tuple[str, ...]
+    output_placeholders: tuple[str, ...]
+
+
+def _fields_size(fields: TemplateFields) -> int:
+    return sys.getsizeof(fields) + sum(sys.getsizeof(names) + sum(map(text_size, names)) for names in fields)
+
+
+# Long texts are keyed by a digest, so a cached entry never keeps a large prompt text alive
+_parsed_templates = BudgetedLRU("Parsed templates", PRIORITY_LOW, sizer=_fields_size)
+
+
+def parse_template(prompt_text: str) -> TemplateFields:
+    """Placeholder names of a prompt text, parsed once per distinct text."""
+    key = prompt_text
+    if len(prompt_text) > TEMPLATE_KEY_MAX_CHARS:
+        key = hashlib.blake2b(prompt_text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+    fields = _parsed_templates.get(key)
+    if fields is None:
+        fields = TemplateFields(
+            tuple(dict.fromkeys(TEXT_PLACEHOLDER_RE.findall(prompt_text))),
+            tuple(dict.fromkeys(FILE_PLACEHOLDER_RE.findall(prompt_text))),
+            tuple(dict.fromkeys(OUTPUT_PLACEHOLDER_RE.findall(prompt_text))),
+        )
+        _parsed_templates.put(key, fields)
+        if len(_parsed_templates) > TEMPLATE_CACHE_SIZE:
+            _parsed_templates.evict_memory(1)  # drops the least recently used entry
+    return fields
+
+
+def get_placeholders(prompt_text: str) -> list[str]:
+    """Names of << text >> placeholders in order of first appearance."""
+    return list(parse_template(prompt_text).placeholders)
+
+
+def get_file_placeholders(prompt_text: str) -> list[str]:
+    """Names of %% file %% placeholders in order of first appearance."""
+    return list(parse_template(prompt_text).file_placeholders)
+
+
+def get_output_placeholders(prompt_text: str) -> list[str]:
+    """Names of @@ output @@ placeholders in order of first appearance."""
+    return list(parse_template(prompt_text).output_placeholders)
+
+
+def strip_output_placeholders(prompt_text: str) -> str:
+    """Output placeholders only describe the response schema and are never sent to the model."""
+    return OUTPUT_PLACEHOLDER_RE.sub("", prompt_text)
+
+
+def read_file_placeholder(file_path: str) -> str:
+    """Extract text for a file placeholder using WrapAI's FILE_HANDLERS."""
+    path = Path(file_path)
+    if not path.exists():
+        return f"[Missing file: {path.name}]"
+
+    from WrapAI import FILE_HANDLERS
+
+    ext = path.suffix.lower()
+    handler = FILE_HANDLERS.get(ext)
+    if not handler:
+        return f"[Unsupported file type: {ext}]"
+
+    try:
+        return handler(path).strip()
+    except Exception as e:
+        logger.error(f"Handler error for {path}: {e}")
+        return f"[Error reading file: {path.name}]"
+
+
+@traced("render.prompt_text", "render")
+def render_prompt_text(prompt_text: str, values: dict,
+                       file_reader: Callable[[str], str] = read_file_placeholder,
+                       layout: str = LAYOUT_INLINE) -> str:
+    """
+    Replace file and text placeholders with the supplied values.
+    File placeholder values are paths; their extracted content is inlined first so that
+    text placeholders inside a file are left untouched.
+    Placeholders without a value are kept as-is.
+    """
+    if layout == LAYOUT_STABLE_PREFIX:
+        return render_stable_prefix(prompt_text, values, file_reader)
+
+    def replace_file(match):
+        name = match.group(1)
+        if name not in values:
+            return match.group(0)
+        return file_reader(values[name])
+
+    def replace_text(match):
+        return values.get(match.group(1), match.group(0))
+
+    # Inline file content first, then substitute text values in the remaining template
+    parts = []
+    last = 0
+    for match in FILE_PLACEHOLDER_RE.finditer(prompt_text):
+        parts.append(TEXT_PLACEHOLDER_RE.sub(replace_text, prompt_text[last:match.start()]))
+        parts.append(replace_file(match))
+        last = match.end()
+    parts.append(TEXT_PLACEHOLDER_RE.sub(replace_text, prompt_text[last:]))
+    return "".join(parts)
+
+
+@traced("render.stable_prefix", "render")
+def render_stable_prefix(prompt_text: str, values: dict,
+                         file_reader: Callable[[str], str] = read_file_placeholder) -> str:
+    """
+    Keep the template byte-for-byte the same between runs and put the values at the end.
+    Placeholders with a value become ``<name>`` references and the values follow in order of
+    first appearance as ``<name>...</name>`` blocks, so everything up to the first value can
+    be served from the provider's prompt cache.
+    """
+    matches = sorted([*FILE_PLACEHOLDER_RE.finditer(prompt_text), *TEXT_PLACEHOLDER_RE.finditer(prompt_text)],
+                     key=lambda match: match.start())
+    names = _unique(match.group(1) for match in matches if match.group(1) in values)
+    if not names:
+        return prompt_text
+
+    file_names = set(get_file_placeholders(prompt_text))
+
+    def reference(match):
+        name = match.group(1)
+        return f"<{name}>" if name in values else match.group(0)
+
+    template = TEXT_PLACEHOLDER_RE.sub(reference, FILE_PLACEHOLDER_RE.sub(reference, prompt_text))
+    blocks = []
+    for name in names:
+        content = file_reader(values[name]) if name in file_names else values[name]
+        blocks.append(f"<{name}>\n{content}\n</{name}>")
+    return template.rstrip() + "\n\n" + "\n\n".join(blocks)
+
+
+@dataclass
+class RunSettings:
+    """Everything needed to send a library prompt, without any widget state."""
+    prompt_text: str
+    system_prompt: str = DEFAULT_SYSTEM_PROMPT
+    attributes: dict = field(default_factory=dict)
+    layout: str = LAYOUT_INLINE
+
+
+@traced("render.resolve_run_settings", "render")
+def resolve_run_settings(prompts: dict, prompt_name: str,
+                         includes: Optional[IncludeExpander] = None) -> RunSettings:
+    """
+    Build the prompt text, system prompt and API attributes for a stored prompt, with
+    [[ include ]] placeholders expanded. Pass the library's expander to reuse its cache.
+    Raises ValueError for system prompts, invalid custom system prompt references and include cycles.
+    """
+    prompt_data = prompts.get(prompt_name)
+    if prompt_data is None:
+        raise KeyError(f"Prompt '{prompt_name}' not found in library")
+
+    if prompt_data.get("type", "user") == "system":
+        raise ValueError(f"'{prompt_name}' is a system prompt. Please select a user prompt to run.")
+
+    if includes is None:
+        includes = IncludeExpander(prompts)
+    attributes = dict(prompt_data.get("default_attributes", {}))  # shallow copy
+
+    if prompt_data.get("prompt_system_use", False):
+        system_prompt = includes.expand_text(prompt_data.get("prompt_system_text", DEFAULT_SYSTEM_PROMPT))
+    else:
+        system_prompt = DEFAULT_SYSTEM_PROMPT
+
+    # Strip system_prompt out of default_attributes if it got added (for safety)
+    attributes.pop("system_prompt", None)
+
+    custom_system_prompt_name = attributes.pop("custom_system_prompt_name", None)
+    venice_raw = attributes.get("venice_parameters", {})
+    attributes["venice_parameters"] = dict(venice_raw)
+
+    if custom_system_prompt_name and venice_raw.get("include_venice_system_prompt"):
+        selected = prompts.get(custom_system_prompt_name)
+        if selected and selected.get("type") == "system":
+            system_prompt = includes.expand(custom_system_prompt_name)
+        else:
+            raise ValueError(f"Selected prompt '{custom_system_prompt_name}' is not a valid system prompt.")
+
+    return RunSettings(
+        prompt_text=includes.expand(prompt_name),
+        system_prompt=system_prompt,
+        attributes=attributes,
+        layout=prompt_data.get("prompt_layout", LAYOUT_INLINE),
+    )
+
+
+def missing_values(prompt_text: str, values: Optional[dict]) -> list[str]:
+    """Text and file placeholders that have no value supplied."""
+    values = values or {}
+    return [name for name in get_placeholders(prompt_text) + get_file_placeholders(prompt_text)
+            if name not in values]
@@ -0,0 +1,263 @@
+# cp_runner.py
+
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+import hashlib
+import json
+import threading
+import logging
+
+# Logger Configuration
+logger = logging.getLogger(__name__)
+
+from cp_core import PROMPT_TYPE_CHAT, PROMPT_TYPE_QUESTION
+from cp_trace import span, tracer
+from cp_memory import memory_budget, text_size, PRIORITY_HIGH
+
+# Sends rendered settings (cp_render.RunSettings) to a model; (WrapAI response object, shared), where
+# ``shared`` is True when the response answered a coalesced request (see send_prompt)
+ResponseCall = Callable[[object, str], tuple[object, bool]]
+
+
+def create_runner(api_key: str, model: str, response_type: str = PROMPT_TYPE_QUESTION, attributes: dict = None):
+    """Create a WrapAI prompt runner for the response type with the prompt attributes applied."""
+    from WrapAI import VeniceTextPrompt, VeniceChatPrompt, VeniceParameters
+
+    attributes = dict(attributes or {})
+    venice_parameters = attributes.get("venice_parameters", {})
+    if isinstance(venice_parameters, dict):
+        # ✅ Only pass allowed keys into VeniceParameters
+        attributes["venice_parameters"] = VeniceParameters(**venice_parameters)
+
+    if response_type == PROMPT_TYPE_CHAT:
+        runner = VeniceChatPrompt(api_key, model)
+    else:
+        runner = VeniceTextPrompt(api_key, model)
+
+    runner.set_attributes(**attributes)
+    return runner
+
+
+def format_response_text(response, attributes: dict = None) -> str:
+    """Response text, with schema fields laid out one per section when a response_format is set."""
+    text = response.response if response.response is not None else "No response available."
+
+    schema_json = (attributes or {}).get("response_format")
+    if not isinstance(schema_json, dict):
+        return text
+
+    from WrapAI import parse_response_with_schema
+    try:
+        with span("schema.parse_response", "schema", chars=len(text)):
+            parsed_data = parse_response_with_schema(
+                response_json=json.loads(text),
+                schema_json=schema_json,
+                include_missing_optionals=False
+            )
+        return "\n\n".join(f"=== {key} ===\n{value}" for key, value in parsed_data.items())
+    except Exception as e:
+        logger.warning(f"Failed to parse JSON response with schema: {e}")
+        return text
+
+
+KEEP_CHAT_MESSAGES = 4  # latest messages a chat keeps when the memory budget is exceeded
+
+
+class ChatHistoryBudget:
+    """
+    Accounts a chat runner's ``memory.message_history`` against the memory budget. Call
+    ``measure()`` after each exchange; when the budget is exceeded the oldest messages are
+    dropped, keeping system messages and the latest KEEP_CHAT_MESSAGES. Nothing is dropped
+    while ``busy`` (a request is using the history).
+    """
+    def __init__(self, name: str = "Chat history"):
+        self.runner = None
+        self.busy = False
+        self.account = memory_budget.register(self, name, PRIORITY_HIGH)
+
+    def set_runner(self, runner):
+        self.runner = runner
+        self.measure()
+
+    def history(self) -> list:
+        return getattr(getattr(self.runner, "memory", None), "message_history", None) or []
+
+    def measure(self):
+        history = self.history()
+        self.account.reset(sum(self._message_size(message) for message in history), len(history))
+
+    def evict_memory(self, nbytes: int) -> int:
+        history = self.history()
+        if self.busy or len(history) <= KEEP_CHAT_MESSAGES:
+            return 0
+        freed, index = 0, 0
+        while freed < nbytes and index < len(history) - KEEP_CHAT_MESSAGES:
+            if history[index].get("role") == "system":
+                index += 1
+                continue
+            freed += self._message_size(history.pop(index))
+        self.measure()
+        if freed:
+            logger.info(f"Dropped the oldest chat messages ({freed / 1024:.0f} KB) to stay within the memory budget")
+        return freed
+
+    @staticmethod
+    def _message_size(message) -> int:
+        return text_size(message.get("content")) if isinstance(message, dict) else 0
+
+
+def cached_prompt_tokens(usage: Optional[dict]) -> Optional[int]:
+    """Prompt tokens served from the provider's prompt cache, or None if the usage does not say."""
+    if not usage:
+        return None
+    details = usage.get("prompt_tokens_details") or {}
+    for value in (details.get("cached_tokens"), usage.get("cached_tokens"), usage.get("prompt_cache_hit_tokens")):
+        if value is not None:
+            return int(value)
+    return None
+
+
+@dataclass
+class UsageMetrics:
+    """Token usage summed over the responses of this session."""
+    requests: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    cache_reports: int = 0  # responses that reported a cached token count
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def record(self, usage: Optional[dict]):
+        usage = usage or {}
+        cached = cached_prompt_tokens(usage)
+        with self._lock:
+            self.requests += 1
+            self.prompt_tokens += int(usage.get("prompt_tokens") or 0)
+            self.completion_tokens += int(usage.get("completion_tokens") or 0)
+            if cached is not None:
+                self.cached_tokens += cached
+                self.cache_reports += 1
+
+    @property
+    def cache_hit_ratio(self) -> Optional[float]:
+        """Share of all prompt tokens served from cache; None until a response reports it."""
+        if not self.cache_reports or not self.prompt_tokens:
+            return None
+        return self.cached_tokens / self.prompt_tokens
+
+    def summary(self) -> str:
+        text = (f"{self.requests} request(s), {self.prompt_tokens} prompt and "
+                f"{self.completion_tokens} completion tokens")
+        ratio = self.cache_hit_ratio
+        if ratio is not None:
+            text += f", {self.cached_tokens} prompt tokens cached ({ratio:.0%})"
+        return text
+
+
+session_usage = UsageMetrics()
+
+
+def record_usage(response) -> Optional[int]:
+    """Add a response's usage to the session metrics. Returns its cached prompt tokens."""
+    usage = getattr(response, "usage", None) or {}
+    session_usage.record(usage)
+    cached = cached_prompt_tokens(usage)
+    if cached is not None:
+        logger.info(f"Prompt cache: {cached} of {usage.get('prompt_tokens', '?')} prompt tokens cached")
+    return cached
+
+
+def request_key(settings, model: str) -> str:
+    """Canonical key of a request: the same model, messages and attributes give the same key."""
+    payload = json.dumps([model, settings.system_prompt, settings.prompt_text, settings.attributes],
+                         sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """
+    Coalesces identical requests in flight. The first caller of a key (the leader) makes the
+    call on its own thread; callers of the same key arriving before it returns wait for it
+    and all receive its result, or its exception. A key leaves the flight when its call
+    returns, so a later request is sent again; finished responses are not cached here.
+
+    Waiting callers share the result object, which must be treated as read-only. The call
+    itself cannot be interrupted once sent (WrapAI's clients are synchronous); cancellation
+    is handled by the callers' layer, see cp_async.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: dict[str, Future] = {}
+        self.calls = 0      # calls made
+        self.coalesced = 0  # requests answered by another caller's call
+
+    def run(self, key: str, function: Callable[[], object]) -> tuple[object, bool]:
+        """(result, shared): ``shared`` is True when another caller's call answered this one."""
+        with self._lock:
+            future = self._flights.get(key)
+            leader = future is None
+            if leader:
+                future = self._flights[key] = Future()
+                self.calls += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            tracer.instant("runner.coalesced", "network", key=key[:12])
+            return future.result(), True
+
+        try:
+            result = function()
+        except BaseException as e:
+            self._land(key)
+            future.set_exception(e)
+            raise
+        self._land(key)
+        future.set_result(result)
+        return result, False
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._flights)
+
+    def summary(self) -> str:
+        return f"{self.calls} call(s), {self.coalesced} request(s) coalesced"
+
+    def _land(self, key: str):
+        with self._lock:
+            del self._flights[key]
+
+
+in_flight = SingleFlight()  # WrapAI responses by request_key, shared by the whole process
+
+
+def send_prompt(runner, settings, model: str, coalesce: bool = True) -> tuple[object, bool]:
+    """
+    Send rendered settings with a question runner; (response, shared). Unless ``coalesce``
+    is False, a request identical to one in flight anywhere in the process (another click,
+    dialog or pipeline node) waits for that call instead of sending its own.
+    """
+    def send():
+        with span("runner.prompt", "network", model=model):
+            return runner.prompt(settings.prompt_text, system_prompt=settings.system_prompt)
+
+    if not coalesce:
+        return send(), False
+    return in_flight.run(request_key(settings, model), send)
+
+
+def api_response_call(api_key: str, coalesce: bool = True) -> ResponseCall:
+    """
+    A ResponseCall that sends single question prompts through WrapAI. Identical requests in
+    flight are sent once unless ``coalesce`` is False (e.g. repeated samples of a sweep).
+    """
+    def call(settings, model: str):
+        runner = create_runner(api_key, model, PROMPT_TYPE_QUESTION, settings.attributes)
+        response, shared = send_prompt(runner, settings, model, coalesce)
+        if not response or response.response is None:
+            raise RuntimeError("No response returned from the API")
+        if not shared:
+            record_usage(response)
+        return response, shared
+
+    return call
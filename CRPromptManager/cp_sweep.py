@@ -0,0 +1,331 @@
+# cp_sweep.py
+
+"""
+Parameter sweeps: send one rendered prompt with every combination of a set of attribute
+values and compare latency, token usage and schema validity per combination.
+
+Axes are given as ``NAME=V1,V2,...`` (a grid) or ``NAME=START:STOP:STEP`` (a range, both
+ends included). NAME is one of the numeric attributes or ``venice_parameters.KEY``::
+
+    temperature=0,0.4,0.8
+    top_p=0.5:1:0.25
+    max_completion_tokens=128:512:128
+    venice_parameters.enable_web_search=off,auto
+
+Every point of the grid is sent ``samples`` times. All requests run concurrently on a pool
+of ``max_concurrency`` threads (WrapAI's clients are synchronous), so a sweep takes about
+as long as its slowest batch, not the sum of its requests.
+
+    runner = SweepRunner(api_response_call(api_key, coalesce=False), model, max_concurrency=8, samples=3)
+    report = runner.run(settings, parse_axes(["temperature=0,0.7", "top_p=0.5:1:0.5"]))
+    best = report.best(min_valid_rate=1.0)
+"""
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field, replace
+from itertools import product
+from typing import Callable, Iterable, Optional, TextIO
+import copy
+import csv
+import json
+import math
+import threading
+import time
+import logging
+
+# Logger Configuration
+logger = logging.getLogger(__name__)
+
+from cp_core import PROMPT_TYPE_QUESTION
+from cp_pipeline import parse_fields
+from cp_render import RunSettings
+from cp_runner import ResponseCall
+from cp_validate import NUMERIC_ATTRIBUTES, schema_properties
+
+VENICE_PARAMETERS = "venice_parameters"
+DEFAULT_SAMPLES = 1
+DEFAULT_CONCURRENCY = 4
+MAX_SWEEP_REQUESTS = 1000  # points x samples; guards against an accidental huge grid
+
+
+@dataclass(frozen=True)
+class SweepAxis:
+    name: str      # attribute name, or venice_parameters.KEY
+    values: tuple
+
+
+def _parse_value(text: str):
+    text = text.strip()
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def _range_values(name: str, spec: str) -> tuple:
+    parts = spec.split(":")
+    if len(parts) != 3:
+        raise ValueError(f"Range for {name} must be START:STOP:STEP, got '{spec}'")
+    try:
+        start, stop, step = (json.loads(part.strip()) for part in parts)
+    except ValueError:
+        raise ValueError(f"Range for {name} must be numbers, got '{spec}'") from None
+    if not all(isinstance(number, (int, float)) for number in (start, stop, step)) or step <= 0 or stop < start:
+        raise ValueError(f"Range for {name} needs START <= STOP and a positive STEP, got '{spec}'")
+    count = math.floor((stop - start) / step + 1e-9) + 1
+    if all(isinstance(number, int) for number in (start, stop, step)):
+        return tuple(start + index * step for index in range(count))
+    return tuple(round(start + index * step, 10) for index in range(count))
+
+
+def parse_axis(spec: str) -> SweepAxis:
+    """An axis from ``NAME=V1,V2`` or ``NAME=START:STOP:STEP``. Raises ValueError."""
+    name, sep, values = spec.partition("=")
+    name = name.strip()
+    if not sep or not values.strip():
+        raise ValueError(f"Sweep axis must be NAME=VALUES, got '{spec}'")
+    top, _, key = name.partition(".")
+    if not (name in NUMERIC_ATTRIBUTES or (top == VENICE_PARAMETERS and key)):
+        raise ValueError(f"Cannot sweep '{name}'; use one of {', '.join(NUMERIC_ATTRIBUTES)} "
+                         f"or {VENICE_PARAMETERS}.KEY")
+    if ":" in values and "," not in values:
+        parsed = _range_values(name, values)
+    else:
+        parsed = tuple(dict.fromkeys(_parse_value(value) for value in values.split(",") if value.strip()))
+    if not parsed:
+        raise ValueError(f"Sweep axis {name} has no values")
+    return SweepAxis(name, parsed)
+
+
+def parse_axes(specs: Iterable[str]) -> list[SweepAxis]:
+    """Axes from specs, ignoring blank lines and # comments; a repeated name replaces the earlier one."""
+    axes = {}
+    for spec in specs:
+        spec = spec.strip()
+        if spec and not spec.startswith("#"):
+            axis = parse_axis(spec)
+            axes[axis.name] = axis
+    return list(axes.values())
+
+
+def sweep_points(axes: list[SweepAxis]) -> list[dict]:
+    """Every combination of the axes' values, as {axis name: value}, first axis varying slowest."""
+    return [dict(zip((axis.name for axis in axes), values)) for values in product(*(axis.values for axis in axes))]
+
+
+def apply_point(attributes: dict, point: dict) -> dict:
+    """A copy of ``attributes`` with the point's values set, venice_parameters.KEY inside venice_parameters."""
+    attributes = copy.deepcopy(attributes)
+    for name, value in point.items():
+        top, _, key = name.partition(".")
+        if key:
+            attributes[top] = dict(attributes.get(top) or {}, **{key: value})
+        else:
+            attributes[name] = value
+    return attributes
+
+
+def schema_valid(text: str, response_format: Optional[dict]) -> Optional[bool]:
+    """
+    Whether a response satisfies the prompt's response_format: a JSON object with every
+    required property (every property if the schema lists none). None without a response_format.
+    """
+    if not isinstance(response_format, dict):
+        return None
+    fields = parse_fields(text)
+    if not fields:
+        return False
+    properties = schema_properties(response_format)
+    schema = response_format.get("json_schema", {}).get("schema", {})
+    required = schema.get("required") if isinstance(schema, dict) else None
+    return set(required if isinstance(required, list) else properties or ()).issubset(fields)
+
+
+def _mean(values: list) -> Optional[float]:
+    return sum(values) / len(values) if values else None
+
+
+def _median(values: list) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    middle = len(ordered) // 2
+    return ordered[middle] if len(ordered) % 2 else (ordered[middle - 1] + ordered[middle]) / 2
+
+
+@dataclass
+class SampleResult:
+    point: int    # index into SweepReport.points
+    sample: int
+    seconds: float
+    text: str = ""
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    valid: Optional[bool] = None  # schema validity, None when the prompt has no response_format
+    error: Optional[str] = None
+
+
+@dataclass
+class PointSummary:
+    index: int
+    params: dict
+    samples: int
+    errors: int
+    latency_p50: Optional[float]
+    latency_mean: Optional[float]
+    latency_max: Optional[float]
+    prompt_tokens: Optional[float]       # mean over successful samples
+    completion_tokens: Optional[float]
+    valid_rate: Optional[float]          # share of successful samples that match the schema
+
+    @property
+    def label(self) -> str:
+        return ", ".join(f"{name}={value}" for name, value in self.params.items()) or "(prompt attributes)"
+
+
+@dataclass
+class SweepReport:
+    axes: list[SweepAxis]
+    points: list[dict]
+    samples: list[SampleResult] = field(default_factory=list)
+    seconds: float = 0.0
+    cancelled: bool = False
+
+    def summaries(self) -> list[PointSummary]:
+        by_point: dict[int, list[SampleResult]] = {index: [] for index in range(len(self.points))}
+        for result in self.samples:
+            by_point[result.point].append(result)
+        summaries = []
+        for index, results in by_point.items():
+            ok = [result for result in results if result.error is None]
+            latencies = [result.seconds for result in ok]
+            checked = [result.valid for result in ok if result.valid is not None]
+            summaries.append(PointSummary(
+                index=index, params=self.points[index], samples=len(results), errors=len(results) - len(ok),
+                latency_p50=_median(latencies), latency_mean=_mean(latencies),
+                latency_max=max(latencies) if latencies else None,
+                prompt_tokens=_mean([r.prompt_tokens for r in ok if r.prompt_tokens is not None]),
+                completion_tokens=_mean([r.completion_tokens for r in ok if r.completion_tokens is not None]),
+                valid_rate=_mean([float(valid) for valid in checked]),
+            ))
+        return summaries
+
+    def best(self, min_valid_rate: float = 1.0) -> Optional[PointSummary]:
+        """The point with the lowest median latency among those without errors that meet ``min_valid_rate``."""
+        candidates = [summary for summary in self.summaries()
+                      if summary.samples and not summary.errors and summary.latency_p50 is not None
+                      and (summary.valid_rate is None or summary.valid_rate >= min_valid_rate)]
+        return min(candidates, key=lambda summary: summary.latency_p50, default=None)
+
+    def rows(self) -> list[dict]:
+        """One flat dict per point, axis values first, for export."""
+        rows = []
+        for summary in self.summaries():
+            row = {axis.name: summary.params.get(axis.name) for axis in self.axes}
+            row.update(samples=summary.samples, errors=summary.errors, latency_p50=summary.latency_p50,
+                       latency_mean=summary.latency_mean, latency_max=summary.latency_max,
+                       prompt_tokens=summary.prompt_tokens, completion_tokens=summary.completion_tokens,
+                       valid_rate=summary.valid_rate)
+            rows.append(row)
+        return rows
+
+
+def export_csv(report: SweepReport, file: TextIO):
+    rows = report.rows()
+    if not rows:
+        return
+    writer = csv.DictWriter(file, fieldnames=list(rows[0]))
+    writer.writeheader()
+    writer.writerows(rows)
+
+
+def export_json(report: SweepReport, file: TextIO):
+    json.dump(report.rows(), file, indent=4)
+    file.write("\n")
+
+
+class SweepRunner:
+    """
+    Sends every point x sample of a sweep through a cp_runner.ResponseCall, at most
+    ``max_concurrency`` at a time. The call must not coalesce identical requests, or the
+    samples of a point would share one response. ``cancel()`` stops requests that have not been sent;
+    requests in flight finish and are reported.
+    """
+    def __init__(self, call: ResponseCall, model: str, max_concurrency: int = DEFAULT_CONCURRENCY,
+                 samples: int = DEFAULT_SAMPLES, history=None, prompt_name: str = "", prompt_version: str = "",
+                 max_requests: int = MAX_SWEEP_REQUESTS):
+        self.call = call
+        self.model = model
+        self.max_concurrency = max(1, max_concurrency)
+        self.samples = max(1, samples)
+        self.history = history  # cp_history.RunHistory, every request is recorded when set
+        self.prompt_name = prompt_name
+        self.prompt_version = prompt_version
+        self.max_requests = max_requests
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def run(self, settings: RunSettings, axes: list[SweepAxis],
+            on_sample_done: Optional[Callable[[SampleResult], None]] = None) -> SweepReport:
+        """
+        Run the sweep for rendered ``settings``. ``on_sample_done`` is called from the worker
+        threads. Raises ValueError when the sweep has more than ``max_requests`` requests.
+        """
+        points = sweep_points(axes)
+        requests = len(points) * self.samples
+        if requests > self.max_requests:
+            raise ValueError(f"The sweep has {requests} requests ({len(points)} points x {self.samples} samples), "
+                             f"more than the limit of {self.max_requests}")
+        self._cancelled.clear()
+        report = SweepReport(axes, points)
+        response_format = settings.attributes.get("response_format")
+        start = time.perf_counter()
+        logger.info(f"Sweeping {len(points)} point(s) x {self.samples} sample(s), {self.max_concurrency} at a time")
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="sweep") as pool:
+            point_settings = [replace(settings, attributes=apply_point(settings.attributes, point)) for point in points]
+            # Sample rounds go out one after another, so load changes during the sweep hit every point alike
+            futures = [pool.submit(self._send, index, sample, point_settings[index], response_format)
+                       for sample in range(self.samples) for index in range(len(points))]
+            for future in as_completed(futures):
+                if future.cancelled():
+                    continue
+                result = future.result()
+                if result is None:
+                    continue
+                report.samples.append(result)
+                if on_sample_done:
+                    on_sample_done(result)
+                if self._cancelled.is_set():
+                    for pending in futures:
+                        pending.cancel()
+
+        report.seconds = time.perf_counter() - start
+        report.cancelled = self._cancelled.is_set()
+        report.samples.sort(key=lambda result: (result.point, result.sample))
+        return report
+
+    def _send(self, index: int, sample: int, settings: RunSettings, response_format) -> Optional[SampleResult]:
+        if self._cancelled.is_set():
+            return None
+        start = time.perf_counter()
+        try:
+            response, shared = self.call(settings, self.model)
+        except Exception as e:
+            seconds = time.perf_counter() - start
+            if self.history is not None:
+                self.history.record(self.prompt_name, self.prompt_version, self.model, PROMPT_TYPE_QUESTION,
+                                    {"prompt_text": settings.prompt_text, "system_prompt": settings.system_prompt,
+                                     "parameters": settings.attributes}, latency=seconds, error=str(e))
+            return SampleResult(index, sample, seconds, error=str(e))
+        seconds = time.perf_counter() - start
+        if self.history is not None:
+            self.history.record_response(self.prompt_name, self.prompt_version, self.model, PROMPT_TYPE_QUESTION,
+                                         settings.prompt_text, settings.system_prompt, response, latency=seconds,
+                                         parameters=settings.attributes, shared=shared)
+        text = response.response or ""
+        usage = getattr(response, "usage", None) or {}
+        return SampleResult(index, sample, seconds, text, usage.get("prompt_tokens"), usage.get("completion_tokens"),
+                            schema_valid(text, response_format))
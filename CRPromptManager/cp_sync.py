@@ -0,0 +1,117 @@
+# cp_sync.py
+
+"""
+Detect and merge changes made to a library file outside this editor.
+
+The library remembers the version it last read or wrote (the *base*). When the file changes
+on disk, the new version (*theirs*) is merged with the prompts in memory (*ours*) one prompt
+at a time: a prompt changed on only one side takes that side, and only prompts changed on
+both sides, differently, are conflicts.
+"""
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional, Union
+import os
+import logging
+
+# Logger Configuration
+logger = logging.getLogger(__name__)
+
+from cp_jsonstream import iter_library_events, EVENT_HEADER, EVENT_PROMPT
+
+_MISSING = object()
+
+
+def file_signature(file_path: Union[str, Path]) -> Optional[tuple[int, int]]:
+    """(mtime_ns, size) of the file, or None if it does not exist."""
+    try:
+        stat = os.stat(file_path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+@dataclass
+class LibrarySnapshot:
+    """A version of the library as it was on disk."""
+    header: dict = field(default_factory=dict)
+    prompts: dict = field(default_factory=dict)
+    fingerprints: dict = field(default_factory=dict)  # prompt name -> hash of its source text
+    errors: list = field(default_factory=list)         # (prompt name, message)
+    signature: Optional[tuple[int, int]] = None
+
+    def same_prompt(self, name: str, other: "LibrarySnapshot") -> bool:
+        """True if ``name`` is identical in both snapshots, using fingerprints when both have one."""
+        mine = self.fingerprints.get(name)
+        theirs = other.fingerprints.get(name)
+        if mine is not None and theirs is not None:
+            return mine == theirs
+        return self.prompts.get(name, _MISSING) == other.prompts.get(name, _MISSING)
+
+
+def read_snapshot(file_path: Union[str, Path]) -> LibrarySnapshot:
+    """Read the library on disk with per-prompt fingerprints."""
+    signature = file_signature(file_path)
+    snapshot = LibrarySnapshot(signature=signature)
+    for event in iter_library_events(file_path):
+        if event[0] == EVENT_HEADER:
+            snapshot.header = event[1]
+        elif event[0] == EVENT_PROMPT:
+            snapshot.prompts[event[1]] = event[2]
+            snapshot.fingerprints[event[1]] = event[3]
+        else:
+            snapshot.errors.append((event[1], event[2]))
+    return snapshot
+
+
+@dataclass
+class MergeResult:
+    header: dict
+    prompts: dict
+    taken: list = field(default_factory=list)      # prompts updated, added or deleted from disk
+    conflicts: dict = field(default_factory=dict)  # name -> (ours, theirs); None means deleted
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.taken or self.conflicts)
+
+
+def merge_libraries(base: LibrarySnapshot, ours_header: dict, ours: dict, theirs: LibrarySnapshot) -> MergeResult:
+    """
+    Three-way merge per prompt. Conflicting prompts keep our version in the result and are
+    listed in ``conflicts`` so the caller can ask which side to keep.
+    Prompts that failed to parse on disk are left as they are in memory.
+    """
+    skipped = {name for name, _ in theirs.errors}
+    merged = dict(ours)
+    result = MergeResult(header=ours_header, prompts=merged)
+
+    # Only prompts whose disk version changed since the base need a decision
+    names = [name for name in dict.fromkeys([*base.prompts, *theirs.prompts])
+             if name not in skipped and not base.same_prompt(name, theirs)]
+
+    for name in names:
+        base_value = base.prompts.get(name, _MISSING)
+        ours_value = ours.get(name, _MISSING)
+        theirs_value = theirs.prompts.get(name, _MISSING)
+
+        if ours_value == theirs_value:
+            continue
+        if ours_value == base_value:
+            if theirs_value is _MISSING:
+                merged.pop(name, None)
+            else:
+                merged[name] = theirs_value
+            result.taken.append(name)
+        else:
+            result.conflicts[name] = (
+                None if ours_value is _MISSING else ours_value,
+                None if theirs_value is _MISSING else theirs_value,
+            )
+
+    if theirs.header != base.header and ours_header == base.header:
+        result.header = theirs.header
+
+    logger.info(f"Merged disk changes: {len(result.taken)} taken, {len(result.conflicts)} conflict(s)")
+    return result
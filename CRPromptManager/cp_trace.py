@@ -0,0 +1,278 @@
+# cp_trace.py
+
+"""
+Opt-in tracing spans with Chrome trace export.
+
+Tracing is off unless CRPM_TRACE names an output file, or the editor's Diagnostics setting
+turns it on. While it is off, ``span()`` returns a shared no-op context and ``traced``
+functions cost one attribute check. While it is on, every span is kept as a Chrome trace
+"complete" event with its thread, and ``export()`` writes a JSON file that chrome://tracing
+and https://ui.perfetto.dev open as is, small enough to attach to a ticket.
+
+CRPM_TRACE_PROFILE=N also runs cProfile inside one of every N outermost spans of each thread,
+so the profiler's overhead stays bounded; the collected statistics are written next to the
+trace as a .prof file for pstats or snakeviz.
+
+    CRPM_TRACE=trace.json CRPM_TRACE_PROFILE=10 python main.py
+"""
+
+from collections import deque
+from functools import wraps
+from pathlib import Path
+from typing import Optional
+import atexit
+import json
+import os
+import threading
+import time
+import logging
+
+# Logger Configuration
+logger = logging.getLogger(__name__)
+
+TRACE_ENV = "CRPM_TRACE"
+PROFILE_ENV = "CRPM_TRACE_PROFILE"
+DEFAULT_MAX_EVENTS = 500_000  # the oldest spans are dropped beyond this
+DEFAULT_PROFILE_EVERY = 10     # with profiling on in Settings, 1 in 10 outermost spans
+TRACE_FILE_NAME = "crpm-trace.json"
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "category", "args", "start", "profiler")
+
+    def __init__(self, tracer: "Tracer", name: str, category: str, args: dict):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+        self.profiler = None
+
+    def set(self, **args):
+        """Add arguments shown with the span, e.g. sizes known only at the end."""
+        self.args.update(args)
+
+    def __enter__(self):
+        self.profiler = self.tracer._enter()
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter_ns()
+        if exc_type is not None:
+            self.args["error"] = f"{exc_type.__name__}: {exc}"
+        self.tracer._exit(self.profiler)
+        self.tracer._record(self.name, self.category, self.start, end, self.args)
+        return False
+
+
+class Tracer:
+    def __init__(self):
+        self.enabled = False
+        self.path: Optional[Path] = None
+        self.profile_every = 0
+        self._events: deque = deque(maxlen=DEFAULT_MAX_EVENTS)
+        self._recorded = 0
+        self._threads: dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._origin = time.perf_counter_ns()
+        self._stats = None  # pstats.Stats of the sampled spans
+        self._exit_export = False
+
+    def enable(self, path=None, profile_every: int = 0, max_events: int = DEFAULT_MAX_EVENTS):
+        """Start recording; ``path`` is where export() writes by default."""
+        with self._lock:
+            if not self.enabled or max_events != self._events.maxlen:
+                self._events = deque(self._events, maxlen=max_events)
+            self.path = Path(path) if path else self.path
+            self.profile_every = max(0, int(profile_every))
+            self.enabled = True
+        logger.info(f"Tracing to {self.path}" + (f", profiling 1 in {self.profile_every} spans"
+                                                 if self.profile_every else ""))
+
+    def disable(self):
+        self.enabled = False
+
+    def clear(self):
+        with self._lock:
+            self._events.clear()
+            self._recorded = 0
+            self._stats = None
+
+    def span(self, name: str, category: str = "app", **args):
+        """Context manager timing a block as one trace event."""
+        if not self.enabled:
+            return _NO_SPAN
+        return _Span(self, name, category, args)
+
+    def instant(self, name: str, category: str = "app", **args):
+        """A point-in-time marker, e.g. a cache miss or a conflict."""
+        if self.enabled:
+            now = time.perf_counter_ns()
+            self._append({"name": name, "cat": category, "ph": "i", "s": "t", "ts": self._us(now),
+                          "pid": os.getpid(), "tid": self._tid(), "args": args})
+
+    # Recording methods
+    def _enter(self):
+        local = self._local
+        depth = getattr(local, "depth", 0)
+        local.depth = depth + 1
+        if depth or not self.profile_every:
+            return None
+        local.outermost = getattr(local, "outermost", 0) + 1
+        if local.outermost % self.profile_every:
+            return None
+        import cProfile
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:  # another profiler is active on this thread
+            return None
+        return profiler
+
+    def _exit(self, profiler):
+        self._local.depth -= 1
+        if profiler is None:
+            return
+        profiler.disable()
+        import pstats
+        with self._lock:
+            if self._stats is None:
+                self._stats = pstats.Stats(profiler)
+            else:
+                self._stats.add(profiler)
+
+    def _record(self, name: str, category: str, start: int, end: int, args: dict):
+        event = {"name": name, "cat": category, "ph": "X", "ts": self._us(start), "dur": (end - start) / 1000,
+                 "pid": os.getpid(), "tid": self._tid()}
+        if args:
+            event["args"] = args
+        self._append(event)
+
+    def _append(self, event: dict):
+        with self._lock:
+            self._events.append(event)
+            self._recorded += 1
+
+    def _tid(self) -> int:
+        tid = threading.get_native_id()
+        if tid not in self._threads:
+            self._threads[tid] = threading.current_thread().name
+        return tid
+
+    def _us(self, ns: int) -> float:
+        return (ns - self._origin) / 1000
+
+    # Export methods
+    def events(self) -> list[dict]:
+        with self._lock:
+            return list(self._events)
+
+    def trace_document(self) -> dict:
+        """The recorded spans in the Chrome trace event format."""
+        pid = os.getpid()
+        with self._lock:
+            events = list(self._events)
+            dropped = self._recorded - len(events)
+            threads = dict(self._threads)
+        metadata = [{"name": "process_name", "ph": "M", "pid": pid, "args": {"name": "CRPromptManager"}}]
+        metadata += [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+                     for tid, name in threads.items()]
+        return {"traceEvents": metadata + events, "displayTimeUnit": "ms",
+                "otherData": {"dropped_events": dropped, "profile_every": self.profile_every}}
+
+    def export(self, path=None) -> Optional[Path]:
+        """Write the trace (and the .prof file when profiling); returns the trace path."""
+        path = Path(path) if path else self.path
+        if path is None:
+            return None
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.trace_document()), encoding="utf-8")
+        with self._lock:
+            stats = self._stats
+            if stats is not None:
+                stats.dump_stats(path.with_suffix(".prof"))
+        logger.info(f"Trace written to {path}")
+        return path
+
+    def export_at_exit(self):
+        if not self._exit_export:
+            self._exit_export = True
+            atexit.register(self._export_at_exit)
+
+    def _export_at_exit(self):
+        if self.enabled:
+            try:
+                self.export()
+            except OSError as e:
+                logger.error(f"Could not write trace to {self.path}: {e}")
+
+
+tracer = Tracer()
+
+
+def span(name: str, category: str = "app", **args):
+    return tracer.span(name, category, **args)
+
+
+def traced(name: Optional[str] = None, category: str = "app"):
+    """Decorator recording each call of the function as a span."""
+    def decorate(function):
+        span_name = name or function.__qualname__
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return function(*args, **kwargs)
+            with tracer.span(span_name, category):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def configure_from_env(environ=None) -> bool:
+    """Enable tracing from CRPM_TRACE / CRPM_TRACE_PROFILE; the trace is written at exit."""
+    environ = os.environ if environ is None else environ
+    path = environ.get(TRACE_ENV)
+    if not path:
+        return False
+    try:
+        profile_every = int(environ.get(PROFILE_ENV) or 0)
+    except ValueError:
+        logger.warning(f"{PROFILE_ENV} must be a whole number, profiling is off")
+        profile_every = 0
+    tracer.enable(path, profile_every)
+    tracer.export_at_exit()
+    return True
+
+
+def summarize_trace(document: dict, limit: int = 20) -> list[tuple[str, int, float, float]]:
+    """(name, calls, total ms, max ms) of the complete events of a trace, slowest total first."""
+    totals: dict[str, list] = {}
+    for event in document.get("traceEvents", []):
+        if event.get("ph") != "X":
+            continue
+        duration = event.get("dur", 0) / 1000
+        entry = totals.setdefault(event["name"], [0, 0.0, 0.0])
+        entry[0] += 1
+        entry[1] += duration
+        entry[2] = max(entry[2], duration)
+    rows = sorted(((name, calls, total, longest) for name, (calls, total, longest) in totals.items()),
+                  key=lambda row: row[2], reverse=True)
+    return rows[:limit]
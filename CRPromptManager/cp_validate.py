@@ -0,0 +1,229 @@
+# cp_validate.py
+
+"""
+Whole-library validation in one pass.
+
+Finds in advance what otherwise only shows up when a prompt is run or saved: response
+formats that are not JSON objects, schemas on prompts that would be run as chat, models
+without structured output, placeholders that are never filled, include problems and
+dangling system prompt references. Prompt texts are parsed through cp_render's template
+cache and includes through the library's expander, so validating again after an edit
+only re-parses the prompts that changed.
+"""
+
+from collections.abc import Mapping
+from dataclasses import dataclass, field, asdict
+from typing import Iterable, Optional
+import time
+import logging
+
+# Logger Configuration
+logger = logging.getLogger(__name__)
+
+from cp_core import prompt_roles, prompt_subtypes, PROMPT_TYPE_CHAT, PROMPT_TYPES
+from cp_include import IncludeExpander, IncludeCycleError, get_include_placeholders
+from cp_index import CUSTOM_SYSTEM_PROMPT_KEY, prompt_type
+from cp_render import parse_template, PROMPT_LAYOUTS
+
+SEVERITY_ERROR = "error"      # the prompt cannot be run as stored
+SEVERITY_WARNING = "warning"  # the prompt runs, but probably not as intended
+
+# Checks
+CHECK_LOAD = "load"
+CHECK_ENTRY = "entry"
+CHECK_FIELDS = "fields"
+CHECK_RESPONSE_FORMAT = "response_format"
+CHECK_CHAT_SCHEMA = "chat_schema"
+CHECK_MODEL = "model"
+CHECK_PLACEHOLDERS = "placeholders"
+CHECK_INCLUDES = "includes"
+CHECK_SYSTEM_PROMPT = "system_prompt"
+
+NUMERIC_ATTRIBUTES = ("temperature", "top_p", "frequency_penalty", "presence_penalty", "max_completion_tokens")
+
+
+@dataclass
+class ValidationIssue:
+    prompt: str  # "" for problems of the library as a whole
+    check: str
+    severity: str
+    message: str
+
+    def __str__(self) -> str:
+        return f"{self.prompt or '(library)'}: {self.message}"
+
+
+@dataclass
+class ValidationReport:
+    issues: list[ValidationIssue] = field(default_factory=list)
+    prompts_checked: int = 0
+    seconds: float = 0.0
+
+    @property
+    def errors(self) -> list[ValidationIssue]:
+        return [issue for issue in self.issues if issue.severity == SEVERITY_ERROR]
+
+    @property
+    def warnings(self) -> list[ValidationIssue]:
+        return [issue for issue in self.issues if issue.severity == SEVERITY_WARNING]
+
+    def by_prompt(self) -> dict[str, list[ValidationIssue]]:
+        grouped: dict[str, list[ValidationIssue]] = {}
+        for issue in self.issues:
+            grouped.setdefault(issue.prompt, []).append(issue)
+        return grouped
+
+    def summary(self) -> str:
+        return (f"{self.prompts_checked} prompts checked in {self.seconds:.2f}s: "
+                f"{len(self.errors)} error(s), {len(self.warnings)} warning(s)")
+
+    def to_dict(self) -> dict:
+        return {"prompts_checked": self.prompts_checked, "seconds": self.seconds,
+                "errors": len(self.errors), "warnings": len(self.warnings),
+                "issues": [asdict(issue) for issue in self.issues]}
+
+
+def schema_properties(response_format: dict) -> Optional[set]:
+    """Top level property names of a json_schema response format, None when it has none."""
+    json_schema = response_format.get("json_schema") if response_format else None
+    schema = json_schema.get("schema") if isinstance(json_schema, dict) else None
+    properties = schema.get("properties") if isinstance(schema, dict) else None
+    return set(properties) if isinstance(properties, dict) else None
+
+
+class LibraryValidator:
+    """
+    Checks every prompt of a prompts dict. ``models`` is the model catalog (model id ->
+    attributes, as stored by cp_core.populate_runtime_models); model checks are skipped
+    without it. Pass the library's IncludeExpander to reuse its cache, but only from the
+    thread that owns the library.
+    """
+    def __init__(self, prompts: dict, models: Optional[dict] = None, model: Optional[str] = None,
+                 response_types: Iterable[str] = PROMPT_TYPES, includes: Optional[IncludeExpander] = None):
+        self.prompts = prompts
+        self.models = models
+        self.model = model
+        self.response_types = list(response_types)
+        self.includes = includes if includes is not None else IncludeExpander(prompts)
+
+    def validate(self, load_errors: Iterable[tuple[str, str]] = ()) -> ValidationReport:
+        start = time.perf_counter()
+        report = ValidationReport()
+        issues = report.issues
+        issues += [ValidationIssue(name, CHECK_LOAD, SEVERITY_ERROR, message) for name, message in load_errors]
+
+        model_supports_schema = None
+        if self.models is not None and self.model:
+            model_attributes = self.models.get(self.model)
+            if model_attributes is None:
+                issues.append(ValidationIssue("", CHECK_MODEL, SEVERITY_ERROR,
+                                              f"model '{self.model}' is not in the model list"))
+            else:
+                capabilities = model_attributes.get("model_spec", {}).get("capabilities", {})
+                model_supports_schema = bool(capabilities.get("supportsResponseSchema"))
+
+        for name, data in self.prompts.items():
+            try:
+                self._check_prompt(name, data, model_supports_schema, issues)
+            except Exception as e:
+                # A malformed prompt the checks do not anticipate is reported, not raised
+                logger.info(f"Validation of '{name}' failed", exc_info=True)
+                issues.append(ValidationIssue(name, CHECK_ENTRY, SEVERITY_ERROR, f"could not be checked: {e}"))
+
+        report.prompts_checked = len(self.prompts)
+        report.seconds = time.perf_counter() - start
+        return report
+
+    def _check_prompt(self, name: str, data, model_supports_schema: Optional[bool], issues: list):
+        def add(check, severity, message):
+            issues.append(ValidationIssue(name, check, severity, message))
+
+        if not isinstance(data, Mapping):
+            add(CHECK_ENTRY, SEVERITY_ERROR, "entry is not an object")
+            return
+
+        ptype = prompt_type(data)
+        if ptype not in prompt_roles:
+            add(CHECK_FIELDS, SEVERITY_WARNING, f"unknown type '{ptype}'")
+        subtype = data.get("subtype")
+        if subtype and subtype not in prompt_subtypes:
+            add(CHECK_FIELDS, SEVERITY_WARNING, f"unknown subtype '{subtype}'")
+        if data.get("prompt_layout", PROMPT_LAYOUTS[0]) not in PROMPT_LAYOUTS:
+            add(CHECK_FIELDS, SEVERITY_WARNING, f"unknown prompt layout '{data['prompt_layout']}'")
+
+        prompt_text = data.get("prompt_text", "")
+        if not isinstance(prompt_text, str):
+            add(CHECK_FIELDS, SEVERITY_ERROR, "prompt_text is not text")
+            return
+        if ptype != "system" and not prompt_text.strip():
+            add(CHECK_FIELDS, SEVERITY_WARNING, "prompt text is empty")
+
+        attributes = data.get("default_attributes", {})
+        if not isinstance(attributes, Mapping):
+            add(CHECK_FIELDS, SEVERITY_ERROR, "default_attributes is not an object")
+            return
+        for key in NUMERIC_ATTRIBUTES:
+            value = attributes.get(key)
+            if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float))):
+                add(CHECK_FIELDS, SEVERITY_ERROR, f"{key} is not a number")
+
+        # Response format
+        response_format = attributes.get("response_format")
+        if isinstance(response_format, str):
+            # The editor keeps the raw text when it is not valid JSON
+            add(CHECK_RESPONSE_FORMAT, SEVERITY_ERROR, "response_format is not valid JSON")
+        elif response_format is not None and not isinstance(response_format, dict):
+            add(CHECK_RESPONSE_FORMAT, SEVERITY_ERROR, "response_format is not a JSON object")
+        elif response_format is not None and ptype != "system":
+            if PROMPT_TYPE_CHAT in self.response_types:
+                add(CHECK_CHAT_SCHEMA, SEVERITY_WARNING, "has a response_format, so it cannot be run as chat")
+            if model_supports_schema is False:
+                add(CHECK_MODEL, SEVERITY_ERROR,
+                    f"has a response_format but model '{self.model}' does not support structured responses")
+
+        # Placeholders
+        fields = parse_template(prompt_text)
+        properties = schema_properties(response_format) if isinstance(response_format, dict) else None
+        if fields.output_placeholders and properties is not None:
+            unknown = [output for output in fields.output_placeholders if output not in properties]
+            if unknown:
+                add(CHECK_PLACEHOLDERS, SEVERITY_WARNING,
+                    f"output placeholder(s) not in the response schema: {', '.join(unknown)}")
+        system_text = data.get("prompt_system_text") or ""
+        if not isinstance(system_text, str):
+            add(CHECK_FIELDS, SEVERITY_ERROR, "prompt_system_text is not text")
+        elif data.get("prompt_system_use"):
+            system_fields = parse_template(system_text)
+            unfilled = system_fields.placeholders + system_fields.file_placeholders
+            if unfilled:
+                add(CHECK_PLACEHOLDERS, SEVERITY_WARNING,
+                    f"system prompt placeholder(s) are never filled: {', '.join(unfilled)}")
+        if ptype == "system" and (fields.placeholders or fields.file_placeholders):
+            add(CHECK_PLACEHOLDERS, SEVERITY_WARNING,
+                f"system prompt placeholder(s) are never filled: "
+                f"{', '.join(fields.placeholders + fields.file_placeholders)}")
+
+        # Includes
+        try:
+            self.includes.expand(name)
+        except IncludeCycleError as e:
+            add(CHECK_INCLUDES, SEVERITY_ERROR, str(e))
+        for included in get_include_placeholders(prompt_text):
+            if included not in self.prompts:
+                add(CHECK_INCLUDES, SEVERITY_WARNING, f"included prompt '{included}' does not exist, kept as text")
+
+        # System prompt reference
+        target = attributes.get(CUSTOM_SYSTEM_PROMPT_KEY)
+        if target and not isinstance(target, str):
+            add(CHECK_SYSTEM_PROMPT, SEVERITY_ERROR, f"{CUSTOM_SYSTEM_PROMPT_KEY} is not a prompt name")
+        elif target:
+            target_data = self.prompts.get(target)
+            if target_data is None:
+                add(CHECK_SYSTEM_PROMPT, SEVERITY_ERROR, f"custom system prompt '{target}' does not exist")
+            elif not isinstance(target_data, Mapping) or prompt_type(target_data) != "system":
+                add(CHECK_SYSTEM_PROMPT, SEVERITY_ERROR, f"custom system prompt '{target}' is not a system prompt")
+
+
+def validate_library(library, models: Optional[dict] = None, model: Optional[str] = None) -> ValidationReport:
+    """Validate a cp_library.PromptLibrary on the calling thread, reusing its include cache."""
+    return LibraryValidator(library.prompts, models, model, includes=library.includes).validate(library.load_errors)
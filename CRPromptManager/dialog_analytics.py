@@ -0,0 +1,134 @@
+# dialog_analytics.py
+
+from PySide6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QComboBox, QMessageBox,
+    QTableWidget, QTableWidgetItem, QHeaderView, QFileDialog
+)
+from PySide6.QtCore import Qt
+import logging
+
+# Logger Configuration
+logger = logging.getLogger(__name__)
+
+from WrapSideSix import run_in_thread
+from cp_analytics import (RunAnalytics, AnalyticsRow, DIMENSION_MODEL, DIMENSION_PROMPT, WINDOWS, WINDOW_ALL,
+                          export_csv, export_json, format_seconds)
+from cp_history import RunHistory
+
+WINDOW_LABELS = {"1h": "Last hour", "24h": "Last 24 hours", "7d": "Last 7 days", WINDOW_ALL: "All time"}
+
+
+class AnalyticsDialog(QDialog):
+    """Latency, throughput and error rates per model or prompt, built from the run history."""
+    COLUMNS = ["Name", "Runs", "Error Rate", "p50 (s)", "p95 (s)", "p99 (s)", "TTFT p50 (s)", "TTFT p95 (s)",
+               "Tokens/s", "Tokens/s p50"]
+
+    def __init__(self, history: RunHistory, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Analytics")
+        self.setMinimumSize(1000, 500)
+        self.history = history
+        self.analytics: RunAnalytics = None
+        self.rows: list[AnalyticsRow] = []
+
+        self.dimension_combo = QComboBox()
+        self.window_combo = QComboBox()
+        self.status_label = QLabel("Reading run history...")
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.refresh_button = QPushButton("Refresh")
+        self.export_button = QPushButton("Export...")
+        self.close_button = QPushButton("Close")
+
+        self.init_ui()
+        self.connect_signals()
+        self.load()
+
+    def init_ui(self):
+        self.dimension_combo.addItem("By Model", DIMENSION_MODEL)
+        self.dimension_combo.addItem("By Prompt", DIMENSION_PROMPT)
+        for window in WINDOWS:
+            self.window_combo.addItem(WINDOW_LABELS[window], window)
+
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
+        self.table.verticalHeader().setVisible(False)
+
+        options = QHBoxLayout()
+        options.addWidget(self.dimension_combo)
+        options.addWidget(self.window_combo)
+        options.addWidget(self.status_label, 1)
+
+        buttons = QHBoxLayout()
+        buttons.addWidget(self.refresh_button)
+        buttons.addWidget(self.export_button)
+        buttons.addStretch(1)
+        buttons.addWidget(self.close_button)
+
+        layout = QVBoxLayout(self)
+        layout.addLayout(options)
+        layout.addWidget(self.table, 1)
+        layout.addLayout(buttons)
+
+    def connect_signals(self):
+        self.dimension_combo.currentIndexChanged.connect(self.show_summary)
+        self.window_combo.currentIndexChanged.connect(self.show_summary)
+        self.refresh_button.clicked.connect(self.load)
+        self.export_button.clicked.connect(self.export)
+        self.close_button.clicked.connect(self.accept)
+
+    def load(self):
+        """Fold the whole history into sketches off the GUI thread."""
+        self.refresh_button.setEnabled(False)
+        self.status_label.setText("Reading run history...")
+
+        def task(**kwargs):
+            return RunAnalytics.from_history(self.history)
+
+        def on_finish(analytics):
+            self.analytics = analytics
+            self.refresh_button.setEnabled(True)
+            self.show_summary()
+
+        def on_error(error_info):
+            exception, tb = error_info
+            logger.error(f"Reading run history failed: {exception}")
+            self.refresh_button.setEnabled(True)
+            self.status_label.setText("")
+            QMessageBox.critical(self, "Analytics", f"Reading the run history failed:\n{exception}")
+
+        run_in_thread(task, on_finish=on_finish, on_error=on_error, parent=self)
+
+    def show_summary(self):
+        if self.analytics is None:
+            return
+        self.rows = self.analytics.summary(self.dimension_combo.currentData(), self.window_combo.currentData())
+        self.table.setRowCount(len(self.rows))
+        for row_index, row in enumerate(self.rows):
+            tokens_per_second = "-" if row.tokens_per_second is None else f"{row.tokens_per_second:.1f}"
+            tokens_per_second_p50 = "-" if row.tokens_per_second_p50 is None else f"{row.tokens_per_second_p50:.1f}"
+            values = [row.key, str(row.runs), f"{row.error_rate:.1%}", format_seconds(row.latency_p50),
+                      format_seconds(row.latency_p95), format_seconds(row.latency_p99), format_seconds(row.ttft_p50),
+                      format_seconds(row.ttft_p95), tokens_per_second, tokens_per_second_p50]
+            for column, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if column:
+                    item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+                self.table.setItem(row_index, column, item)
+        self.status_label.setText(f"{sum(row.runs for row in self.rows)} run(s)")
+
+    def export(self):
+        file_path, selected_filter = QFileDialog.getSaveFileName(
+            self, "Export Analytics", "analytics.csv", "CSV Files (*.csv);;JSON Files (*.json)")
+        if not file_path:
+            return
+        try:
+            with open(file_path, "w", encoding="utf-8", newline="") as file:
+                if file_path.lower().endswith(".json") or selected_filter.startswith("JSON"):
+                    export_json(self.rows, file)
+                else:
+                    export_csv(self.rows, file)
+        except OSError as e:
+            QMessageBox.critical(self, "Export Failed", str(e))
@@ -0,0 +1,199 @@
+# dialog_history.py
+
+from PySide6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QTextEdit, QPushButton, QComboBox,
+    QTableView, QTabWidget, QSplitter, QHeaderView, QAbstractItemView
+)
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex
+from datetime import datetime
+import json
+import logging
+
+# Logger Configuration
+logger = logging.getLogger(__name__)
+
+from cp_history import RunHistory, HistoryFilter, RunRecord, STATUS_OK, STATUS_ERROR
+
+ALL = "(all)"
+
+
+class HistoryTableModel(QAbstractTableModel):
+    """Pages runs in from the store as the view scrolls; only summary columns are loaded."""
+    COLUMNS = ["Time", "Prompt", "Version", "Model", "Type", "Status", "Latency (s)", "Tokens In/Out/Cached"]
+
+    def __init__(self, history: RunHistory, parent=None):
+        super().__init__(parent)
+        self.history = history
+        self.history_filter = HistoryFilter()
+        self.records: list[RunRecord] = []
+        self.exhausted = False
+
+    def set_filter(self, history_filter: HistoryFilter):
+        self.beginResetModel()
+        self.history_filter = history_filter
+        self.records = []
+        self.exhausted = False
+        self.endResetModel()
+        self.fetchMore(QModelIndex())
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.records)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.COLUMNS[section]
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole or not index.isValid():
+            return None
+        record = self.records[index.row()]
+        column = index.column()
+        if column == 0:
+            return datetime.fromtimestamp(record.created).strftime("%Y-%m-%d %H:%M:%S")
+        if column == 1:
+            return record.prompt_name
+        if column == 2:
+            return record.prompt_version[:8]
+        if column == 3:
+            return record.model
+        if column == 4:
+            return record.response_type
+        if column == 5:
+            return record.status
+        if column == 6:
+            return f"{record.latency:.2f}" if record.latency is not None else ""
+        tokens = (record.prompt_tokens, record.completion_tokens, record.cached_tokens)
+        return "/".join("-" if value is None else str(value) for value in tokens)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self.exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self.exhausted:
+            return
+        before_id = self.records[-1].id if self.records else None
+        page = self.history.page(self.history_filter, before_id=before_id)
+        if not page:
+            self.exhausted = True
+            return
+        self.beginInsertRows(QModelIndex(), len(self.records), len(self.records) + len(page) - 1)
+        self.records.extend(page)
+        self.endInsertRows()
+
+
+class HistoryDialog(QDialog):
+    """Browse past runs and reopen their results from the local history store."""
+    def __init__(self, history: RunHistory, prompt_name: str = None, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Run History")
+        self.setMinimumSize(1000, 700)
+        self.history = history
+
+        self.prompt_filter = QComboBox()
+        self.model_filter = QComboBox()
+        self.status_filter = QComboBox()
+        self.count_label = QLabel()
+        self.table_model = HistoryTableModel(history, self)
+        self.table_view = QTableView()
+        self.detail_tabs = QTabWidget()
+        self.close_button = QPushButton("Close")
+
+        self.init_ui(prompt_name)
+        self.connect_signals()
+        self.apply_filter()
+
+    def init_ui(self, prompt_name):
+        self.prompt_filter.addItems([ALL, *self.history.distinct("prompt_name")])
+        self.model_filter.addItems([ALL, *self.history.distinct("model")])
+        self.status_filter.addItems([ALL, STATUS_OK, STATUS_ERROR])
+        if prompt_name and self.prompt_filter.findText(prompt_name) >= 0:
+            self.prompt_filter.setCurrentText(prompt_name)
+
+        self.table_view.setModel(self.table_model)
+        self.table_view.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table_view.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        self.table_view.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
+        self.table_view.horizontalHeader().setStretchLastSection(True)
+        self.table_view.verticalHeader().setVisible(False)
+
+        filters = QHBoxLayout()
+        for label, widget in (("Prompt:", self.prompt_filter), ("Model:", self.model_filter),
+                              ("Status:", self.status_filter)):
+            filters.addWidget(QLabel(label))
+            filters.addWidget(widget, 1)
+        filters.addWidget(self.count_label)
+
+        splitter = QSplitter(Qt.Orientation.Vertical)
+        splitter.addWidget(self.table_view)
+        splitter.addWidget(self.detail_tabs)
+        splitter.setStretchFactor(0, 1)
+        splitter.setStretchFactor(1, 1)
+
+        layout = QVBoxLayout(self)
+        layout.addLayout(filters)
+        layout.addWidget(splitter, 1)
+        layout.addWidget(self.close_button, alignment=Qt.AlignmentFlag.AlignRight)
+
+    def connect_signals(self):
+        for combo in (self.prompt_filter, self.model_filter, self.status_filter):
+            combo.currentTextChanged.connect(self.apply_filter)
+        self.table_view.selectionModel().currentRowChanged.connect(self.show_run)
+        self.close_button.clicked.connect(self.accept)
+
+    def current_filter(self) -> HistoryFilter:
+        def value(combo):
+            text = combo.currentText()
+            return None if text == ALL else text
+
+        return HistoryFilter(prompt_name=value(self.prompt_filter), model=value(self.model_filter),
+                             status=value(self.status_filter))
+
+    def apply_filter(self):
+        history_filter = self.current_filter()
+        self.table_model.set_filter(history_filter)
+        self.count_label.setText(f"{self.history.count(history_filter)} run(s)")
+        self.clear_details()
+        if self.table_model.rowCount():
+            self.table_view.selectRow(0)
+
+    def clear_details(self):
+        while self.detail_tabs.count():
+            page = self.detail_tabs.widget(0)
+            self.detail_tabs.removeTab(0)
+            page.deleteLater()
+
+    def show_run(self, current, previous=None):
+        self.clear_details()
+        if not current.isValid():
+            return
+        record = self.history.get(self.table_model.records[current.row()].id)
+        details = record.details
+
+        def add_tab(label, content):
+            edit = QTextEdit()
+            edit.setPlainText(content)
+            edit.setReadOnly(True)
+            self.detail_tabs.addTab(edit, label)
+
+        if details.get("error"):
+            add_tab("Error", details["error"])
+        add_tab("Response", details.get("response") or "")
+        add_tab("Prompt", details.get("prompt_text") or "")
+        add_tab("System Prompt", details.get("system_prompt") or "")
+        if details.get("think"):
+            add_tab("Think", details["think"])
+        latency = f"{record.latency:.2f}s" if record.latency is not None else "N/A"
+        add_tab("Model & Usage",
+                f"Model: {details.get('response_model') or record.model}\n"
+                f"Prompt Version: {record.prompt_version}\n"
+                f"Latency: {latency}\n"
+                f"Usage: {json.dumps(details.get('usage') or {}, indent=4)}\n")
+        add_tab("Parameters", json.dumps(details.get("parameters") or {}, indent=4))
+        citations = details.get("citations") or []
+        if citations:
+            add_tab("Citations", "\n\n".join(
+                f"📰 {cite.get('title', 'No Title')}\n🔗 URL: {cite.get('url', 'No URL')}" for cite in citations))
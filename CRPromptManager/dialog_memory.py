@@ -0,0 +1,148 @@
+# dialog_memory.py
+
+from PySide6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QTableWidget, QTableWidgetItem,
+    QHeaderView, QGroupBox
+)
+from PySide6.QtCore import Qt, QTimer
+import logging
+
+# Logger Configuration
+logger = logging.getLogger(__name__)
+
+from cp_memory import MemoryBudget, MemoryDiagnostics, memory_budget
+
+PRIORITY_NAMES = {0: "low", 50: "normal", 100: "high"}
+
+
+def _megabytes(size: int) -> str:
+    return f"{size / 2**20:.2f}"
+
+
+class MemoryDialog(QDialog):
+    """
+    Memory held by the budgeted caches, refreshed every second, and tracemalloc snapshots of
+    where the process allocates. Trim evicts down to the budget's low-water mark now.
+    """
+    ACCOUNT_COLUMNS = ["Cache", "Priority", "Size (MB)", "Entries", "Evicted (MB)"]
+    SITE_COLUMNS = ["Allocated at", "Size (KB)", "Blocks", "Growth (KB)"]
+
+    def __init__(self, budget: MemoryBudget = memory_budget, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Memory Usage")
+        self.setMinimumSize(900, 600)
+        self.budget = budget
+        self.diagnostics = MemoryDiagnostics()
+
+        self.summary_label = QLabel()
+        self.account_table = QTableWidget(0, len(self.ACCOUNT_COLUMNS))
+        self.trim_button = QPushButton("Trim Caches")
+        self.tracemalloc_label = QLabel()
+        self.tracemalloc_button = QPushButton()
+        self.snapshot_button = QPushButton("Take Snapshot")
+        self.site_table = QTableWidget(0, len(self.SITE_COLUMNS))
+        self.close_button = QPushButton("Close")
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(1000)
+
+        self.init_ui()
+        self.connect_signals()
+        self.show_accounts()
+        self.show_tracemalloc_state()
+
+    def init_ui(self):
+        for table, columns in ((self.account_table, self.ACCOUNT_COLUMNS), (self.site_table, self.SITE_COLUMNS)):
+            table.setHorizontalHeaderLabels(columns)
+            table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+            table.horizontalHeader().setStretchLastSection(True)
+            table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+            table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
+            table.verticalHeader().setVisible(False)
+        self.trim_button.setToolTip("Evict from the caches now, lowest priority first")
+
+        budget_row = QHBoxLayout()
+        budget_row.addWidget(self.summary_label, 1)
+        budget_row.addWidget(self.trim_button)
+
+        budget_group = QGroupBox("Budgeted caches")
+        budget_layout = QVBoxLayout(budget_group)
+        budget_layout.addLayout(budget_row)
+        budget_layout.addWidget(self.account_table, 1)
+
+        snapshot_row = QHBoxLayout()
+        snapshot_row.addWidget(self.tracemalloc_label, 1)
+        snapshot_row.addWidget(self.tracemalloc_button)
+        snapshot_row.addWidget(self.snapshot_button)
+
+        snapshot_group = QGroupBox("Allocations (tracemalloc)")
+        snapshot_layout = QVBoxLayout(snapshot_group)
+        snapshot_layout.addLayout(snapshot_row)
+        snapshot_layout.addWidget(self.site_table, 1)
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(budget_group, 1)
+        layout.addWidget(snapshot_group, 1)
+        layout.addWidget(self.close_button, alignment=Qt.AlignmentFlag.AlignRight)
+
+    def connect_signals(self):
+        self.refresh_timer.timeout.connect(self.show_accounts)
+        self.trim_button.clicked.connect(self.trim)
+        self.tracemalloc_button.clicked.connect(self.toggle_tracemalloc)
+        self.snapshot_button.clicked.connect(self.take_snapshot)
+        self.close_button.clicked.connect(self.accept)
+
+    def showEvent(self, event):
+        self.refresh_timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.refresh_timer.stop()
+        super().hideEvent(event)
+
+    def show_accounts(self):
+        report = self.budget.report()
+        self.summary_label.setText(report.summary())
+        self.account_table.setRowCount(len(report.accounts))
+        for row, account in enumerate(report.accounts):
+            values = (account.name, PRIORITY_NAMES.get(account.priority, str(account.priority)),
+                      _megabytes(account.size), str(account.entries), _megabytes(account.evicted))
+            for column, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if column >= 2:
+                    item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+                self.account_table.setItem(row, column, item)
+
+    def trim(self):
+        freed = self.budget.enforce(target=0)
+        logger.info(f"Trimmed {freed / 2**20:.1f} MB from the caches")
+        self.show_accounts()
+
+    def show_tracemalloc_state(self):
+        tracing = self.diagnostics.tracing
+        self.tracemalloc_button.setText("Stop Tracking" if tracing else "Start Tracking")
+        self.snapshot_button.setEnabled(tracing)
+        if tracing:
+            current, peak = self.diagnostics.traced_memory()
+            self.tracemalloc_label.setText(f"Tracked since start: {_megabytes(current)} MB, peak {_megabytes(peak)} MB")
+        else:
+            self.tracemalloc_label.setText("Allocation tracking is off; it slows the editor down while on")
+
+    def toggle_tracemalloc(self):
+        if self.diagnostics.tracing:
+            self.diagnostics.stop()
+            self.site_table.setRowCount(0)
+        else:
+            self.diagnostics.start()
+        self.show_tracemalloc_state()
+
+    def take_snapshot(self):
+        sites = self.diagnostics.snapshot()
+        self.site_table.setRowCount(len(sites))
+        for row, site in enumerate(sites):
+            values = (site.location, f"{site.size / 1024:.1f}", str(site.count), f"{site.growth / 1024:+.1f}")
+            for column, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if column >= 1:
+                    item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+                self.site_table.setItem(row, column, item)
+        self.show_tracemalloc_state()
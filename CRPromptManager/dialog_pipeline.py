@@ -0,0 +1,116 @@
+# dialog_pipeline.py
+
+from PySide6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QTextEdit, QPushButton,
+    QMessageBox, QTableWidget, QTableWidgetItem, QHeaderView
+)
+from PySide6.QtCore import Signal
+import logging
+
+# Logger Configuration
+logger = logging.getLogger(__name__)
+
+from WrapSideSix import run_in_thread
+from cp_pipeline import Pipeline, PipelineExecutor, ResponseCache, NodeResult
+from cp_runner import api_response_call
+
+STATUS_WAITING = "Waiting"
+STATUS_RUNNING = "Running"
+STATUS_DONE = "Done"
+STATUS_CACHED = "Cached"
+
+
+class PipelineRunDialog(QDialog):
+    """Runs a pipeline file against the open library and shows each node's response."""
+    node_finished = Signal(object)  # NodeResult, emitted from the pipeline thread
+
+    def __init__(self, library, api_key, model, pipeline: Pipeline, title: str = "Run Pipeline", parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(title)
+        self.setMinimumSize(800, 600)
+        self.library = library
+        self.pipeline = pipeline
+        self.order = pipeline.order()
+        self.results: dict[str, NodeResult] = {}
+        # The cache lives as long as the dialog, so re-running only sends changed nodes
+        self.executor = PipelineExecutor(library, api_response_call(api_key), model, cache=ResponseCache())
+
+        self.node_table = QTableWidget(len(self.order), 4)
+        self.node_table.setHorizontalHeaderLabels(["Node", "Prompt", "Status", "Seconds"])
+        self.node_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.node_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.node_table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
+        self.response_display = QTextEdit()
+        self.response_display.setReadOnly(True)
+        self.run_button = QPushButton("Run Pipeline")
+        self.close_button = QPushButton("Close")
+
+        self.init_ui()
+        self.connect_signals()
+
+    def init_ui(self):
+        for row, name in enumerate(self.order):
+            self.node_table.setItem(row, 0, QTableWidgetItem(name))
+            self.node_table.setItem(row, 1, QTableWidgetItem(self.pipeline.nodes[name].prompt))
+            self.node_table.setItem(row, 2, QTableWidgetItem(STATUS_WAITING))
+            self.node_table.setItem(row, 3, QTableWidgetItem(""))
+
+        buttons = QHBoxLayout()
+        buttons.addWidget(self.run_button)
+        buttons.addWidget(self.close_button)
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(QLabel("Nodes:"))
+        layout.addWidget(self.node_table, 1)
+        layout.addWidget(QLabel("Response:"))
+        layout.addWidget(self.response_display, 2)
+        layout.addLayout(buttons)
+
+    def connect_signals(self):
+        self.run_button.clicked.connect(self.run_pipeline)
+        self.close_button.clicked.connect(self.accept)
+        self.node_finished.connect(self.on_node_finished)
+        self.node_table.currentCellChanged.connect(lambda row, *_: self.show_response(row))
+
+    def set_status(self, name: str, status: str, seconds: str = ""):
+        row = self.order.index(name)
+        self.node_table.item(row, 2).setText(status)
+        self.node_table.item(row, 3).setText(seconds)
+
+    def run_pipeline(self):
+        self.run_button.setEnabled(False)
+        self.results = {}
+        self.response_display.clear()
+        for name in self.order:
+            self.set_status(name, STATUS_RUNNING)
+
+        def task(**kwargs):
+            return self.executor.run(self.pipeline, on_node_done=self.node_finished.emit)
+
+        def on_finish(results):
+            self.run_button.setEnabled(True)
+            logger.info(f"Pipeline finished, {sum(r.cached for r in results.values())} node(s) from cache")
+
+        def on_error(error_info):
+            exception, tb = error_info
+            logger.error(f"Pipeline failed: {exception}")
+            for name in self.order:
+                if name not in self.results:
+                    self.set_status(name, STATUS_WAITING)
+            self.run_button.setEnabled(True)
+            QMessageBox.critical(self, "Pipeline Failed", str(exception))
+
+        run_in_thread(task, on_finish=on_finish, on_error=on_error, parent=self)
+
+    def on_node_finished(self, result: NodeResult):
+        self.results[result.name] = result
+        self.set_status(result.name, STATUS_CACHED if result.cached else STATUS_DONE,
+                        "" if result.cached else f"{result.seconds:.2f}")
+        if self.node_table.currentRow() == self.order.index(result.name):
+            self.show_response(self.node_table.currentRow())
+
+    def show_response(self, row: int):
+        if not 0 <= row < len(self.order):
+            return
+        result = self.results.get(self.order[row])
+        self.response_display.setPlainText(result.text if result else "")
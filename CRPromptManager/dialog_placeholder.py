@@ -10,8 +10,7 @@ logger = logging.getLogger(__name__)
 
 from WrapSideSix.widgets.line_edit_widget import WSLineButtonFile
 
-import WrapSideSix.icons.icons_mat_des
-WrapSideSix.icons.icons_mat_des.qInitResources()
+from gui_resources import init_icon_resources
 
 class PlaceholderDialog(QDialog):
     def __init__(self, placeholders=None, file_placeholders=None, parent=None):
@@ -21,6 +20,7 @@ class PlaceholderDialog(QDialog):
         """
         super().__init__(parent)
         self.setWindowTitle("Fill in Placeholders")
+        init_icon_resources()
 
         # Default to empty lists
         self.placeholders = placeholders or []
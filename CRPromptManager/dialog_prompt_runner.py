@@ -8,26 +8,32 @@ from PySide6.QtCore import Qt
 from PySide6.QtGui import QTextCursor
 
 import json
-import re
-from pathlib import Path
+import time
 
 import logging
 logger = logging.getLogger(__name__)
 
 # from WrapAIVenice import VeniceTextPrompt, VeniceChatPrompt, PromptTemplate, FILE_HANDLERS, PromptAttributes
-from WrapAI import VeniceTextPrompt, VeniceChatPrompt, PromptTemplate, FILE_HANDLERS, parse_response_with_schema
 from WrapSideSix import (run_in_thread, WSProgressHandler,
                          WSGridLayoutHandler, WSGridRecord, WSGridPosition
                          )
 from dialog_placeholder import PlaceholderDialog
 from cp_core import (PROMPT_TYPE_QUESTION, PROMPT_TYPE_CHAT)
-from cp_core import populate_model_combo_list, get_model_attributes
+from cp_core import get_model_attributes
+from model_catalog import ModelCatalog
+from cp_render import (get_placeholders, get_file_placeholders, render_prompt_text,
+                       strip_output_placeholders, read_file_placeholder, LAYOUT_INLINE, RunSettings)
+from cp_trace import span
+from cp_runner import (create_runner, format_response_text, record_usage, cached_prompt_tokens, session_usage,
+                       ChatHistoryBudget, send_prompt)
 from WrapConfig import RuntimeConfig
 
 
 class PromptRunDialog(QDialog):
     def __init__(self, api_key, model, prompt_text, response_type=PROMPT_TYPE_QUESTION, system_prompt="You are a helpful assistant.",
-                 attributes=None, parent=None):
+                 attributes=None, layout=LAYOUT_INLINE, file_reader=read_file_placeholder,
+                 prompt_name="", prompt_version="", history=None, template_fields=None, model_catalog=None,
+                 parent=None):
         super().__init__(parent)
         self.setWindowTitle("Run Prompt")
         self.setMinimumSize(800, 600)
@@ -39,14 +45,26 @@ class PromptRunDialog(QDialog):
         self.api_key = api_key
         self.model = model
         self.run_time = RuntimeConfig()
+        self.model_catalog = model_catalog or ModelCatalog(self.run_time, parent=self)
         # self.prompt_text = prompt_text
-        self.prompt_text = re.sub(r'@@\s*[\w.-]+\s*@@', '', prompt_text)
+        self.prompt_text = strip_output_placeholders(prompt_text)
 
         self.response_type = response_type
         self.system_prompt = system_prompt
         self.prompt_attributes = attributes or {}
+        self.prompt_layout = layout
+        self.file_reader = file_reader  # read_file_placeholder or a cp_extract.FileExtractor
+        self.prompt_name = prompt_name
+        self.prompt_version = prompt_version
+        self.history = history  # cp_history.RunHistory, every run is recorded when set
+        self.template_fields = template_fields  # cp_render.TemplateFields of prompt_text from the editor's index
+        self.latency = None
         self.response = None
+        self.shared_response = False  # the last response answered a coalesced request
         self.runner = None
+        # Chat memory is accounted against the memory budget while the dialog is open
+        self.chat_budget = ChatHistoryBudget(f"Chat history: {prompt_name or 'prompt'}") \
+            if response_type == PROMPT_TYPE_CHAT else None
 
         # Display widgets
         self.main_grid = WSGridLayoutHandler()
@@ -55,6 +73,8 @@ class PromptRunDialog(QDialog):
         self.button_grid = WSGridLayoutHandler()
 
         self.model_combobox = QComboBox()
+        self.refresh_models_button = QPushButton("Refresh")
+        self.refresh_models_button.setToolTip("Fetch the model list again")
         self.prompt_display = QTextEdit()
         self.response_display = QTextEdit()
         self.run_button = QPushButton("Run Prompt")
@@ -94,7 +114,10 @@ class PromptRunDialog(QDialog):
             WSGridRecord(widget=self.model_combobox,
                          position=WSGridPosition(row=0, column=1),
                          # alignment = Qt.AlignmentFlag.AlignTrailing,
-                         col_stretch=10)
+                         col_stretch=10),
+            WSGridRecord(widget=self.refresh_models_button,
+                         position=WSGridPosition(row=0, column=2),
+                         col_stretch=0)
         ]
         self.model_grid.add_widget_records(model_widgets)
 
@@ -145,6 +168,8 @@ class PromptRunDialog(QDialog):
         self.details_button.clicked.connect(self.show_detailed_response)
         self.close_button.clicked.connect(self.accept)
         self.model_combobox.currentTextChanged.connect(self.update_model)
+        self.refresh_models_button.clicked.connect(lambda: self.populate_model_combobox(refresh=True))
+        self.model_catalog.refreshing_changed.connect(self.on_models_refreshing)
 
     def get_runner(self):
         # mode = self.form_combo.currentText()
@@ -154,13 +179,7 @@ class PromptRunDialog(QDialog):
             return self.runner  # ✅ Reuse same runner (preserve chat memory)
 
         # New runner (or mode switch)
-        if mode == PROMPT_TYPE_CHAT:
-            self.runner = VeniceChatPrompt(self.api_key, self.model)
-        else:
-            self.runner = VeniceTextPrompt(self.api_key, self.model)
-
-        self.runner.set_attributes(**self.prompt_attributes)
-        # self.runner.set_attributes(self.attributes)
+        self.runner = create_runner(self.api_key, self.model, mode, self.prompt_attributes)
 
         self.runner_mode = mode
         return self.runner
@@ -172,16 +191,35 @@ class PromptRunDialog(QDialog):
 
         self.run_button.setEnabled(False)
 
+        raw_prompt = self.prompt_display.toPlainText()
+        values = self.ask_placeholder_values(raw_prompt)
+        self.formatted_prompt = raw_prompt
+        self.latency = None
+
         self.progress = WSProgressHandler(self, use_dialog=True, title="Running AI Prompt", indeterminate=True)
         self.progress.show()
 
-        raw_prompt = self.prompt_display.toPlainText()
-        self.formatted_prompt = self.build_prompt_text(raw_prompt)
-        self.prompt_display.setPlainText(self.formatted_prompt)
-
         def task(**kwargs):
+            # Files are extracted here, off the GUI thread
+            self.formatted_prompt = render_prompt_text(raw_prompt, values, file_reader=self.file_reader,
+                                                       layout=self.prompt_layout)
             self.runner = self.get_runner()
-            return self.runner.prompt(self.formatted_prompt, system_prompt=self.system_prompt)
+            start = time.perf_counter()
+            if self.chat_budget is not None:
+                self.chat_budget.busy = True
+            try:
+                if self.response_type == PROMPT_TYPE_QUESTION:
+                    # A question identical to one already in flight shares its response
+                    settings = RunSettings(self.formatted_prompt, self.system_prompt, self.prompt_attributes)
+                    response, self.shared_response = send_prompt(self.runner, settings, self.model)
+                    return response
+                self.shared_response = False
+                with span("runner.prompt", "network", model=self.model, response_type=self.response_type):
+                    return self.runner.prompt(self.formatted_prompt, system_prompt=self.system_prompt)
+            finally:
+                self.latency = time.perf_counter() - start
+                if self.chat_budget is not None:
+                    self.chat_budget.busy = False
 
         def on_start():
             logger.info("Prompt started...")
@@ -189,6 +227,13 @@ class PromptRunDialog(QDialog):
         def on_finish(response):
             self.response = response
             self.progress.close()
+            if self.chat_budget is not None:
+                self.chat_budget.set_runner(self.runner)
+            self.prompt_display.setPlainText(self.formatted_prompt)
+            if response:
+                if not self.shared_response:
+                    record_usage(response)
+                self.record_run(response)
             self.run_button.setEnabled(True)
 
             if not self.response:
@@ -197,24 +242,8 @@ class PromptRunDialog(QDialog):
 
             text = self.response.response if self.response.response is not None else "No response available."
 
-            schema_json = self.prompt_attributes.get("response_format")
-            use_json = schema_json is not None and isinstance(schema_json, dict)
-
             if self.response_type == PROMPT_TYPE_QUESTION:
-                if use_json:
-                    try:
-                        parsed_data = parse_response_with_schema(
-                            response_json=json.loads(text),
-                            schema_json=schema_json,
-                            include_missing_optionals=False
-                        )
-                        formatted = "\n\n".join(f"=== {key} ===\n{value}" for key, value in parsed_data.items())
-                        self.response_display.setPlainText(formatted)
-                    except Exception as e:
-                        logger.warning(f"Failed to parse JSON response with schema: {e}")
-                        self.response_display.setPlainText(text)
-                else:
-                    self.response_display.setPlainText(text)
+                self.response_display.setPlainText(format_response_text(self.response, self.prompt_attributes))
 
             if self.response_type == PROMPT_TYPE_CHAT:
                 existing_html = self.response_display.toHtml()
@@ -235,6 +264,7 @@ class PromptRunDialog(QDialog):
             exception, tb = error_info
             logger.exception("Prompt failed")
             self.progress.close()
+            self.record_run(None, error=str(exception))
             QMessageBox.critical(self, "Error", str(exception))
             self.run_button.setEnabled(True)
 
@@ -246,6 +276,23 @@ class PromptRunDialog(QDialog):
             parent=self
         )
 
+    def record_run(self, response, error=None):
+        if self.history is None:
+            return
+        try:
+            if response is not None:
+                self.history.record_response(self.prompt_name, self.prompt_version, self.model, self.response_type,
+                                             self.formatted_prompt, self.system_prompt, response,
+                                             latency=self.latency, parameters=self.prompt_attributes,
+                                             shared=self.shared_response)
+            else:
+                self.history.record(self.prompt_name, self.prompt_version, self.model, self.response_type,
+                                    {"prompt_text": self.formatted_prompt, "system_prompt": self.system_prompt,
+                                     "parameters": self.prompt_attributes},
+                                    latency=self.latency, error=error)
+        except Exception as e:
+            logger.error(f"Could not record run in history: {e}")
+
     def show_detailed_response(self):
         if not self.response:
             return
@@ -275,6 +322,9 @@ class PromptRunDialog(QDialog):
             f"Prompt Tokens: {usage.get('prompt_tokens', 'N/A')}\n"
             f"Completion Tokens: {usage.get('completion_tokens', 'N/A')}\n"
         )
+        cached = cached_prompt_tokens(usage)
+        usage_text += f"Cached Prompt Tokens: {cached if cached is not None else 'not reported'}\n"
+        usage_text += f"\nSession: {session_usage.summary()}\n"
         add_tab("Model & Usage", usage_text)
 
         add_tab("Parameters", json.dumps(self.response.parameters or {}, indent=4))
@@ -294,7 +344,7 @@ class PromptRunDialog(QDialog):
             citations_text = "\n".join(citations_lines)
             add_tab("Citations", citations_text)
 
-        if isinstance(self.runner, VeniceChatPrompt):
+        if self.runner_mode == PROMPT_TYPE_CHAT and hasattr(self.runner, "memory"):
             history = self.runner.memory.message_history
             formatted = "\n\n".join(f"{m['role'].capitalize()}: {m['content']}" for m in history)
             add_tab("Chat History", formatted)
@@ -309,52 +359,23 @@ class PromptRunDialog(QDialog):
         dialog.setLayout(layout)
         dialog.exec()
 
-    def build_prompt_text(self, raw_prompt_text: str) -> str:
-        """Replaces both variable and file placeholders properly before sending the prompt."""
-        temp_prompt = PromptTemplate(
-            type="user",
-            subtype="",
-            prompt_text=raw_prompt_text
-        )
-
-        placeholders = temp_prompt.get_placeholders()
-        file_placeholders = temp_prompt.get_file_placeholders()
+    def ask_placeholder_values(self, raw_prompt_text: str) -> dict:
+        """Ask for text values and file paths; the prompt is rendered with them when it runs."""
+        if self.template_fields is not None and raw_prompt_text == self.prompt_text:
+            placeholders = list(self.template_fields.placeholders)
+            file_placeholders = list(self.template_fields.file_placeholders)
+        else:  # the prompt was edited here
+            placeholders = get_placeholders(raw_prompt_text)
+            file_placeholders = get_file_placeholders(raw_prompt_text)
 
         if not placeholders and not file_placeholders:
-            return raw_prompt_text
+            return {}
 
         dialog = PlaceholderDialog(placeholders, file_placeholders, parent=self)
         if dialog.exec() != QDialog.DialogCode.Accepted:
-            return raw_prompt_text  # user cancelled
-
-        values = dialog.values
-        prompt_text = raw_prompt_text  # start with raw
-
-        # 🔹Inline replace file placeholders early
-        for fph in file_placeholders:
-            file_path = Path(values.get(fph, ""))
-            if file_path.exists():
-                ext = file_path.suffix.lower()
-                handler = FILE_HANDLERS.get(ext)
-                if handler:
-                    try:
-                        content = handler(file_path).strip()
-                    except Exception as e:
-                        content = f"[Error reading file: {file_path.name}]"
-                        logger.error(f"Handler error for {file_path}: {e}")
-                else:
-                    content = f"[Unsupported file type: {ext}]"
-            else:
-                content = f"[Missing file: {file_path.name}]"
+            return {}  # user cancelled, placeholders are sent as-is
 
-            prompt_text = prompt_text.replace(f"%% {fph} %%", content)
-
-        # 🔹 Replace variable placeholders
-        for ph in placeholders:
-            if ph in values:
-                prompt_text = re.sub(fr"<<\s*{re.escape(ph)}\s*>>", values[ph], prompt_text)
-
-        return prompt_text
+        return dialog.values
 
     def validate_prompt(self):
         # Get model attributes using shared utility
@@ -399,18 +420,29 @@ class PromptRunDialog(QDialog):
         return True
 
     def populate_model_combobox(self, refresh=False):
-        populate_model_combo_list(self.model_combobox, self.model, self.api_key, self.run_time, refresh=refresh)
+        if refresh:
+            self.model_catalog.refresh(self.api_key)  # the combobox follows when the new list arrives
+            return
+        self.model_catalog.attach(self.model_combobox, self.model)
+        self.model_catalog.refresh(self.api_key, force=False)
+        self.on_models_refreshing(self.model_catalog.refreshing)
+
+    def on_models_refreshing(self, refreshing):
+        self.refresh_models_button.setEnabled(not refreshing)
+        self.refresh_models_button.setText("Refreshing..." if refreshing else "Refresh")
 
 
     def update_model(self):
         self.model = self.model_combobox.currentData()
 
         # If in chat mode, preserve memory across runner swaps
-        if self.response_type == PROMPT_TYPE_CHAT and isinstance(self.runner, VeniceChatPrompt):
+        if self.response_type == PROMPT_TYPE_CHAT and hasattr(self.runner, "memory"):
             old_memory = self.runner.memory
-            self.runner = VeniceChatPrompt(self.api_key, self.model)
+            self.runner = create_runner(self.api_key, self.model, PROMPT_TYPE_CHAT, self.prompt_attributes)
             self.runner.memory = old_memory  # Transfer whole ConversationMemory object
+            if self.chat_budget is not None:
+                self.chat_budget.set_runner(self.runner)
         else:
             self.runner = None  # For text/question mode, just clear runner
 
-        print(f"Model changed to: {self.model} (chat memory preserved)")
+        logger.info(f"Model changed to: {self.model}")
@@ -3,7 +3,7 @@
 from dataclasses import dataclass
 from PySide6.QtWidgets import (
     QApplication, QDialog, QVBoxLayout, QDialogButtonBox,
-    QLineEdit, QLabel, QMessageBox, QComboBox, QFileDialog
+    QLineEdit, QLabel, QMessageBox, QComboBox, QFileDialog, QCheckBox, QSpinBox
 )
 from PySide6.QtCore import Qt, QDir
 
@@ -19,10 +19,9 @@ from WrapSideSix.io.gui_binder import WSGuiBinder
 from WrapSideSix.widgets.line_edit_widget import WSLineButton
 from WrapConfig import INIHandler, RuntimeConfig, SecretsManager
 
-import WrapSideSix.icons.icons_mat_des
-WrapSideSix.icons.icons_mat_des.qInitResources()
-
-from cp_core import populate_model_combo_list
+from gui_resources import init_icon_resources
+from model_catalog import ModelCatalog
+from cp_memory import DEFAULT_BUDGET_MB
 
 
 @dataclass
@@ -36,23 +35,42 @@ class DialogSettings:
 
 
 class SettingsDialog(QDialog):
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, model_catalog=None):
         super().__init__(parent)
         self.setWindowTitle("Prompt Manager Settings")
         self.setMinimumWidth(700)
+        init_icon_resources()
 
         self.run_time = RuntimeConfig()
         self.ini_handler = INIHandler(self.run_time.ini_file_name)
         self.secrets = SecretsManager(".env")
         self.header_data_ref = None
+        self.model_catalog = model_catalog or ModelCatalog(self.run_time, parent=self)
+        self.checked_api_key = None  # last key sent for checking
 
         # Widgets
         self.venice_ai_api = QLineEdit()
+        self.api_key_status = QLabel()
         self.default_model_combobox = QComboBox()
         self.default_prompt_file = WSLineButton(button_icon=":/icons/mat_des/file_open_24dp.png", button_action=self.select_default_prompt_file, use_custom_menu=True)
         self.app_name = QLineEdit()
         self.data_version = QLineEdit()
         self.file_type = QLineEdit()
+        self.isolated_file_extraction = QCheckBox("Read placeholder files in a separate process")
+        self.isolated_file_extraction.setToolTip(
+            "Slower to start, but a file that hangs or crashes its handler cannot freeze the editor")
+        self.autosave = QCheckBox("Save changes automatically in the background")
+        self.autosave.setToolTip("Edits are written a moment after you stop typing, and before the editor closes")
+        self.trace = QCheckBox("Record a performance trace")
+        self.trace.setToolTip("Written to crpm-trace.json next to the settings file when the editor closes; "
+                              "open it in ui.perfetto.dev or chrome://tracing")
+        self.trace_profile = QCheckBox("Also profile a sample of traced calls with cProfile")
+        self.trace_profile.setToolTip("Statistics are written next to the trace as crpm-trace.prof")
+        self.memory_budget = QSpinBox()
+        self.memory_budget.setRange(16, 65536)
+        self.memory_budget.setSuffix(" MB")
+        self.memory_budget.setToolTip("Memory for cached responses, extracted files, include expansions and chat "
+                                      "histories; the least important are trimmed beyond it")
         self.project_dir = QDir.homePath()
         self.button_box = QDialogButtonBox(QDialogButtonBox.StandardButton.Save | QDialogButtonBox.StandardButton.Cancel)
 
@@ -71,22 +89,34 @@ class SettingsDialog(QDialog):
             WSGridRecord(QLabel("Default Model"), WSGridPosition(2, 0)),
             WSGridRecord(self.default_model_combobox, WSGridPosition(2, 1)),
 
-            WSGridRecord(QLabel(""), WSGridPosition(3, 0), col_span=2),
+            WSGridRecord(self.api_key_status, WSGridPosition(3, 1)),
             WSGridRecord(QLabel("Optional fields"), WSGridPosition(4, 0), alignment=Qt.AlignmentFlag.AlignRight),
             WSGridRecord(QLabel("Default Prompt File"), WSGridPosition(5, 0)),
             WSGridRecord(self.default_prompt_file, WSGridPosition(5, 1)),
+            WSGridRecord(QLabel("File Placeholders"), WSGridPosition(6, 0)),
+            WSGridRecord(self.isolated_file_extraction, WSGridPosition(6, 1)),
+
+            WSGridRecord(QLabel("Saving"), WSGridPosition(7, 0)),
+            WSGridRecord(self.autosave, WSGridPosition(7, 1)),
 
-            WSGridRecord(QLabel(""), WSGridPosition(6, 0), col_span=2),
-            WSGridRecord(QLabel("Prompt File Header Information"), WSGridPosition(7, 0), col_span=2),
-            WSGridRecord(QLabel("Application Name"), WSGridPosition(8, 0)),
-            WSGridRecord(self.app_name, WSGridPosition(8, 1)),
-            WSGridRecord(QLabel("Data Version"), WSGridPosition(9, 0)),
-            WSGridRecord(self.data_version, WSGridPosition(9, 1)),
-            WSGridRecord(QLabel("File Type"), WSGridPosition(10, 0)),
-            WSGridRecord(self.file_type, WSGridPosition(10, 1)),
+            WSGridRecord(QLabel("Diagnostics"), WSGridPosition(8, 0)),
+            WSGridRecord(self.trace, WSGridPosition(8, 1)),
+            WSGridRecord(self.trace_profile, WSGridPosition(9, 1)),
+
+            WSGridRecord(QLabel("Cache Memory"), WSGridPosition(10, 0)),
+            WSGridRecord(self.memory_budget, WSGridPosition(10, 1)),
 
             WSGridRecord(QLabel(""), WSGridPosition(11, 0), col_span=2),
-            WSGridRecord(self.button_box, WSGridPosition(12, 0), col_span=2),
+            WSGridRecord(QLabel("Prompt File Header Information"), WSGridPosition(12, 0), col_span=2),
+            WSGridRecord(QLabel("Application Name"), WSGridPosition(13, 0)),
+            WSGridRecord(self.app_name, WSGridPosition(13, 1)),
+            WSGridRecord(QLabel("Data Version"), WSGridPosition(14, 0)),
+            WSGridRecord(self.data_version, WSGridPosition(14, 1)),
+            WSGridRecord(QLabel("File Type"), WSGridPosition(15, 0)),
+            WSGridRecord(self.file_type, WSGridPosition(15, 1)),
+
+            WSGridRecord(QLabel(""), WSGridPosition(16, 0), col_span=2),
+            WSGridRecord(self.button_box, WSGridPosition(17, 0), col_span=2),
         ])
 
         layout = QVBoxLayout()
@@ -107,6 +137,8 @@ class SettingsDialog(QDialog):
         self.button_box.accepted.connect(self.accept)
         self.button_box.rejected.connect(self.reject)
         self.venice_ai_api.editingFinished.connect(self.on_api_key_changed)
+        self.model_catalog.key_checked.connect(self.on_api_key_checked)
+        self.model_catalog.refreshing_changed.connect(self.on_models_refreshing)
 
     def set_fields(self, header_data=None):
         settings = DialogSettings(
@@ -117,6 +149,15 @@ class SettingsDialog(QDialog):
 
         self.binder.instance = settings
         self.binder.to_gui()
+        self.checked_api_key = settings.api_key  # the saved key is not checked again
+        self.api_key_status.setText("")
+        self.isolated_file_extraction.setChecked(
+            self.ini_handler.read_value("CRPromptManager", "isolated_file_extraction") == "True")
+        self.autosave.setChecked(self.ini_handler.read_value("CRPromptManager", "autosave") == "True")
+        self.trace.setChecked(self.ini_handler.read_value("CRPromptManager", "trace") == "True")
+        self.trace_profile.setChecked(self.ini_handler.read_value("CRPromptManager", "trace_profile") == "True")
+        memory_budget_mb = self.ini_handler.read_value("CRPromptManager", "memory_budget_mb") or ""
+        self.memory_budget.setValue(int(memory_budget_mb) if memory_budget_mb.isdigit() else DEFAULT_BUDGET_MB)
 
         if header_data is None:
             self.app_name.setEnabled(False)
@@ -148,24 +189,46 @@ class SettingsDialog(QDialog):
         self.secrets.set_secret("Venice_API_KEY", settings.api_key)
         self.ini_handler.create_or_update_option("CRPromptManager", "default_model", settings.default_model)
         self.ini_handler.create_or_update_option("CRPromptManager", "default_prompt_file", settings.default_prompt_file)
+        self.ini_handler.create_or_update_option("CRPromptManager", "isolated_file_extraction",
+                                                 str(self.isolated_file_extraction.isChecked()))
+        self.ini_handler.create_or_update_option("CRPromptManager", "autosave", str(self.autosave.isChecked()))
+        self.ini_handler.create_or_update_option("CRPromptManager", "trace", str(self.trace.isChecked()))
+        self.ini_handler.create_or_update_option("CRPromptManager", "trace_profile", str(self.trace_profile.isChecked()))
+        self.ini_handler.create_or_update_option("CRPromptManager", "memory_budget_mb", str(self.memory_budget.value()))
         self.ini_handler.save_changes()
 
         return True
 
     def on_api_key_changed(self):
-        # Reload the default model from INI/config in case user changed it
-        current_model = self.ini_handler.read_value("CRPromptManager", "default_model")
-        self.populate_default_model_combobox(current_model)
+        """Check a new key in the background; the dialog stays usable meanwhile."""
+        api_key = self.venice_ai_api.text().strip()
+        if not api_key or api_key == self.checked_api_key:
+            return
+        self.checked_api_key = api_key
+        self.api_key_status.setText("Checking API key...")
+        self.model_catalog.check_key(api_key)
+
+    def on_api_key_checked(self, api_key, valid, message):
+        if api_key != self.venice_ai_api.text().strip():
+            return  # the key was edited again meanwhile
+        self.api_key_status.setText(f"API key OK: {message}" if valid else f"API key not accepted: {message}")
+
+    def on_models_refreshing(self, refreshing):
+        if refreshing and not self.api_key_status.text():
+            self.api_key_status.setText("Refreshing models...")
+        elif not refreshing and self.api_key_status.text() == "Refreshing models...":
+            self.api_key_status.setText("")
 
     def populate_default_model_combobox(self, current_model):
         api_key = self.venice_ai_api.text().strip()
         if not api_key:
             return
 
-        # New refactored call using updated helpers
-        populate_model_combo_list(
-            self.default_model_combobox, current_model, api_key, self.run_time, refresh=False
-        )
+        self.model_catalog.attach(self.default_model_combobox, current_model)
+        row = self.default_model_combobox.findData(current_model)
+        if row >= 0:
+            self.default_model_combobox.setCurrentIndex(row)
+        self.model_catalog.refresh(api_key, force=False)
 
     def select_default_prompt_file(self):
         file_path, _ = QFileDialog.getOpenFileName(self, "Select a file", self.project_dir, "All Files (*)")
@@ -0,0 +1,329 @@
+# dialog_sweep.py
+
+from PySide6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QTextEdit, QPlainTextEdit, QPushButton, QSpinBox, QDoubleSpinBox,
+    QMessageBox, QTableWidget, QTableWidgetItem, QHeaderView, QFileDialog, QSplitter
+)
+from PySide6.QtCore import Qt, Signal, QTimer
+import logging
+
+# Logger Configuration
+logger = logging.getLogger(__name__)
+
+from WrapSideSix import run_in_thread
+from cp_render import RunSettings, render_prompt_text, strip_output_placeholders, read_file_placeholder
+from cp_runner import api_response_call
+from cp_sweep import (SweepRunner, SweepReport, SampleResult, PointSummary, parse_axes, sweep_points, export_csv,
+                      export_json, DEFAULT_CONCURRENCY, MAX_SWEEP_REQUESTS)
+from cp_validate import NUMERIC_ATTRIBUTES
+
+AXES_HINT = ("One attribute per line: NAME = V1, V2, ... or NAME = START:STOP:STEP. NAME is one of "
+             f"{', '.join(NUMERIC_ATTRIBUTES)} or venice_parameters.KEY")
+
+
+class SortItem(QTableWidgetItem):
+    """A table item that sorts by a number, with missing values last."""
+    def __init__(self, text: str, value=None):
+        super().__init__(text)
+        self.value = value
+        if isinstance(value, (int, float)):
+            self.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+
+    def __lt__(self, other):
+        if isinstance(other, SortItem):
+            mine, theirs = self.value, other.value
+            if isinstance(mine, (int, float)) and isinstance(theirs, (int, float)):
+                return mine < theirs
+            if mine is None or theirs is None:
+                return theirs is None and mine is not None
+        return super().__lt__(other)
+
+
+def _number(value, spec: str) -> str:
+    return "-" if value is None else format(value, spec)
+
+
+class SweepDialog(QDialog):
+    """
+    Sends the prompt with every combination of the attribute values entered, several at a
+    time, and lists latency, token usage and schema validity per combination. Click a column
+    header to sort; the fastest combination that meets the schema is selected at the end.
+    """
+    sample_finished = Signal(object)  # SampleResult, emitted from the sweep threads
+    RESULT_COLUMNS = ["Samples", "Errors", "p50 (s)", "Mean (s)", "Max (s)", "Prompt Tokens",
+                      "Completion Tokens", "Valid"]
+
+    def __init__(self, api_key, model, settings: RunSettings, values: dict = None,
+                 file_reader=read_file_placeholder, prompt_name: str = "", prompt_version: str = "",
+                 history=None, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(f"Parameter Sweep - {prompt_name}" if prompt_name else "Parameter Sweep")
+        self.setMinimumSize(1000, 700)
+        self.api_key = api_key
+        self.model = model
+        self.settings = settings  # prompt_text is rendered with ``values`` when the sweep starts
+        self.values = values or {}
+        self.file_reader = file_reader
+        self.prompt_name = prompt_name
+        self.prompt_version = prompt_version
+        self.history = history
+        self.runner: SweepRunner = None
+        self.report: SweepReport = None
+        self.samples: list[SampleResult] = []
+        self.points: list[dict] = []
+        self.axis_names: list[str] = []
+
+        self.model_label = QLabel(f"Model: {model}")
+        self.axes_edit = QPlainTextEdit()
+        self.samples_spin = QSpinBox()
+        self.concurrency_spin = QSpinBox()
+        self.min_valid_spin = QDoubleSpinBox()
+        self.requests_label = QLabel()
+        self.status_label = QLabel()
+        self.table = QTableWidget(0, 0)
+        self.response_display = QTextEdit()
+        self.run_button = QPushButton("Run Sweep")
+        self.cancel_button = QPushButton("Cancel")
+        self.export_button = QPushButton("Export...")
+        self.close_button = QPushButton("Close")
+        # Results arrive faster than the table needs redrawing; refresh it at most every 200 ms
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setSingleShot(True)
+        self.refresh_timer.setInterval(200)
+
+        self.init_ui()
+        self.connect_signals()
+        self.count_requests()
+
+    def init_ui(self):
+        # Start from the prompt's own values, one line per attribute it sets
+        self.axes_edit.setPlaceholderText("temperature = 0, 0.5, 1\ntop_p = 0.5:1:0.25")
+        self.axes_edit.setPlainText("\n".join(f"{name} = {self.settings.attributes[name]}"
+                                              for name in NUMERIC_ATTRIBUTES if name in self.settings.attributes))
+        self.axes_edit.setToolTip(AXES_HINT)
+        self.samples_spin.setRange(1, 50)
+        self.samples_spin.setToolTip("Requests per combination")
+        self.concurrency_spin.setRange(1, 64)
+        self.concurrency_spin.setValue(DEFAULT_CONCURRENCY)
+        self.concurrency_spin.setToolTip("Requests sent at the same time")
+        self.min_valid_spin.setRange(0.0, 1.0)
+        self.min_valid_spin.setSingleStep(0.1)
+        self.min_valid_spin.setValue(1.0)
+        self.min_valid_spin.setToolTip("Share of responses that must match the response schema "
+                                       "for a combination to count as the fastest")
+        self.cancel_button.setEnabled(False)
+        self.export_button.setEnabled(False)
+
+        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
+        self.table.setSelectionMode(QTableWidget.SelectionMode.SingleSelection)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setSortingEnabled(True)
+        self.response_display.setReadOnly(True)
+
+        options = QHBoxLayout()
+        options.addWidget(self.model_label)
+        options.addStretch(1)
+        for label, widget in (("Samples:", self.samples_spin), ("Concurrency:", self.concurrency_spin),
+                              ("Min. valid:", self.min_valid_spin)):
+            options.addWidget(QLabel(label))
+            options.addWidget(widget)
+        options.addWidget(self.requests_label)
+
+        hint = QLabel(AXES_HINT)
+        hint.setWordWrap(True)
+
+        results = QSplitter(Qt.Orientation.Vertical)
+        results.addWidget(self.table)
+        results.addWidget(self.response_display)
+        results.setStretchFactor(0, 3)
+        results.setStretchFactor(1, 1)
+
+        buttons = QHBoxLayout()
+        buttons.addWidget(self.run_button)
+        buttons.addWidget(self.cancel_button)
+        buttons.addWidget(self.export_button)
+        buttons.addWidget(self.status_label, 1)
+        buttons.addWidget(self.close_button)
+
+        layout = QVBoxLayout(self)
+        layout.addLayout(options)
+        layout.addWidget(QLabel("Attributes to sweep:"))
+        layout.addWidget(self.axes_edit)
+        layout.addWidget(hint)
+        layout.addWidget(results, 1)
+        layout.addLayout(buttons)
+
+    def connect_signals(self):
+        self.axes_edit.textChanged.connect(self.count_requests)
+        self.samples_spin.valueChanged.connect(self.count_requests)
+        self.run_button.clicked.connect(self.run_sweep)
+        self.cancel_button.clicked.connect(self.cancel_sweep)
+        self.export_button.clicked.connect(self.export)
+        self.close_button.clicked.connect(self.accept)
+        self.sample_finished.connect(self.on_sample_finished)
+        self.refresh_timer.timeout.connect(self.show_results)
+        self.table.itemSelectionChanged.connect(self.show_response)
+
+    def count_requests(self):
+        try:
+            points = len(sweep_points(parse_axes(self.axes_edit.toPlainText().splitlines())))
+        except ValueError as e:
+            self.requests_label.setText("")
+            self.run_button.setEnabled(False)
+            self.run_button.setToolTip(str(e))
+            return
+        requests = points * self.samples_spin.value()
+        self.requests_label.setText(f"{points} combination(s), {requests} request(s)")
+        self.run_button.setEnabled(self.runner is None and 0 < requests <= MAX_SWEEP_REQUESTS)
+        self.run_button.setToolTip("" if requests <= MAX_SWEEP_REQUESTS
+                                   else f"At most {MAX_SWEEP_REQUESTS} requests per sweep")
+
+    def run_sweep(self):
+        try:
+            axes = parse_axes(self.axes_edit.toPlainText().splitlines())
+        except ValueError as e:
+            QMessageBox.warning(self, "Invalid Sweep", str(e))
+            return
+
+        self.axis_names = [axis.name for axis in axes]
+        self.points = sweep_points(axes)
+        self.samples = []
+        self.report = None
+        self.runner = SweepRunner(api_response_call(self.api_key, coalesce=False), self.model,
+                                  max_concurrency=self.concurrency_spin.value(), samples=self.samples_spin.value(),
+                                  history=self.history, prompt_name=self.prompt_name,
+                                  prompt_version=self.prompt_version)
+        self.table.setColumnCount(len(self.axis_names) + len(self.RESULT_COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.axis_names + self.RESULT_COLUMNS)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        self.response_display.clear()
+        self.show_results()
+        self.set_running(True)
+        runner = self.runner
+
+        def task(**kwargs):
+            # File placeholders are extracted once here, off the GUI thread
+            prompt_text = render_prompt_text(strip_output_placeholders(self.settings.prompt_text), self.values,
+                                             file_reader=self.file_reader, layout=self.settings.layout)
+            settings = RunSettings(prompt_text, self.settings.system_prompt, self.settings.attributes,
+                                   self.settings.layout)
+            return runner.run(settings, axes, on_sample_done=self.sample_finished.emit)
+
+        def on_finish(report):
+            self.report = report
+            self.refresh_timer.stop()
+            self.set_running(False)
+            self.show_results()
+            best = report.best(self.min_valid_spin.value())
+            state = "cancelled" if report.cancelled else "finished"
+            if best is None:
+                self.status_label.setText(f"Sweep {state} in {report.seconds:.1f}s; no combination ran without "
+                                          f"errors and met the schema")
+            else:
+                self.status_label.setText(f"Sweep {state} in {report.seconds:.1f}s. Fastest: {best.label} "
+                                          f"(p50 {best.latency_p50:.2f}s)")
+                self.select_point(best.index)
+
+        def on_error(error_info):
+            exception, tb = error_info
+            logger.error(f"Sweep failed: {exception}")
+            self.set_running(False)
+            QMessageBox.critical(self, "Sweep Failed", str(exception))
+
+        run_in_thread(task, on_finish=on_finish, on_error=on_error, parent=self)
+
+    def cancel_sweep(self):
+        if self.runner is not None:
+            self.runner.cancel()
+            self.cancel_button.setEnabled(False)
+            self.status_label.setText("Cancelling; waiting for the requests already sent...")
+
+    def set_running(self, running: bool):
+        if not running:
+            self.runner = None
+        self.cancel_button.setEnabled(running)
+        self.export_button.setEnabled(not running and self.report is not None)
+        self.axes_edit.setReadOnly(running)
+        for widget in (self.samples_spin, self.concurrency_spin):
+            widget.setEnabled(not running)
+        self.count_requests()
+
+    def on_sample_finished(self, result: SampleResult):
+        self.samples.append(result)
+        total = len(self.points) * self.samples_spin.value()
+        self.status_label.setText(f"{len(self.samples)}/{total} request(s) done")
+        if not self.refresh_timer.isActive():
+            self.refresh_timer.start()
+
+    def summaries(self) -> list[PointSummary]:
+        return SweepReport([], self.points, list(self.samples)).summaries()
+
+    def show_results(self):
+        selected = self.selected_point()
+        self.table.setSortingEnabled(False)  # rows would move while they are filled
+        summaries = self.summaries()
+        self.table.setRowCount(len(summaries))
+        for row, summary in enumerate(summaries):
+            items = [SortItem(str(summary.params[name]), summary.params[name]) for name in self.axis_names]
+            items += [
+                SortItem(str(summary.samples), summary.samples),
+                SortItem(str(summary.errors), summary.errors),
+                SortItem(_number(summary.latency_p50, ".2f"), summary.latency_p50),
+                SortItem(_number(summary.latency_mean, ".2f"), summary.latency_mean),
+                SortItem(_number(summary.latency_max, ".2f"), summary.latency_max),
+                SortItem(_number(summary.prompt_tokens, ".0f"), summary.prompt_tokens),
+                SortItem(_number(summary.completion_tokens, ".0f"), summary.completion_tokens),
+                SortItem(_number(summary.valid_rate, ".0%"), summary.valid_rate),
+            ]
+            items[0].setData(Qt.ItemDataRole.UserRole, summary.index)
+            for column, item in enumerate(items):
+                self.table.setItem(row, column, item)
+        self.table.setSortingEnabled(True)
+        if selected is not None:
+            self.select_point(selected)
+
+    def selected_point(self):
+        rows = self.table.selectionModel().selectedRows()
+        if not rows or self.table.item(rows[0].row(), 0) is None:
+            return None
+        return self.table.item(rows[0].row(), 0).data(Qt.ItemDataRole.UserRole)
+
+    def select_point(self, index: int):
+        for row in range(self.table.rowCount()):
+            item = self.table.item(row, 0)
+            if item is not None and item.data(Qt.ItemDataRole.UserRole) == index:
+                self.table.selectRow(row)
+                self.table.scrollToItem(item)
+                return
+
+    def show_response(self):
+        """The first response (or error) of the selected combination."""
+        index = self.selected_point()
+        results = [result for result in self.samples if result.point == index]
+        if not results:
+            self.response_display.clear()
+            return
+        result = min(results, key=lambda result: (result.error is not None, result.sample))
+        self.response_display.setPlainText(f"Error: {result.error}" if result.error else result.text)
+
+    def export(self):
+        if self.report is None:
+            return
+        file_path, selected_filter = QFileDialog.getSaveFileName(
+            self, "Export Sweep", "sweep.csv", "CSV Files (*.csv);;JSON Files (*.json)")
+        if not file_path:
+            return
+        try:
+            with open(file_path, "w", encoding="utf-8", newline="") as file:
+                if file_path.lower().endswith(".json") or selected_filter.startswith("JSON"):
+                    export_json(self.report, file)
+                else:
+                    export_csv(self.report, file)
+        except OSError as e:
+            QMessageBox.critical(self, "Export Failed", str(e))
+
+    def done(self, result):
+        if self.runner is not None:
+            self.runner.cancel()  # requests already sent finish in the background
+        super().done(result)
@@ -0,0 +1,74 @@
+# dialog_validation.py
+
+from PySide6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QComboBox,
+    QTableWidget, QTableWidgetItem, QHeaderView
+)
+from PySide6.QtCore import Qt, Signal
+import logging
+
+# Logger Configuration
+logger = logging.getLogger(__name__)
+
+from cp_validate import ValidationReport, SEVERITY_ERROR, SEVERITY_WARNING
+
+ALL = "(all)"
+
+
+class ValidationDialog(QDialog):
+    """Lists the problems of a validation report; double-click a row to open its prompt."""
+    prompt_selected = Signal(str)
+
+    COLUMNS = ["Severity", "Prompt", "Check", "Problem"]
+
+    def __init__(self, report: ValidationReport, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Library Validation")
+        self.setMinimumSize(900, 500)
+        self.report = report
+
+        self.severity_filter = QComboBox()
+        self.summary_label = QLabel(report.summary())
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.close_button = QPushButton("Close")
+
+        self.init_ui()
+        self.connect_signals()
+        self.show_issues()
+
+    def init_ui(self):
+        self.severity_filter.addItems([ALL, SEVERITY_ERROR, SEVERITY_WARNING])
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
+        self.table.verticalHeader().setVisible(False)
+
+        options = QHBoxLayout()
+        options.addWidget(QLabel("Severity:"))
+        options.addWidget(self.severity_filter)
+        options.addWidget(self.summary_label, 1)
+
+        layout = QVBoxLayout(self)
+        layout.addLayout(options)
+        layout.addWidget(self.table, 1)
+        layout.addWidget(self.close_button, alignment=Qt.AlignmentFlag.AlignRight)
+
+    def connect_signals(self):
+        self.severity_filter.currentTextChanged.connect(self.show_issues)
+        self.table.cellDoubleClicked.connect(self.select_prompt)
+        self.close_button.clicked.connect(self.accept)
+
+    def show_issues(self):
+        severity = self.severity_filter.currentText()
+        issues = [issue for issue in self.report.issues if severity == ALL or issue.severity == severity]
+        self.table.setRowCount(len(issues))
+        for row, issue in enumerate(issues):
+            for column, value in enumerate((issue.severity, issue.prompt or "(library)", issue.check, issue.message)):
+                self.table.setItem(row, column, QTableWidgetItem(value))
+
+    def select_prompt(self, row: int, column: int = 0):
+        prompt_name = self.table.item(row, 1).text()
+        if prompt_name != "(library)":
+            self.prompt_selected.emit(prompt_name)
@@ -0,0 +1,211 @@
+# editor_text.py
+
+"""
+Plain-text editor fields that stay responsive with multi-megabyte prompts.
+
+``PlainTextField`` wraps a QPlainTextEdit. Text is loaded with setPlainText, never parsed
+as rich text, and only when the field is shown. Reading the text back returns the loaded
+string as long as the document is unmodified, so switching prompts does not copy the whole
+document out of the editor. Texts of LARGE_TEXT_CHARS or more switch the field to large
+mode: no placeholder highlighting (the placeholder index is still kept) and no wrapping of
+very long lines, whose re-layout on every keystroke is what makes typing lag.
+
+``KeystrokeLatency`` measures how long the editor takes to process each key press;
+``benchmark_typing`` does the same offscreen for ``benchmark editor``.
+"""
+
+from collections import deque
+from typing import Optional
+import os
+import time
+import logging
+
+from PySide6.QtCore import QObject, QEvent, QTimer, Signal
+from PySide6.QtWidgets import QPlainTextEdit
+
+# Logger Configuration
+logger = logging.getLogger(__name__)
+
+from cp_memory import memory_budget, PRIORITY_HIGH
+
+LARGE_TEXT_CHARS = 200_000
+LONG_LINE_CHARS = 10_000
+KEYSTROKE_BUDGET_MS = 16.0  # one frame at 60 Hz
+
+
+def longest_line(text: str) -> int:
+    longest, start = 0, 0
+    while True:
+        end = text.find("\n", start)
+        if end == -1:
+            return max(longest, len(text) - start)
+        longest = max(longest, end - start)
+        start = end + 1
+
+
+class PlainTextField:
+    """
+    A QPlainTextEdit with lazy loading and large mode; ``highlighter`` is a PlaceholderHighlighter.
+    The editor's copy of the text (UTF-16 in the Qt document) is shown in the memory budget;
+    it cannot be evicted.
+    """
+    def __init__(self, editor: QPlainTextEdit, highlighter=None, name: str = "Editor text"):
+        self.editor = editor
+        self.highlighter = highlighter
+        self.large = False
+        self._text = ""
+        self._loaded = True
+        self.account = memory_budget.register(self, name, PRIORITY_HIGH)
+
+    def set_text(self, text: str, load: bool = True):
+        """Set the field's text; with ``load=False`` the editor is filled on the next load()."""
+        self._text = text
+        self._loaded = False
+        if load:
+            self.load()
+
+    def load(self):
+        if self._loaded:
+            return
+        start = time.perf_counter()
+        self.large = len(self._text) >= LARGE_TEXT_CHARS
+        wrap_long_lines = not self.large or longest_line(self._text) < LONG_LINE_CHARS
+        self.editor.setLineWrapMode(QPlainTextEdit.LineWrapMode.WidgetWidth if wrap_long_lines
+                                    else QPlainTextEdit.LineWrapMode.NoWrap)
+        if self.highlighter is not None:
+            self.highlighter.set_document_text(self.editor, self._text, highlight=not self.large)
+        else:
+            self.editor.setPlainText(self._text)
+        self.editor.document().setModified(False)
+        self._loaded = True
+        self.account.reset(2 * len(self._text), 1)
+        if self.large:
+            logger.info(f"Loaded {len(self._text) / 1e6:.1f} MB in large mode in {time.perf_counter() - start:.3f}s")
+
+    def text(self) -> str:
+        """The field's text, copied out of the editor only if it was edited since the last call."""
+        if self._loaded and self.editor.document().isModified():
+            self._text = self.editor.toPlainText()
+            self.editor.document().setModified(False)
+            self.account.reset(2 * len(self._text), 1)
+        return self._text
+
+    def evict_memory(self, nbytes: int) -> int:
+        return 0  # the text is being edited
+
+    def clear(self):
+        self.set_text("")
+
+
+class KeystrokeLatency(QObject):
+    """
+    Time from a key press reaching the editor until the event loop is idle again: the edit,
+    re-highlighting, index updates and layout. Keeps the last ``window`` samples.
+    """
+    budget_exceeded = Signal(float)  # p95 in milliseconds, when it goes over KEYSTROKE_BUDGET_MS
+
+    def __init__(self, editor: QPlainTextEdit, window: int = 500, parent=None):
+        super().__init__(parent)
+        self.samples: deque[float] = deque(maxlen=window)
+        self._pressed_at: Optional[float] = None
+        self._over_budget = False
+        editor.installEventFilter(self)
+
+    def eventFilter(self, watched, event) -> bool:
+        if event.type() == QEvent.Type.KeyPress and self._pressed_at is None:
+            self._pressed_at = time.perf_counter()
+            QTimer.singleShot(0, self._finished)
+        return False
+
+    def _finished(self):
+        self.samples.append((time.perf_counter() - self._pressed_at) * 1000)
+        self._pressed_at = None
+        over_budget = len(self.samples) >= 20 and self.percentile(95) > KEYSTROKE_BUDGET_MS
+        if over_budget and not self._over_budget:
+            logger.warning(f"Editor keystroke latency p95 {self.percentile(95):.1f} ms "
+                           f"is over the {KEYSTROKE_BUDGET_MS:.0f} ms budget")
+            self.budget_exceeded.emit(self.percentile(95))
+        self._over_budget = over_budget
+
+    def reset(self):
+        self.samples.clear()
+        self._over_budget = False
+
+    def percentile(self, percent: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+    def summary(self) -> str:
+        if not self.samples:
+            return "no keystrokes measured"
+        return (f"typing p50 {self.percentile(50):.1f} ms, p95 {self.percentile(95):.1f} ms, "
+                f"max {max(self.samples):.1f} ms ({len(self.samples)} keys)")
+
+
+def sample_prompt_text(size: int) -> str:
+    """Prompt text of about ``size`` characters: placeholders, then pasted reference material."""
+    head = "Summarize << topic >> for << audience >> using %% document %%.\nReturn @@ summary @@.\n\n"
+    line = "Reference material pasted into the prompt, one paragraph per line, with figures 1, 2 and 3.\n"
+    return head + line * max(0, (size - len(head)) // len(line))
+
+
+def benchmark_typing(size: int = 5_000_000, keystrokes: int = 200) -> dict:
+    """Load a ``size`` character prompt into an offscreen editor and time each typed key."""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PySide6.QtCore import Qt
+    from PySide6.QtGui import QKeyEvent, QTextCursor
+    from PySide6.QtWidgets import QApplication
+    from prompt_highlighter import PlaceholderHighlighter
+
+    app = QApplication.instance() or QApplication(["benchmark"])
+    editor = QPlainTextEdit()
+    editor.resize(800, 600)
+    editor.show()
+    highlighter = PlaceholderHighlighter(editor.document())
+    field = PlainTextField(editor, highlighter)
+    text = sample_prompt_text(size)
+
+    start = time.perf_counter()
+    field.set_text(text)
+    app.processEvents()
+    load_seconds = time.perf_counter() - start
+
+    cursor = editor.textCursor()
+    cursor.setPosition(len(text) // 2)
+    cursor.movePosition(QTextCursor.MoveOperation.EndOfBlock)
+    editor.setTextCursor(cursor)
+    editor.ensureCursorVisible()
+    app.processEvents()
+
+    samples = []
+    for index in range(keystrokes):
+        key, character = (Qt.Key.Key_Return, "\r") if index % 40 == 39 else (Qt.Key.Key_A, "a")
+        start = time.perf_counter()
+        for event_type in (QEvent.Type.KeyPress, QEvent.Type.KeyRelease):
+            QApplication.sendEvent(editor, QKeyEvent(event_type, key, Qt.KeyboardModifier.NoModifier, character))
+        app.processEvents()
+        samples.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    field.text()  # edited: copied out once
+    edited_read_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    field.text()  # unchanged since: no copy
+    unchanged_read_seconds = time.perf_counter() - start
+
+    samples.sort()
+    result = {
+        "chars": len(text), "large_mode": field.large, "load_seconds": load_seconds,
+        "keystrokes": keystrokes, "p50_ms": samples[len(samples) // 2],
+        "p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))], "max_ms": samples[-1],
+        "edited_read_seconds": edited_read_seconds, "unchanged_read_seconds": unchanged_read_seconds,
+        "placeholders": highlighter.index.summary(),
+    }
+    # Release the widgets while the application still exists, not at interpreter exit
+    highlighter.setDocument(None)
+    editor.close()
+    editor.deleteLater()
+    app.processEvents()
+    return result
@@ -1,40 +1,332 @@
-# json_backup.py
+# file_backup.py
 
-from typing import Union
+"""
+Content-addressed backup store for prompt library files.
+
+Every saved version is hashed (SHA-256). Identical content is stored once, snapshots are
+zlib-compressed and, for library JSON, can be stored as a per-prompt delta against the
+previous snapshot. Old snapshots are thinned by a time-based retention policy
+(keep everything recent, then one per hour / day / week).
+
+Layout, next to the library file ``prompts.json``::
+
+    .prompts.json.backups/
+        index.json              snapshots (hash, time) and object metadata
+        index.lock              held while an editor updates the index
+        objects/<hash>.z        compressed full content or delta
+
+Editors sharing a library (e.g. on a network drive) share its store. Every update re-reads
+index.json under index.lock, so one editor never writes back a stale copy over another's
+snapshots or prunes objects only the other's snapshots use.
+"""
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
 from pathlib import Path
-import shutil
+from typing import Callable, Optional, Union
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import zlib
 import logging
 
 logger = logging.getLogger(__name__)
 
+OBJECT_FULL = "full"
+OBJECT_DELTA = "delta"
+
+LOCK_TIMEOUT = 30.0  # seconds to wait for another editor's index lock
+LOCK_STALE = 120.0   # an older lock file was left behind by an editor that crashed
+
+_MISSING = object()
+
+
+def dumps_library(doc: dict) -> bytes:
+    """Serialise a library document exactly as the editor writes it."""
+    return json.dumps(doc, indent=4).encode("utf-8")
+
+
+@dataclass
+class RetentionPolicy:
+    keep_all_seconds: int = 3600  # every snapshot from the last hour
+    hourly: int = 24               # newest snapshot in each of the last 24 hours
+    daily: int = 30                # ... each of the last 30 days
+    weekly: int = 52               # ... each of the last 52 weeks
+
+    def select(self, timestamps: list[float], now: float) -> set[int]:
+        """Indexes of the snapshots to keep. The newest snapshot is always kept."""
+        if not timestamps:
+            return set()
 
-class FileBackupManager:
-    def __init__(self, file_path: Union[str, Path], max_backups: int = 3):
+        order = sorted(range(len(timestamps)), key=lambda i: timestamps[i], reverse=True)
+        keep = {order[0]}
+        keep.update(i for i in order if now - timestamps[i] <= self.keep_all_seconds)
+
+        for period, count in ((3600, self.hourly), (86400, self.daily), (604800, self.weekly)):
+            current = int(now // period)
+            seen = set()
+            for i in order:
+                bucket = int(timestamps[i] // period)
+                if bucket in seen or current - bucket >= count:
+                    continue
+                seen.add(bucket)
+                keep.add(i)
+        return keep
+
+
+class BackupStore:
+    def __init__(self, file_path: Union[str, Path], retention: Optional[RetentionPolicy] = None,
+                 use_deltas: bool = True, max_delta_chain: int = 20,
+                 serialize: Callable[[dict], bytes] = dumps_library):
         self.file_path = Path(file_path)
-        self.max_backups = max_backups
-
-    def _get_backup_name(self, index: int) -> Path:
-        """Return the backup path using prompts_json.bak1 format."""
-        if index == 0:
-            return self.file_path
-        stem = self.file_path.stem.replace('.', '_')
-        return self.file_path.with_name(f"{stem}.bak{index}")
-
-    def rotate_backups(self):
-        """Rotate .bak1 → .bak2, ..., .bak{n-1} → .bak{n}"""
-        for i in range(self.max_backups, 1, -1):  # e.g. 3 → 2, 2 → 1
-            src = self._get_backup_name(i - 1)
-            dst = self._get_backup_name(i)
-            if src.exists():
-                logger.debug(f"Rotating backup: {src} -> {dst}")
-                src.replace(dst)  # .replace() handles overwrites safely
-
-    def backup_current_file(self):
-        """Copy the current JSON file to .bak1 if it exists."""
+        self.store_dir = self.file_path.with_name(f".{self.file_path.name}.backups")
+        self.objects_dir = self.store_dir / "objects"
+        self.index_path = self.store_dir / "index.json"
+        self.retention = retention or RetentionPolicy()
+        self.use_deltas = use_deltas
+        self.max_delta_chain = max_delta_chain
+        self.serialize = serialize
+
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._index: Optional[dict] = None
+        self._last_doc: Optional[tuple[str, dict]] = None  # (hash, parsed library) of the newest snapshot
+
+    # Index methods
+    def _load_index(self) -> dict:
+        if self._index is None:
+            self._read_index()
+        return self._index
+
+    def _read_index(self) -> dict:
+        """The index as on disk now; other editors sharing the library may have changed it."""
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as file:
+                self._index = json.load(file)
+        except FileNotFoundError:
+            self._index = {"snapshots": [], "objects": {}}
+        return self._index
+
+    def _save_index(self):
+        fd, tmp_path = tempfile.mkstemp(prefix="index.", suffix=".tmp", dir=self.store_dir)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as file:
+                json.dump(self._index, file, indent=1)
+            os.replace(tmp_path, self.index_path)
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+
+    @contextmanager
+    def _index_lock(self):
+        """Lock file held while the index is read, changed and written back."""
+        lock_path = self.store_dir / "index.lock"
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        while True:
+            try:
+                os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                break
+            except FileExistsError:
+                pass
+            try:
+                if time.time() - lock_path.stat().st_mtime > LOCK_STALE:
+                    logger.warning(f"Removing stale backup lock {lock_path}")
+                    lock_path.unlink(missing_ok=True)
+                    continue
+            except FileNotFoundError:
+                continue
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Backup index is locked by another editor: {lock_path}")
+            time.sleep(0.05)
+        try:
+            yield
+        finally:
+            lock_path.unlink(missing_ok=True)
+
+    def snapshots(self) -> list[dict]:
+        """Snapshots oldest first: ``{"hash", "time", "size"}``."""
+        with self._lock:
+            return list(self._read_index()["snapshots"])
+
+    # Object methods
+    def _object_path(self, digest: str) -> Path:
+        return self.objects_dir / f"{digest}.z"
+
+    def _write_object(self, digest: str, payload: bytes):
+        path = self._object_path(digest)
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as file:
+            file.write(zlib.compress(payload, 6))
+        os.replace(tmp_path, path)
+
+    def _read_object(self, digest: str) -> bytes:
+        with open(self._object_path(digest), "rb") as file:
+            return zlib.decompress(file.read())
+
+    def _chain_length(self, digest: str) -> int:
+        objects = self._load_index()["objects"]
+        length = 0
+        while objects[digest]["kind"] == OBJECT_DELTA:
+            digest = objects[digest]["base"]
+            length += 1
+        return length
+
+    def _restore_doc(self, digest: str) -> dict:
+        if self._last_doc and self._last_doc[0] == digest:
+            return self._last_doc[1]
+        meta = self._load_index()["objects"][digest]
+        if meta["kind"] == OBJECT_FULL:
+            return json.loads(self._read_object(digest))
+        delta = json.loads(self._read_object(digest))
+        return apply_delta(self._restore_doc(meta["base"]), delta)
+
+    def _restore_locked(self, digest: str) -> bytes:
+        if self._load_index()["objects"][digest]["kind"] == OBJECT_FULL:
+            return self._read_object(digest)
+        return self.serialize(self._restore_doc(digest))
+
+    def restore(self, digest: str) -> bytes:
+        """Content of a snapshot, byte for byte as it was saved."""
+        with self._lock:
+            if digest not in self._read_index()["objects"]:
+                raise KeyError(f"No backup with hash {digest}")
+            return self._restore_locked(digest)
+
+    def _make_delta(self, content: bytes, digest: str) -> Optional[tuple[bytes, str, dict]]:
+        """Delta payload against the newest snapshot, or None if a full copy should be stored."""
+        snapshots = self._load_index()["snapshots"]
+        if not self.use_deltas or not snapshots:
+            return None
+        base = snapshots[-1]["hash"]
+        if self._chain_length(base) >= self.max_delta_chain:
+            return None
+
+        try:
+            doc = json.loads(content)
+            base_doc = self._restore_doc(base)
+        except (ValueError, OSError):
+            return None
+        if not isinstance(doc, dict) or not isinstance(doc.get("data"), dict) or not isinstance(base_doc.get("data"), dict):
+            return None
+
+        delta = make_delta(base_doc, doc)
+        delta["base"] = base
+        # Only keep the delta if it reproduces the saved bytes exactly
+        if hashlib.sha256(self.serialize(apply_delta(base_doc, delta))).hexdigest() != digest:
+            return None
+        return json.dumps(delta).encode("utf-8"), base, doc
+
+    # Snapshot methods
+    def snapshot(self, content: bytes, timestamp: Optional[float] = None) -> Optional[str]:
+        """Store ``content`` unless it matches the newest snapshot. Returns its hash."""
+        digest = hashlib.sha256(content).hexdigest()
+        timestamp = time.time() if timestamp is None else timestamp
+
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        with self._lock, self._index_lock():
+            index = self._read_index()
+            snapshots = index["snapshots"]
+            if snapshots and snapshots[-1]["hash"] == digest:
+                logger.debug(f"Backup skipped, content unchanged: {digest[:12]}")
+                return digest
+
+            if digest not in index["objects"]:
+                delta = self._make_delta(content, digest)
+                if delta:
+                    payload, base, doc = delta
+                    index["objects"][digest] = {"kind": OBJECT_DELTA, "base": base}
+                    self._write_object(digest, payload)
+                else:
+                    index["objects"][digest] = {"kind": OBJECT_FULL, "base": None}
+                    self._write_object(digest, content)
+                    try:
+                        doc = json.loads(content)
+                    except ValueError:
+                        doc = None
+                self._last_doc = (digest, doc) if isinstance(doc, dict) else None
+
+            snapshots.append({"hash": digest, "time": timestamp, "size": len(content)})
+            self._prune_locked(timestamp)
+            self._save_index()
+
+        logger.info(f"📁 Backed up {self.file_path.name} as {digest[:12]}")
+        return digest
+
+    def snapshot_file(self) -> Optional[str]:
+        """Snapshot the library file as it is on disk now."""
         if not self.file_path.exists():
             logger.info(f"🔸 No file to back up: {self.file_path}")
+            return None
+        return self.snapshot(self.file_path.read_bytes())
+
+    def submit(self, content: bytes) -> Future:
+        """Snapshot on the store's background thread; snapshots are written in submission order."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="backup")
+        future = self._executor.submit(self.snapshot, content)
+        future.add_done_callback(_log_failure)
+        return future
+
+    def flush(self):
+        """Wait for submitted snapshots to be written."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    # Retention methods
+    def _prune_locked(self, now: float):
+        index = self._load_index()
+        snapshots = index["snapshots"]
+        keep = self.retention.select([s["time"] for s in snapshots], now)
+        if len(keep) == len(snapshots):
             return
+        index["snapshots"] = [s for i, s in enumerate(snapshots) if i in keep]
+
+        # A retained delta whose base is being dropped is rewritten as a full copy
+        needed = {snapshot["hash"] for snapshot in index["snapshots"]}
+        for digest in dict.fromkeys(snapshot["hash"] for snapshot in index["snapshots"]):
+            meta = index["objects"][digest]
+            if meta["kind"] == OBJECT_DELTA and meta["base"] not in needed:
+                self._write_object(digest, self._restore_locked(digest))
+                index["objects"][digest] = {"kind": OBJECT_FULL, "base": None}
+
+        for digest in list(index["objects"]):
+            if digest not in needed:
+                del index["objects"][digest]
+                self._object_path(digest).unlink(missing_ok=True)
+        logger.debug(f"Pruned backups, {len(index['snapshots'])} snapshots kept")
+
+
+def make_delta(base_doc: dict, doc: dict) -> dict:
+    """Per-prompt difference between two library documents."""
+    base_data = base_doc["data"]
+    data = doc["data"]
+    delta = {
+        "set": {name: value for name, value in data.items() if base_data.get(name, _MISSING) != value},
+        "deleted": [name for name in base_data if name not in data],
+    }
+    if {k: v for k, v in doc.items() if k != "data"} != {k: v for k, v in base_doc.items() if k != "data"}:
+        delta["top"] = {k: v for k, v in doc.items() if k != "data"}
+        delta["keys"] = list(doc)
+    return delta
+
+
+def apply_delta(base_doc: dict, delta: dict) -> dict:
+    data = dict(base_doc["data"])
+    for name in delta["deleted"]:
+        data.pop(name, None)
+    data.update(delta["set"])
+
+    if "top" in delta:
+        top = dict(delta["top"], data=data)
+        return {key: top[key] for key in delta["keys"]}
+    return {key: (data if key == "data" else value) for key, value in base_doc.items()}
+
 
-        self.rotate_backups()  # Rotate .bak1 → .bak2, etc.
-        shutil.copy2(self.file_path, self._get_backup_name(1))  # Only copy original, don't rename it
-        logger.info(f"📁 Backed up {self.file_path} to {self._get_backup_name(1)}")
+def _log_failure(future: Future):
+    if future.exception() is not None:
+        logger.error(f"Backup failed: {future.exception()}")
@@ -0,0 +1,20 @@
+# gui_resources.py
+
+import logging
+
+# Logger Configuration
+logger = logging.getLogger(__name__)
+
+_icons_initialised = False
+
+
+def init_icon_resources():
+    """Register the WrapSideSix Material Design icons (":/icons/mat_des/...") once, on first use."""
+    global _icons_initialised
+    if _icons_initialised:
+        return
+
+    import WrapSideSix.icons.icons_mat_des
+    WrapSideSix.icons.icons_mat_des.qInitResources()
+    _icons_initialised = True
+    logger.debug("Icon resources initialised")
@@ -0,0 +1,23 @@
+# library_autosave.py
+
+from PySide6.QtCore import QObject, Signal
+import logging
+
+# Logger Configuration
+logger = logging.getLogger(__name__)
+
+from cp_autosave import AutosaveWriter, DEFAULT_QUIET_PERIOD, DEFAULT_MAX_DELAY
+
+
+class LibraryAutosave(QObject):
+    """
+    Qt side of cp_autosave.AutosaveWriter: the writer's callbacks run on its own thread and
+    are re-emitted as signals, which Qt delivers on the GUI thread.
+    """
+    status_changed = Signal(object)  # AutosaveStatus
+    saved = Signal(object)           # SavedVersion
+
+    def __init__(self, quiet_period: float = DEFAULT_QUIET_PERIOD, max_delay: float = DEFAULT_MAX_DELAY, parent=None):
+        super().__init__(parent)
+        self.writer = AutosaveWriter(quiet_period, max_delay,
+                                     on_status=self.status_changed.emit, on_saved=self.saved.emit)
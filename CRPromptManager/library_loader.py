@@ -0,0 +1,51 @@
+# library_loader.py
+
+from PySide6.QtCore import QThread, Signal
+import logging
+
+# Logger Configuration
+logger = logging.getLogger(__name__)
+
+from cp_jsonstream import iter_library_events, LibraryFormatError, EVENT_HEADER, EVENT_PROMPT
+
+DEFAULT_BATCH_SIZE = 250
+
+
+class LibraryLoader(QThread):
+    """
+    Reads a prompt library on a worker thread and hands prompts to the GUI thread in batches.
+    The loader never touches the library itself; receivers add the batches on the GUI thread.
+    """
+    header_loaded = Signal(dict)
+    batch_loaded = Signal(list)        # [(prompt name, prompt data, fingerprint), ...]
+    entry_failed = Signal(str, str)    # prompt name, message
+    load_failed = Signal(str)          # the file could not be read as a library at all
+
+    def __init__(self, file_path: str, batch_size: int = DEFAULT_BATCH_SIZE, parent=None):
+        super().__init__(parent)
+        self.file_path = file_path
+        self.batch_size = batch_size
+
+    def run(self):
+        batch = []
+        try:
+            for event in iter_library_events(self.file_path):
+                if self.isInterruptionRequested():
+                    logger.info(f"Loading {self.file_path} cancelled")
+                    return
+
+                if event[0] == EVENT_PROMPT:
+                    batch.append((event[1], event[2], event[3]))
+                    if len(batch) >= self.batch_size:
+                        self.batch_loaded.emit(batch)
+                        batch = []
+                elif event[0] == EVENT_HEADER:
+                    self.header_loaded.emit(event[1])
+                else:
+                    self.entry_failed.emit(event[1], event[2])
+
+            if batch:
+                self.batch_loaded.emit(batch)
+        except (OSError, UnicodeDecodeError, LibraryFormatError) as e:
+            logger.error(f"Failed to load {self.file_path}: {e}")
+            self.load_failed.emit(str(e))
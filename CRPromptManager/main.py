@@ -3,12 +3,15 @@
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QHBoxLayout,
     QTextEdit, QPushButton, QLabel, QLineEdit, QSpinBox, QDoubleSpinBox, QPlainTextEdit,
-    QFileDialog, QMessageBox, QCheckBox, QComboBox, QInputDialog, QTabWidget, QStatusBar,
+    QDialog, QFileDialog, QMessageBox, QCheckBox, QComboBox, QInputDialog, QTabWidget, QStatusBar,
 )
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QFileSystemWatcher, QTimer
 
 import sys
+import os
 import json
+import time
+from pathlib import Path
 from functools import partial
 import copy
 
@@ -16,34 +19,35 @@ import logging
 
 # from WrapAIVenice.data.constants import DEFAULT_SYSTEM_PROMPT
 
-logging.basicConfig(
-    level=logging.INFO,
-    format = '%(name)s - %(levelname)s - %(message)s (line: %(lineno)d)',
-    handlers=[
-        logging.StreamHandler(),  # Log to console
-        # logging.FileHandler('app.log')  # Log to file
-    ]
-)
-
 logger = logging.getLogger(__name__)
 
 from WrapSideSix.layouts.grid_layout import WSGridLayoutHandler, WSGridRecord, WSGridPosition
 from WrapSideSix.toolbars.toolbar_icon import WSToolbarIcon, DropdownItem
 from WrapSideSix.widgets.list_widget import WSListSelectionWidget
+from WrapSideSix import run_in_thread
 
 # from WrapAIVenice import VeniceParameters, WEB_SEARCH_MODES
-from WrapAI import VeniceParameters, WEB_SEARCH_MODES, PromptTemplate
 from WrapConfig import RuntimeConfig, INIHandler, SecretsManager
 
-from dialog_about import AboutDialog
-from dialog_settings2 import SettingsDialog
-from dialog_output_format import OutputFieldDialog
-from dialog_prompt_runner import PromptRunDialog
-from file_backup import FileBackupManager
+# Dialogs are imported on first use to keep startup fast
+from gui_resources import init_icon_resources
+from cp_library import PromptLibrary, default_header
+from library_loader import LibraryLoader
+from library_autosave import LibraryAutosave
+from model_catalog import ModelCatalog
+from prompt_highlighter import PlaceholderHighlighter
+from editor_text import PlainTextField, KeystrokeLatency
+from cp_sync import LibrarySnapshot, file_signature, read_snapshot
+from cp_render import resolve_run_settings, read_file_placeholder, LAYOUT_STABLE_PREFIX
+from cp_placeholders import KIND_INCLUDE
+from cp_history import prompt_version
+from cp_memory import memory_budget, BUDGET_ENV
+from cp_trace import (tracer, traced, span, configure_from_env, TRACE_ENV, TRACE_FILE_NAME,
+                      DEFAULT_PROFILE_EVERY)
 from cp_core import (prompt_roles, prompt_subtypes, DEFAULT_SYSTEM_PROMPT, DEFAULT_AI_MODEL,
-                     API_KEY_NAME, SECRETS_FILE_NAME, populate_runtime_models,
+                     API_KEY_NAME, SECRETS_FILE_NAME,
                      DEFAULT_TEMPERATURE, DEFAULT_TOP_P, DEFAULT_FREQUENCY_PENALTY, DEFAULT_PRESENCE_PENALTY, DEFAULT_MAX_COMPLETION_TOKENS, DEFAULT_VENICE_PARAMS,
-                     PROMPT_TYPES, display_label)
+                     PROMPT_TYPES, MODEL_ATTRIBUTES_FULL, display_label)
 
 
 class PromptEditor(QMainWindow):
@@ -55,9 +59,10 @@ class PromptEditor(QMainWindow):
         # Extract prompt data
         self.venice_prompt_runner = None
 
-        # Dialogs
-        self.dialog_about = AboutDialog(self)
-        self.dialog_settings = SettingsDialog(self)
+        # Dialogs (created on first use)
+        self._dialog_about = None
+        self._dialog_settings = None
+        self._dialog_memory = None
 
         # Main layout
         central_widget = QWidget()
@@ -69,9 +74,35 @@ class PromptEditor(QMainWindow):
         self.tab_widget = QTabWidget()
         self.toolbar = WSToolbarIcon('toolbar')
 
-        self.prompts = {}  # Store prompts loaded from a file
+        self.library = PromptLibrary()  # Store prompts loaded from a file
+        self.library_loader = None
+        self.library_load_errors = []
+        self.library_load_base = None
+
+        # Watch the library file for changes made outside the editor
+        self.library_watcher = QFileSystemWatcher(self)
+        self.library_change_timer = QTimer(self)
+        self.library_change_timer.setSingleShot(True)
+        self.library_change_timer.setInterval(500)  # debounce bursts of file system events
+        self.library_change_check_running = False
+
+        # Autosave: editor changes are collected for a moment, then queued for the background writer
+        self.autosave_enabled = False
+        self.autosave = LibraryAutosave(parent=self)
+        self.autosave_timer = QTimer(self)
+        self.autosave_timer.setSingleShot(True)
+        self.autosave_timer.setInterval(300)
+        self.autosave_submitted_revision = None
+        self.autosave_label = QLabel()
+
         self.current_prompt = None
         self.prompt_library_file = None
+        self.isolated_file_extraction = False
+        self._file_extractor = None
+        self._cached_file_reader = None
+        self._run_history = None
+        self.validation_report = None
+        self.validation_running = False
 
         # Grids
         self.main_grid =  WSGridLayoutHandler()
@@ -94,7 +125,16 @@ class PromptEditor(QMainWindow):
         ## Prompt text widgets
         self.prompt_type = QComboBox()
         self.prompt_subtype = QComboBox()
-        self.prompt_text = QTextEdit()
+        self.prompt_text = QPlainTextEdit()
+        self.prompt_highlighter = PlaceholderHighlighter(self.prompt_text.document())
+        self.prompt_field = PlainTextField(self.prompt_text, self.prompt_highlighter, "Editor: prompt text")
+        self.keystroke_latency = KeystrokeLatency(self.prompt_text, parent=self)
+        self.editor_mode_label = QLabel()
+        self.placeholder_summary = QLabel("No placeholders")
+        self.placeholder_summary.setWordWrap(True)
+        self.placeholder_summary_timer = QTimer(self)
+        self.placeholder_summary_timer.setSingleShot(True)
+        self.placeholder_summary_timer.setInterval(150)
         self.full_response_button = QPushButton("Full Response")
 
         ## Attribute widgets
@@ -111,6 +151,10 @@ class PromptEditor(QMainWindow):
         self.presence_penalty_input = QDoubleSpinBox()
         self.max_tokens_use = QCheckBox()
         self.max_tokens_input = QSpinBox()
+        self.stable_prefix_use = QCheckBox()
+        self.stable_prefix_use.setToolTip(
+            "Keep the prompt text unchanged and append placeholder values at the end,\n"
+            "so the provider can reuse its prompt cache between runs")
 
         self.include_venice_params = QCheckBox()
         self.custom_system_prompt_use = QCheckBox()
@@ -148,7 +192,9 @@ class PromptEditor(QMainWindow):
         ## tool_choice {}
 
         # Prompt notes widgets
-        self.prompt_notes = QTextEdit()
+        self.prompt_notes = QPlainTextEdit()
+        self.notes_tab = None
+        self.notes_field = PlainTextField(self.prompt_notes, name="Editor: notes")  # loaded when the Notes tab is shown
 
         # Set widget ranges
         self.set_widget_ranges()
@@ -159,12 +205,10 @@ class PromptEditor(QMainWindow):
 
         self.api_key = self.secrets.get_secret(API_KEY_NAME)
         self.model = DEFAULT_AI_MODEL
+        self.model_catalog = ModelCatalog(self.run_time, parent=self)
+        self.model_catalog_label = QLabel("Refreshing models...")
 
-        self.prompt_file_header = {
-            "app_name": "",
-            "data_version": "",
-            "file_type": ""
-        }
+        self.prompt_file_header = default_header()
 
         # Initiate methods
         self.init_ui()
@@ -177,12 +221,38 @@ class PromptEditor(QMainWindow):
         if not self.api_key:
             self.show_settings()
 
-        # Populate global variables
-        populate_runtime_models(self.api_key, self.run_time)
+        # Populate global variables; the catalog is fetched in the background
+        self.model_catalog.refresh(self.api_key, force=False)
 
         if self.prompt_library_file:
             logger.debug("Selected folder:", self.prompt_library_file)
 
+    @property
+    def prompts(self) -> dict:
+        return self.library.prompts
+
+    @property
+    def prompt_file_header(self) -> dict:
+        return self.library.header
+
+    @prompt_file_header.setter
+    def prompt_file_header(self, header: dict):
+        self.library.header = header
+
+    @property
+    def dialog_about(self):
+        if self._dialog_about is None:
+            from dialog_about import AboutDialog
+            self._dialog_about = AboutDialog(self)
+        return self._dialog_about
+
+    @property
+    def dialog_settings(self):
+        if self._dialog_settings is None:
+            from dialog_settings2 import SettingsDialog
+            self._dialog_settings = SettingsDialog(self, model_catalog=self.model_catalog)
+        return self._dialog_settings
+
     # Support init methods
     def init_ui(self):
         prompt_library_widgets = [
@@ -241,6 +311,10 @@ class PromptEditor(QMainWindow):
                          position=WSGridPosition(row=5, column=0),
                          col_span=2
                          ),
+            WSGridRecord(widget=self.placeholder_summary,
+                         position=WSGridPosition(row=6, column=0),
+                         col_span=2,
+                         row_stretch=0),
         ]
         self.prompt_grid.add_widget_records(prompt_widgets)
 
@@ -349,31 +423,38 @@ class PromptEditor(QMainWindow):
                          position=WSGridPosition(row=5, column=2),
                          col_stretch=0),
 
-            WSGridRecord(widget=QLabel("Response Format"),
+            WSGridRecord(widget=QLabel("Stable Prefix"),
                          position=WSGridPosition(row=6, column=0),
+                         col_stretch=0),
+            WSGridRecord(widget=self.stable_prefix_use,
+                         position=WSGridPosition(row=6, column=1),
+                         col_stretch=0),
+
+            WSGridRecord(widget=QLabel("Response Format"),
+                         position=WSGridPosition(row=7, column=0),
                          col_stretch=0,
                          row_stretch=0),
             WSGridRecord(widget=self.response_format_use,
-                         position=WSGridPosition(row=6, column=1),
+                         position=WSGridPosition(row=7, column=1),
                          col_stretch=0,
                          row_stretch=0),
             WSGridRecord(widget=self.response_format_type,
-                         position=WSGridPosition(row=6, column=2),
+                         position=WSGridPosition(row=7, column=2),
                          col_stretch=0,
                          row_stretch=0),
 
             WSGridRecord(widget=QLabel("Include Venice Parameters"),
-                         position=WSGridPosition(row=7, column=0),
+                         position=WSGridPosition(row=8, column=0),
                          col_stretch=0),
             WSGridRecord(widget=self.include_venice_params,
-                         position=WSGridPosition(row=7, column=1),
+                         position=WSGridPosition(row=8, column=1),
                          col_stretch=0),
             WSGridRecord(widget=QLabel("\n\n"),
-                         position=WSGridPosition(row=7, column=2),
+                         position=WSGridPosition(row=8, column=2),
                          col_stretch=0),
 
             WSGridRecord(widget=self.venice_parameters_groupbox,
-                         position=WSGridPosition(row=8, column=0),
+                         position=WSGridPosition(row=9, column=0),
                          col_stretch=0,
                          row_stretch=0,
                          col_span=3,
@@ -407,7 +488,8 @@ class PromptEditor(QMainWindow):
         self.tab_widget.addTab(self.prompt_grid.as_widget(), "Prompt")  # Index 0
         self.tab_widget.addTab(self.attribute_grid.as_widget(), "Attributes")  # Index 1
         self.tab_widget.addTab(self.response_format_grid.as_widget(), "Response Format")  #Index 2
-        self.tab_widget.addTab(self.notes_grid.as_widget(), "Notes")  # Index 3
+        self.notes_tab = self.notes_grid.as_widget()
+        self.tab_widget.addTab(self.notes_tab, "Notes")  # Index 3
         self.tab_widget.setTabVisible(2, False)
 
         main_widgets = [
@@ -424,6 +506,7 @@ class PromptEditor(QMainWindow):
         self.toggle_venice_params()
 
     def init_toolbar(self):
+        init_icon_resources()
         self.addToolBar(self.toolbar)
         self.toolbar.clear_toolbar()
 
@@ -478,6 +561,8 @@ class PromptEditor(QMainWindow):
             DropdownItem(display_label(ptype), partial(self.run_prompt, ptype))
             for ptype in PROMPT_TYPES
         ]
+        dropdown_run_icons.append(DropdownItem("Parameter Sweep...", self.run_sweep))
+        dropdown_run_icons.append(DropdownItem("Pipeline...", self.run_pipeline))
 
         self.toolbar.update_dropdown_menu(
             name="Run",
@@ -485,6 +570,27 @@ class PromptEditor(QMainWindow):
             dropdown_definitions=dropdown_run_icons
         )
 
+        self.toolbar.add_action_to_toolbar(
+            "validate",
+            "Validate Library",
+            "Check every prompt in the library for problems",
+            self.validate_library,
+            ":/icons/mat_des/rule_24dp.png")
+
+        self.toolbar.add_action_to_toolbar(
+            "history",
+            "Run History",
+            "Browse past runs",
+            self.show_history,
+            ":/icons/mat_des/history_24dp.png")
+
+        self.toolbar.add_action_to_toolbar(
+            "analytics",
+            "Analytics",
+            "Latency, throughput and error rates per model and prompt",
+            self.show_analytics,
+            ":/icons/mat_des/analytics_24dp.png")
+
         self.toolbar.add_action_to_toolbar(
             "settings",
             "Settings",
@@ -494,6 +600,8 @@ class PromptEditor(QMainWindow):
 
         dropdown_help_icons = [
             DropdownItem("Help", self.show_not_implemented_dialog),
+            DropdownItem("Memory Usage...", self.show_memory_usage),
+            DropdownItem("Export Performance Trace...", self.export_trace),
             DropdownItem("About", self.show_about),
         ]
 
@@ -514,6 +622,11 @@ class PromptEditor(QMainWindow):
 
     def init_status_bar(self):
         self.setStatusBar(self.status_bar)
+        self.status_bar.addPermanentWidget(self.editor_mode_label)
+        self.status_bar.addPermanentWidget(self.model_catalog_label)
+        self.status_bar.addPermanentWidget(self.autosave_label)
+        self.editor_mode_label.setVisible(False)
+        self.model_catalog_label.setVisible(False)
         self.update_status_bar()
 
     def set_widget_ranges(self):
@@ -522,6 +635,7 @@ class PromptEditor(QMainWindow):
         self.frequency_penalty_input.setRange(-2.0, 2.0)
         self.presence_penalty_input.setRange(-2.0, 2.0)
         self.max_tokens_input.setMaximum(10000)
+        from WrapAI import WEB_SEARCH_MODES
         self.enable_web_search_input.addItems(WEB_SEARCH_MODES)
         self.prompt_type.addItems(prompt_roles)
         self.prompt_subtype.addItems(prompt_subtypes)
@@ -536,6 +650,37 @@ class PromptEditor(QMainWindow):
         self.custom_system_prompt_use.stateChanged.connect(self.select_system_prompt)
         self.include_venice_params.stateChanged.connect(self.toggle_venice_params)
 
+        self.library_watcher.fileChanged.connect(self.on_library_file_changed)
+        self.library_watcher.directoryChanged.connect(self.on_library_file_changed)
+        self.library_change_timer.timeout.connect(self.check_library_changes)
+
+        self.model_catalog.refreshing_changed.connect(self.model_catalog_label.setVisible)
+        self.model_catalog.refresh_failed.connect(
+            lambda message: self.update_status_bar(f"Model list refresh failed: {message}", 10000))
+
+        self.autosave_timer.timeout.connect(self.submit_autosave)
+        self.autosave.status_changed.connect(self.on_autosave_status)
+        self.autosave.saved.connect(self.on_autosave_saved)
+        for text_edit in (self.prompt_text, self.prompt_notes, self.response_format_input):
+            text_edit.textChanged.connect(self.schedule_autosave)
+        for line_edit in (self.system_prompt_input, self.character_slug_input):
+            line_edit.textEdited.connect(self.schedule_autosave)
+        for spin_box in (self.temperature_input, self.top_p_input, self.frequency_penalty_input,
+                         self.presence_penalty_input, self.max_tokens_input):
+            spin_box.valueChanged.connect(self.schedule_autosave)
+        for check_box in (self.system_prompt_use, self.temperature_use, self.top_p_use, self.frequency_penalty_use,
+                          self.presence_penalty_use, self.max_tokens_use, self.stable_prefix_use,
+                          self.include_venice_params, self.custom_system_prompt_use, self.enable_web_search_use,
+                          self.character_slug_use, self.response_format_use):
+            check_box.toggled.connect(self.schedule_autosave)
+        for combo_box in (self.prompt_type, self.prompt_subtype, self.custom_system_prompt_input,
+                          self.enable_web_search_input):
+            combo_box.currentTextChanged.connect(self.schedule_autosave)
+
+        self.prompt_highlighter.index_changed.connect(self.placeholder_summary_timer.start)
+        self.placeholder_summary_timer.timeout.connect(self.update_placeholder_summary)
+        self.tab_widget.currentChanged.connect(self.on_tab_changed)
+
         self.build_response_button.clicked.connect(self.show_output_dialog)
         self.placeholder_text_button.clicked.connect(lambda: self.insert_prompt_placeholder("Insert Text Placeholder", "Text placeholder:", "<< {} >>"))
         self.placeholder_file_button.clicked.connect(lambda: self.insert_prompt_placeholder("Insert File Placeholder", "File placeholder:", "%% {} %%"))
@@ -545,26 +690,331 @@ class PromptEditor(QMainWindow):
         self.ini_handler.reload()
         self.model = self.ini_handler.read_value('CRPromptManager', 'default_model')
         self.prompt_library_file = self.ini_handler.read_value('CRPromptManager', 'default_prompt_file')
+        self.isolated_file_extraction = self.ini_handler.read_value('CRPromptManager', 'isolated_file_extraction') == "True"
+        self.autosave_enabled = self.ini_handler.read_value('CRPromptManager', 'autosave') == "True"
+        self.autosave_label.setVisible(self.autosave_enabled)
+        self.apply_trace_setting()
+        self.apply_memory_budget_setting()
 
         logger.info(f"Model (init): {self.model}")
         logger.info(f"Prompt Library File: {self.prompt_library_file}")
 
         if self.prompt_library_file:
-            with open(self.prompt_library_file, "r") as file:
-                data = json.load(file)
-                self.prompts = data.get("data", {})
-                self.update_prompt_list()
+            self.start_library_load(self.prompt_library_file)
 
-                # Now automatically go to the first item if there is one:
-                if self.prompt_list.count() > 0:
-                    first_item = self.prompt_list.item(0)
-                    self.prompt_list.setCurrentItem(first_item)
-                    self.prompt_file_header = data.get("header", {
-                        "app_name": "",
-                        "data_version": "",
-                        "file_type": ""
-                    })
-                    self.set_prompt(first_item)
+    def apply_trace_setting(self):
+        """Trace to crpm-trace.json next to the settings file when on in Settings; CRPM_TRACE takes precedence."""
+        if os.environ.get(TRACE_ENV):
+            return
+        if self.ini_handler.read_value('CRPromptManager', 'trace') == "True":
+            profile = self.ini_handler.read_value('CRPromptManager', 'trace_profile') == "True"
+            tracer.enable(Path(self.run_time.ini_file_name).resolve().parent / TRACE_FILE_NAME,
+                          DEFAULT_PROFILE_EVERY if profile else 0)
+        elif tracer.enabled:
+            tracer.export()
+            tracer.disable()
+
+    def apply_memory_budget_setting(self):
+        """Budget for the session's caches from Settings; CRPM_MEMORY_BUDGET_MB takes precedence."""
+        budget_mb = self.ini_handler.read_value('CRPromptManager', 'memory_budget_mb') or ""
+        if budget_mb.isdigit() and not os.environ.get(BUDGET_ENV):
+            memory_budget.limit = int(budget_mb) * 2**20
+
+    def show_memory_usage(self):
+        if self._dialog_memory is None:
+            from dialog_memory import MemoryDialog
+            self._dialog_memory = MemoryDialog(parent=self)
+        self._dialog_memory.show()
+        self._dialog_memory.raise_()
+
+    def export_trace(self):
+        if not tracer.enabled:
+            QMessageBox.information(self, "Performance Trace",
+                                    "Tracing is off. Turn it on in Settings > Diagnostics, "
+                                    f"or start the editor with {TRACE_ENV}=trace.json.")
+            return
+        file_path, _ = QFileDialog.getSaveFileName(self, "Export Performance Trace", str(tracer.path or TRACE_FILE_NAME),
+                                                   "Chrome Trace (*.json)")
+        if not file_path:
+            return
+        try:
+            path = tracer.export(file_path)
+        except OSError as e:
+            QMessageBox.critical(self, "Performance Trace", f"Could not write the trace: {e}")
+            return
+        self.update_status_bar(f"Trace written to {path}; open it in ui.perfetto.dev or chrome://tracing", 10000)
+
+    # Library loading methods
+    def start_library_load(self, file_path: str):
+        """Parse the library on a worker thread; prompt names are listed in batches as they arrive."""
+        self.cancel_library_load()
+        self.autosave_timer.stop()
+        if not self.autosave.writer.flush():
+            logger.warning(f"Autosave of {self.library.file_path} failed: {self.autosave.writer.status.error}")
+
+        self.current_prompt = None
+        self.library.file_path = Path(file_path)
+        self.library.prompts = {}
+        self.library_load_errors = []
+        self.library_load_base = LibrarySnapshot(signature=file_signature(file_path))
+        self.prompt_list.clear()
+        self.watch_library_file(file_path)
+
+        self.library_loader = LibraryLoader(file_path, parent=self)
+        for signal, slot in self.library_loader_connections(self.library_loader):
+            signal.connect(slot)
+        self.library_loader.start()
+        self.update_status_bar(f"Loading {file_path}...", 0)
+
+    def cancel_library_load(self):
+        loader, self.library_loader = self.library_loader, None
+        if loader is None:
+            return
+        if loader.isRunning():
+            loader.requestInterruption()
+            loader.wait()
+        # Batches it emitted may still be queued; the slots drop them, as they no longer come from library_loader
+        for signal, slot in self.library_loader_connections(loader):
+            signal.disconnect(slot)
+        loader.deleteLater()
+
+    def library_loader_connections(self, loader: LibraryLoader) -> list:
+        return [(loader.header_loaded, self.on_library_header_loaded),
+                (loader.batch_loaded, self.on_library_batch_loaded),
+                (loader.entry_failed, self.on_library_entry_failed),
+                (loader.load_failed, self.on_library_load_failed),
+                (loader.finished, self.on_library_load_finished)]
+
+    def is_library_loading(self) -> bool:
+        return self.library_loader is not None and self.library_loader.isRunning()
+
+    def from_current_loader(self) -> bool:
+        """Whether the signal being handled comes from the load in progress, not a cancelled one."""
+        return self.library_loader is not None and self.sender() is self.library_loader
+
+    def on_library_header_loaded(self, header: dict):
+        if not self.from_current_loader():
+            return
+        self.prompt_file_header = header
+        self.library_load_base.header = dict(header)
+
+    def on_library_batch_loaded(self, batch: list):
+        if not self.from_current_loader():
+            return
+        for name, data, fingerprint in batch:
+            self.library.update(name, data)
+            self.library_load_base.prompts[name] = self.library.prompts[name]  # share the compact record
+            self.library_load_base.fingerprints[name] = fingerprint
+        self.prompt_list.addItems([name for name, _, _ in batch])
+        self.update_status_bar(f"Loading {self.library.file_path}... {len(self.prompts)} prompts", 0)
+
+    def on_library_entry_failed(self, name: str, message: str):
+        if not self.from_current_loader():
+            return
+        self.library_load_errors.append((name, message))
+
+    def on_library_load_failed(self, message: str):
+        if not self.from_current_loader():
+            return
+        QMessageBox.critical(self, "Error", f"Failed to load prompts: {message}")
+
+    def on_library_load_finished(self):
+        if not self.from_current_loader():
+            return  # a cancelled load finishing late
+
+        self.library.load_errors = list(self.library_load_errors)
+        self.library_load_base.errors = list(self.library_load_errors)
+        self.library.base = self.library_load_base
+        self.library.saved_revision = self.library.revision
+        self.autosave_submitted_revision = None
+        self.update_prompt_list()  # final, sorted order
+
+        # Now automatically go to the first item if there is one:
+        if self.prompt_list.count() > 0:
+            first_item = self.prompt_list.item(0)
+            self.prompt_list.setCurrentItem(first_item)
+            self.set_prompt(first_item)
+
+        self.update_status_bar(f"Loaded {len(self.prompts)} prompts from {self.library.file_path}")
+
+        if self.library_load_errors:
+            details = "\n".join(f"{name}: {message}" for name, message in self.library_load_errors[:20])
+            if len(self.library_load_errors) > 20:
+                details += f"\n... and {len(self.library_load_errors) - 20} more"
+            QMessageBox.warning(
+                self,
+                "Malformed Prompts",
+                f"{len(self.library_load_errors)} prompt(s) could not be loaded and were skipped:\n\n{details}"
+            )
+
+        self.start_library_validation()
+
+    # Validation methods
+    def start_library_validation(self, show_report: bool = False):
+        """Validate a snapshot of the library on a worker thread; editing can go on meanwhile."""
+        if self.validation_running:
+            return
+        from cp_validate import LibraryValidator
+
+        prompts = dict(self.library.prompts)
+        load_errors = list(self.library.load_errors)
+        models = self.run_time.get_runtime_variable(MODEL_ATTRIBUTES_FULL) or None
+        validator = LibraryValidator(prompts, models, self.model)
+        self.validation_running = True
+
+        def task(**kwargs):
+            return validator.validate(load_errors)
+
+        def on_finish(report):
+            self.validation_running = False
+            self.validation_report = report
+            logger.info(report.summary())
+            if report.issues:
+                self.update_status_bar(f"Library validation: {len(report.errors)} error(s), "
+                                       f"{len(report.warnings)} warning(s)", 10000)
+            if show_report:
+                self.show_validation_report()
+
+        def on_error(error_info):
+            exception, tb = error_info
+            self.validation_running = False
+            logger.error(f"Library validation failed: {exception}")
+
+        run_in_thread(task, on_finish=on_finish, on_error=on_error, parent=self)
+
+    def validate_library(self):
+        if self.current_prompt:
+            self.update_current_prompt_data()
+        self.start_library_validation(show_report=True)
+
+    def show_validation_report(self):
+        from dialog_validation import ValidationDialog
+
+        dialog = ValidationDialog(self.validation_report, parent=self)
+        dialog.prompt_selected.connect(self.select_prompt_by_name)
+        dialog.exec()
+
+    def select_prompt_by_name(self, prompt_name: str):
+        items = self.prompt_list.findItems(prompt_name, Qt.MatchFlag.MatchExactly)
+        if items:
+            self.prompt_list.setCurrentItem(items[0])
+            self.set_prompt(items[0])
+
+    # External change methods
+    def watch_library_file(self, file_path: str):
+        """Watch the file and its folder; editors and git often replace the file rather than write it."""
+        watched = self.library_watcher.files() + self.library_watcher.directories()
+        if watched:
+            self.library_watcher.removePaths(watched)
+        self.library_watcher.addPath(str(file_path))
+        self.library_watcher.addPath(str(Path(file_path).parent))
+
+    def on_library_file_changed(self, path: str):
+        library_file = str(self.library.file_path) if self.library.file_path else None
+        if library_file and library_file not in self.library_watcher.files() and Path(library_file).exists():
+            self.library_watcher.addPath(library_file)  # re-arm after an atomic replace
+        self.library_change_timer.start()
+
+    def check_library_changes(self):
+        """Read the changed file on a worker thread, then merge it on the GUI thread."""
+        if self.is_library_loading() or self.library_change_check_running or not self.library.changed_on_disk():
+            return
+
+        file_path = self.library.file_path
+        self.library_change_check_running = True
+
+        def task(**kwargs):
+            return read_snapshot(file_path)
+
+        def on_finish(theirs):
+            self.library_change_check_running = False
+            if file_path == self.library.file_path and not self.is_library_loading():
+                self.apply_disk_changes(theirs)
+
+        def on_error(error_info):
+            exception, tb = error_info
+            self.library_change_check_running = False
+            logger.warning(f"Could not read changed library {file_path}: {exception}")
+
+        run_in_thread(task, on_finish=on_finish, on_error=on_error, parent=self)
+
+    def apply_disk_changes(self, theirs: LibrarySnapshot):
+        """Merge the disk version into memory, asking only about prompts changed on both sides."""
+        if self.current_prompt:
+            self.update_current_prompt_data()  # include unsaved edits in "ours"
+
+        result = self.library.merge_from_disk(theirs)
+        for name, (ours, disk) in result.conflicts.items():
+            self.library.resolve_conflict(name, ours if self.ask_keep_mine(name, ours, disk) else disk)
+
+        if not result.changed:
+            return
+
+        self.update_prompt_list()
+        if self.current_prompt in self.library:
+            self.reload_current_prompt()
+        elif self.prompt_list.count() > 0:
+            self.current_prompt = None
+            self.prompt_list.setCurrentItem(self.prompt_list.item(0))
+            self.set_prompt(self.prompt_list.item(0))
+
+        self.update_status_bar(
+            f"Library changed on disk: {len(result.taken)} prompt(s) updated, {len(result.conflicts)} conflict(s)")
+        self.schedule_autosave()
+
+    def ask_keep_mine(self, name: str, ours, disk) -> bool:
+        ours_state = "deleted" if ours is None else "edited"
+        disk_state = "deleted" if disk is None else "changed"
+        box = QMessageBox(self)
+        box.setIcon(QMessageBox.Icon.Warning)
+        box.setWindowTitle("Prompt Changed on Disk")
+        box.setText(f"The prompt '{name}' was {ours_state} here and {disk_state} in the library file.")
+        keep_mine = box.addButton("Keep Mine", QMessageBox.ButtonRole.AcceptRole)
+        box.addButton("Use Disk Version", QMessageBox.ButtonRole.RejectRole)
+        box.exec()
+        return box.clickedButton() is keep_mine
+
+    # Autosave methods
+    def schedule_autosave(self, *args):
+        if self.autosave_enabled:
+            self.autosave_timer.start()
+
+    def submit_autosave(self):
+        """Take the editor fields into the library and queue the library for the background writer."""
+        if not self.autosave_enabled or self.is_library_loading() or not self.library.file_path:
+            return
+        if self.current_prompt:
+            self.update_current_prompt_data(warn=False)
+        if not self.library.dirty or self.library.revision == self.autosave_submitted_revision:
+            return
+        if self.library.load_errors:
+            self.autosave_label.setText("Autosave paused: malformed prompts were skipped, save manually")
+            return
+
+        self.library.backup_original()
+        self.autosave.writer.submit(self.library)
+        self.autosave_submitted_revision = self.library.revision
+
+    def on_autosave_saved(self, saved):
+        if saved.job.file_path == self.library.file_path:
+            self.library.mark_saved(saved.job.revision, saved.job.header, saved.job.prompts, saved.signature,
+                                    saved.content)
+
+    def on_autosave_status(self, status):
+        if status.conflict:
+            self.autosave_label.setText("Autosave: library changed on disk, merging")
+            self.autosave_submitted_revision = None
+            self.library_change_timer.start()  # merge, then the merged library is autosaved
+        elif status.error:
+            self.autosave_label.setText(f"Autosave failed, retrying: {status.error}")
+        elif status.writing:
+            self.autosave_label.setText("Autosave: saving...")
+        elif status.pending:
+            self.autosave_label.setText(f"Autosave: {status.pending} change(s) pending")
+        elif status.saved_at is not None:
+            self.autosave_label.setText(f"Autosaved {time.strftime('%H:%M:%S', time.localtime(status.saved_at))}")
+        else:
+            self.autosave_label.setText("Autosave on")
 
     # Status bar methods
     def update_status_bar(self, message="Welcome to ChatRecall Prompt Manager", duration=5000):
@@ -578,9 +1028,7 @@ class PromptEditor(QMainWindow):
     def select_system_prompt(self, state):
         self.toggle_system_prompt()
         if state == 2:  # Qt.Checked
-            system_prompts = [
-                name for name, data in self.prompts.items()
-                if data.get("type") == "system"]
+            system_prompts = self.library.names(prompt_type="system")
             self.custom_system_prompt_input.clear()
             self.custom_system_prompt_input.addItems(system_prompts)
         else:
@@ -606,6 +1054,18 @@ class PromptEditor(QMainWindow):
             placeholder = wrap_format.format(text.strip())
             cursor.insertText(placeholder)
 
+    def update_placeholder_summary(self):
+        self.placeholder_summary.setText(self.prompt_highlighter.index.summary())
+        self.update_editor_mode_label()
+
+    def update_editor_mode_label(self):
+        """Large prompts are edited as plain text; show that and how fast typing is."""
+        self.editor_mode_label.setVisible(self.prompt_field.large)
+        if self.prompt_field.large:
+            size = len(self.prompt_field.text()) / 1e6
+            self.editor_mode_label.setText(f"Large prompt ({size:.1f} MB), plain text mode")
+            self.editor_mode_label.setToolTip(self.keystroke_latency.summary())
+
     # Tab methods
     def toggle_response_tab(self, state):
         self.tab_widget.setTabVisible(2, state ==2) # 2 means checked, 0 means unchecked
@@ -614,7 +1074,8 @@ class PromptEditor(QMainWindow):
         pass
 
     def on_tab_changed(self, index):
-        pass
+        if self.tab_widget.widget(index) is self.notes_tab:
+            self.notes_field.load()
 
     def on_prompt_type_changed(self, prompt_type: str):
         is_system = prompt_type == "system"
@@ -630,8 +1091,12 @@ class PromptEditor(QMainWindow):
     def new_prompt(self):
         prompt_name, ok = QInputDialog.getText(self, "New Prompt", "Enter prompt name:")
         if ok and prompt_name:
-            self.prompts[prompt_name] = {"prompt_text": "", "default_attributes": {}}
+            if prompt_name in self.library:
+                QMessageBox.warning(self, "Name Exists", f"A prompt named '{prompt_name}' already exists.")
+                return
+            self.library.add(prompt_name)
             self.update_prompt_list()
+            self.schedule_autosave()
 
             # Find the just-added prompt by its text
             items = self.prompt_list.findItems(prompt_name, Qt.MatchFlag.MatchExactly)
@@ -656,22 +1121,33 @@ class PromptEditor(QMainWindow):
         if new_name == current_name:
             return  # No change
 
-        if new_name in self.prompts:
+        if new_name in self.library:
             QMessageBox.warning(self, "Name Exists", f"A prompt named '{new_name}' already exists.")
             return
 
-        # Perform the rename
-        self.prompts[new_name] = self.prompts.pop(current_name)
-        self.current_prompt = new_name
+        # Perform the rename; prompts using it as their custom system prompt or including it are updated too
+        self.update_current_prompt_data()
+        was_current = self.current_prompt == current_name
+        dependents = self.library.rename(current_name, new_name)
+        if was_current:
+            self.current_prompt = new_name
         self.update_prompt_list()
 
         # Reselect the renamed item
         items = self.prompt_list.findItems(new_name, Qt.MatchFlag.MatchExactly)
         if items:
             self.prompt_list.setCurrentItem(items[0])
+        if self.current_prompt in dependents or self.current_prompt == new_name:
+            self.reload_current_prompt()
 
-        self.update_status_bar(f"Renamed '{current_name}' to '{new_name}'")
+        self.schedule_autosave()
 
+        message = f"Renamed '{current_name}' to '{new_name}'"
+        if dependents:
+            message += f", updated {len(dependents)} prompt(s) that reference it"
+        self.update_status_bar(message)
+
+    @traced("editor.set_prompt", "editor")
     def set_prompt(self, item):
         """Switch to a selected prompt while saving the current one."""
         if self.current_prompt:
@@ -681,13 +1157,15 @@ class PromptEditor(QMainWindow):
         self.current_prompt = prompt_name
         prompt_data = self.prompts.get(prompt_name, {})
 
-        self.prompt_text.setText(prompt_data.get("prompt_text", ""))
+        self.prompt_field.set_text(prompt_data.get("prompt_text", ""))
         self.prompt_type.setCurrentText(prompt_data.get("type", "user"))
         self.prompt_subtype.setCurrentText(prompt_data.get("subtype", "query"))
-        self.prompt_notes.setText(prompt_data.get("notes", ""))
+        self.notes_field.set_text(prompt_data.get("notes", ""),
+                                  load=self.tab_widget.currentWidget() is self.notes_tab)
         attributes = prompt_data.get("default_attributes", {})
         self.system_prompt_use.setChecked(prompt_data.get("prompt_system_use", False))
         self.system_prompt_input.setText((prompt_data.get("prompt_system_text", DEFAULT_SYSTEM_PROMPT)))
+        self.stable_prefix_use.setChecked(prompt_data.get("prompt_layout") == LAYOUT_STABLE_PREFIX)
 
         def set_value_and_checkbox(field, checkbox, value, default):
             checkbox.setChecked(value is not None)
@@ -748,22 +1226,33 @@ class PromptEditor(QMainWindow):
         #         venice_params["response_format"], indent=4
         #     ))
 
+    def reload_current_prompt(self):
+        """Refresh the editor fields from the stored prompt without writing the fields back first."""
+        items = self.prompt_list.findItems(self.current_prompt, Qt.MatchFlag.MatchExactly) if self.current_prompt else []
+        self.current_prompt = None
+        if items:
+            self.prompt_list.setCurrentItem(items[0])
+            self.set_prompt(items[0])
+
     def update_prompt_list(self):
         self.prompt_list.clear()
         # for key in self.prompts:
         #     self.prompt_list.addItem(key)
-        for key in sorted(list(self.prompts.keys()), key=lambda k: k.casefold()):
+        for key in self.library.names():
             self.prompt_list.addItem(key)
 
-    def update_current_prompt_data(self):
+    @traced("editor.update_current_prompt_data", "editor")
+    def update_current_prompt_data(self, warn: bool = True):
         """Update the currently selected prompt data from UI elements."""
         if not self.current_prompt:
             return
 
         try:
-            response_format_data = json.loads(self.response_format_input.toPlainText() or "{}")
+            with span("schema.parse", "schema"):
+                response_format_data = json.loads(self.response_format_input.toPlainText() or "{}")
         except json.JSONDecodeError:
-            QMessageBox.warning(self, "Invalid JSON", "Response format must be valid JSON.")
+            if warn:
+                QMessageBox.warning(self, "Invalid JSON", "Response format must be valid JSON.")
             return
 
         default_attributes = {}
@@ -812,15 +1301,18 @@ class PromptEditor(QMainWindow):
             if self.include_venice_params.isChecked() and venice_parameters:
                 default_attributes["venice_parameters"] = venice_parameters
 
-        self.prompts[self.current_prompt] = {
-            "prompt_text": self.prompt_text.toPlainText(),
+        prompt_data = {
+            "prompt_text": self.prompt_field.text(),
             "type": self.prompt_type.currentText(),
             "subtype": self.prompt_subtype.currentText(),
-            "notes": self.prompt_notes.toPlainText(),
+            "notes": self.notes_field.text(),
             "default_attributes": default_attributes,
             "prompt_system_use": self.system_prompt_use.isChecked(),
             "prompt_system_text": self.system_prompt_input.text(),
         }
+        if self.stable_prefix_use.isChecked():
+            prompt_data["prompt_layout"] = LAYOUT_STABLE_PREFIX
+        self.library.update(self.current_prompt, prompt_data)
 
     def delete_prompt(self, item=None):
         """Delete the selected prompt after confirmation."""
@@ -832,24 +1324,33 @@ class PromptEditor(QMainWindow):
             return
 
         prompt_name = item.text()
+        question = f"Are you sure you want to delete the prompt '{prompt_name}'?"
+        dependents = [name for name in self.library.referrers(prompt_name) if name != prompt_name]
+        if dependents:
+            listed = "\n".join(dependents[:10]) + ("\n..." if len(dependents) > 10 else "")
+            question += (f"\n\nIt is the custom system prompt of {len(dependents)} prompt(s), "
+                         f"which will stop using it:\n{listed}")
         confirm = QMessageBox.question(
             self,
             "Delete Prompt",
-            f"Are you sure you want to delete the prompt '{prompt_name}'?",
+            question,
             QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
         )
 
         if confirm == QMessageBox.StandardButton.Yes:
             # Remove from data and UI
-            if prompt_name in self.prompts:
-                del self.prompts[prompt_name]
+            if self.current_prompt and self.current_prompt != prompt_name:
+                self.update_current_prompt_data()
+            self.library.delete(prompt_name, detach_references=True)
             self.update_prompt_list()
+            if self.current_prompt in dependents:
+                self.reload_current_prompt()
 
             # If the deleted prompt was active, clear or switch
             if self.current_prompt == prompt_name:
                 self.current_prompt = None
-                self.prompt_text.clear()
-                self.prompt_notes.clear()
+                self.prompt_field.clear()
+                self.notes_field.clear()
                 # You may want to clear other fields too
 
                 # Automatically select the first available prompt
@@ -858,46 +1359,62 @@ class PromptEditor(QMainWindow):
                     self.prompt_list.setCurrentItem(first_item)
                     self.set_prompt(first_item)
 
+            self.schedule_autosave()
             self.update_status_bar(f"Deleted prompt '{prompt_name}'")
 
     # IO methods
     def load_prompts_from_file(self):
-        file_path, _ = QFileDialog.getOpenFileName(self, "Open Prompt File", "", "JSON Files (*.json)")
+        file_path, _ = QFileDialog.getOpenFileName(self, "Open Prompt File", "", "Prompt Libraries (*.json *.crpl)")
         if file_path:
             self.prompt_library_file = file_path
-            with open(file_path, "r") as file:
-                data = json.load(file)
-                self.prompts = data.get("data", {})
-                self.update_prompt_list()
+            self.start_library_load(file_path)
 
+    @traced("editor.save_prompts", "editor")
     def save_prompts(self):
         """Save the current prompt and write all prompts to a JSON file."""
+        if self.is_library_loading():
+            QMessageBox.warning(self, "Loading", "Please wait until the prompt library has finished loading.")
+            return
+
         if not self.current_prompt:
             QMessageBox.warning(self, "Warning", "No prompt selected to save.")
             return
 
         # Ensure the current prompt data is updated in memory
         self.update_current_prompt_data()
-        print(self.prompts[self.current_prompt])
+
+        if self.library.load_errors:
+            confirm = QMessageBox.question(
+                self,
+                "Malformed Prompts",
+                f"{len(self.library.load_errors)} malformed prompt(s) were skipped when loading and will be "
+                f"removed from the file. Save anyway?",
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+            )
+            if confirm != QMessageBox.StandardButton.Yes:
+                return
+            self.library.load_errors = []
+
+        # Merge changes made on disk since the last load or save instead of overwriting them
+        if self.prompt_library_file and self.library.changed_on_disk():
+            try:
+                self.apply_disk_changes(read_snapshot(self.library.file_path))
+            except Exception as e:
+                QMessageBox.critical(self, "Error", f"Failed to read changes on disk: {e}")
+                return
 
         # If no file is currently loaded, ask the user where to save
         if not self.prompt_library_file:
-            file_path, _ = QFileDialog.getSaveFileName(self, "Save Prompt File", "", "JSON Files (*.json)")
+            file_path, _ = QFileDialog.getSaveFileName(self, "Save Prompt File", "", "Prompt Libraries (*.json *.crpl)")
             if not file_path:  # User canceled
                 return
             self.prompt_library_file = file_path
 
         try:
-            # Backup json file
-            backup = FileBackupManager(self.prompt_library_file)
-            backup.backup_current_file()
-
-            # ✅ Write header and prompts to JSON file
-            with open(self.prompt_library_file, "w", encoding="utf-8") as file:
-                json.dump({
-                    "header": self.prompt_file_header,
-                    "data": self.prompts
-                }, file, indent=4)
+            # ✅ Backup json file, then write header and prompts to JSON file
+            with self.autosave.writer.paused():  # this save includes the edits autosave has queued
+                self.library.save(self.prompt_library_file)
+            self.watch_library_file(self.prompt_library_file)
 
             self.update_status_bar(f"Prompts saved successfully to {self.prompt_library_file}")
         except Exception as e:
@@ -915,54 +1432,136 @@ class PromptEditor(QMainWindow):
         # 🔧 Ensure updated UI values are saved before we load them
         self.update_current_prompt_data()
 
-        prompt_data = self.prompts.get(self.current_prompt, {})
-        # attributes = prompt_data.get("default_attributes", {})
-        attributes = dict(prompt_data.get("default_attributes", {}))  # shallow copy
-
-        prompt_text = self.prompt_text.toPlainText()
-
-        # Get system prompt separately
-        if self.system_prompt_use.isChecked():
-            system_prompt = self.system_prompt_input.text()
-        else:
-            system_prompt = DEFAULT_SYSTEM_PROMPT
-
-        # Strip system_prompt out of default_attributes if it got added (for safety)
-        attributes.pop("system_prompt", None)
-
-        # 🧠 Extract Venice Parameters and custom prompt name
-        custom_system_prompt_name = attributes.pop("custom_system_prompt_name", None)
-        venice_raw = attributes.get("venice_parameters", {})
-
-        # ✅ Only pass allowed keys into VeniceParameters
-        attributes["venice_parameters"] = VeniceParameters(**venice_raw)
-
-        # 🧠 Apply custom system prompt if needed
-        if custom_system_prompt_name and venice_raw.get("include_venice_system_prompt"):
-            selected = self.prompts.get(custom_system_prompt_name)
-            if selected and selected.get("type") == "system":
-                system_prompt = selected.get("prompt_text", system_prompt)
-            else:
-                QMessageBox.warning(
-                    self,
-                    "Invalid System Prompt",
-                    f"Selected prompt '{custom_system_prompt_name}' is not a valid system prompt."
-                )
-                return
+        # 🧠 System prompt, custom system prompt and Venice parameters are resolved by the core
+        try:
+            settings = resolve_run_settings(self.prompts, self.current_prompt, self.library.includes)
+        except ValueError as e:
+            QMessageBox.warning(self, "Cannot Run Prompt", str(e))
+            return
 
-        logger.info(f"System Prompt:\n{system_prompt}")
+        logger.info(f"System Prompt:\n{settings.system_prompt}")
 
+        from dialog_prompt_runner import PromptRunDialog
         dialog = PromptRunDialog(
             api_key=self.api_key,
             model=self.model,
-            prompt_text=prompt_text,
+            prompt_text=settings.prompt_text,
             response_type=response_type,
-            system_prompt=system_prompt,
-            attributes=attributes,
+            system_prompt=settings.system_prompt,
+            attributes=settings.attributes,
+            layout=settings.layout,
+            file_reader=self.file_reader(),
+            prompt_name=self.current_prompt,
+            prompt_version=prompt_version(self.prompts[self.current_prompt]),
+            history=self.run_history,
+            model_catalog=self.model_catalog,
+            # Placeholders come from the editor's live index unless includes add more
+            template_fields=None if self.prompt_highlighter.index.counts(KIND_INCLUDE)
+            else self.prompt_highlighter.index.fields(),
             parent=self
         )
         dialog.exec()
 
+    def run_sweep(self):
+        if self.prompt_type.currentText() == "system":
+            QMessageBox.warning(self, "System Prompt Selected", "Please select a user prompt to sweep.")
+            return
+
+        if not self.current_prompt:
+            QMessageBox.warning(self, "No Prompt Selected", "Please select a prompt to sweep.")
+            return
+
+        self.update_current_prompt_data()
+        try:
+            settings = resolve_run_settings(self.prompts, self.current_prompt, self.library.includes)
+        except ValueError as e:
+            QMessageBox.warning(self, "Cannot Run Prompt", str(e))
+            return
+
+        # Every request of the sweep gets the same placeholder values, asked for once
+        from cp_render import get_placeholders, get_file_placeholders, strip_output_placeholders
+        from dialog_placeholder import PlaceholderDialog
+        prompt_text = strip_output_placeholders(settings.prompt_text)
+        values = {}
+        placeholders, file_placeholders = get_placeholders(prompt_text), get_file_placeholders(prompt_text)
+        if placeholders or file_placeholders:
+            placeholder_dialog = PlaceholderDialog(placeholders, file_placeholders, parent=self)
+            if placeholder_dialog.exec() != QDialog.DialogCode.Accepted:
+                return
+            values = placeholder_dialog.values
+
+        from dialog_sweep import SweepDialog
+        dialog = SweepDialog(self.api_key, self.model, settings, values, file_reader=self.file_reader(),
+                             prompt_name=self.current_prompt,
+                             prompt_version=prompt_version(self.prompts[self.current_prompt]),
+                             history=self.run_history, parent=self)
+        dialog.exec()
+
+    @property
+    def run_history(self):
+        """The local run history store, opened on first use; None if it cannot be opened."""
+        if self._run_history is None:
+            from cp_history import RunHistory, default_history_path
+            try:
+                self._run_history = RunHistory(default_history_path())
+            except Exception as e:
+                logger.error(f"Run history unavailable: {e}")
+                return None
+        return self._run_history
+
+    def show_history(self):
+        if self.run_history is None:
+            QMessageBox.warning(self, "Run History", "The run history store could not be opened.")
+            return
+        from dialog_history import HistoryDialog
+        HistoryDialog(self.run_history, prompt_name=self.current_prompt, parent=self).exec()
+
+    def show_analytics(self):
+        if self.run_history is None:
+            QMessageBox.warning(self, "Analytics", "The run history store could not be opened.")
+            return
+        from dialog_analytics import AnalyticsDialog
+        AnalyticsDialog(self.run_history, parent=self).exec()
+
+    def file_reader(self):
+        """
+        Reader for file placeholders: in-process, or in worker processes if set in Settings.
+        Extracted text is kept for the session until the file changes.
+        """
+        reader = read_file_placeholder
+        if self.isolated_file_extraction:
+            if self._file_extractor is None:
+                from cp_extract import FileExtractor
+                self._file_extractor = FileExtractor()
+            reader = self._file_extractor
+        if self._cached_file_reader is None or self._cached_file_reader.reader is not reader:
+            from cp_extract import CachedFileReader
+            self._cached_file_reader = CachedFileReader(reader)
+        return self._cached_file_reader
+
+    def run_pipeline(self):
+        if self.is_library_loading():
+            QMessageBox.warning(self, "Loading", "Please wait until the prompt library has finished loading.")
+            return
+        if self.current_prompt:
+            self.update_current_prompt_data()
+
+        file_path, _ = QFileDialog.getOpenFileName(self, "Open Pipeline File", "", "JSON Files (*.json)")
+        if not file_path:
+            return
+
+        from cp_pipeline import Pipeline
+        try:
+            pipeline = Pipeline.from_file(file_path)
+        except (OSError, ValueError) as e:
+            QMessageBox.warning(self, "Invalid Pipeline", f"Could not load {file_path}:\n{e}")
+            return
+
+        from dialog_pipeline import PipelineRunDialog
+        dialog = PipelineRunDialog(self.library, self.api_key, self.model, pipeline,
+                                   title=f"Run Pipeline - {Path(file_path).name}", parent=self)
+        dialog.exec()
+
     # Dialogs
     def show_about(self):
         self.dialog_about.show()
@@ -992,22 +1591,17 @@ class PromptEditor(QMainWindow):
     def show_output_dialog(self):
         self.update_current_prompt_data()
         prompt_data = self.prompts.get(self.current_prompt, {})
-        prompt_text = prompt_data.get("prompt_text", "")
         attributes = prompt_data.get("default_attributes", {})
 
         # Get any existing schema from response_format
         existing_schema = attributes.get("response_format") if isinstance(attributes.get("response_format"),
                                                                           dict) else None
 
-        # Extract output fields from prompt
-        prompt_template = PromptTemplate(
-            type=prompt_data.get("type", "user"),
-            subtype=prompt_data.get("subtype", ""),
-            prompt_text=prompt_text
-        )
-        output_fields = prompt_template.get_output_placeholders()
+        # Output fields from the editor's live placeholder index
+        output_fields = list(self.prompt_highlighter.index.fields().output_placeholders)
         logger.info(f"Extracted output fields: {output_fields}")
 
+        from dialog_output_format import OutputFieldDialog
         dialog = OutputFieldDialog(field_names=output_fields, existing_schema=existing_schema)
         if dialog.exec():
             updated_schema_json = dialog.updated_schema_json
@@ -1017,11 +1611,52 @@ class PromptEditor(QMainWindow):
             # self.response_format_use.setChecked(True)
 
     # Other methods
+    def closeEvent(self, event):
+        # Pending edits must be on disk before the window closes
+        self.autosave_timer.stop()
+        if self.autosave_enabled:
+            self.submit_autosave()
+        if not self.autosave.writer.flush():
+            confirm = QMessageBox.question(
+                self,
+                "Autosave Failed",
+                f"Your latest changes could not be saved:\n{self.autosave.writer.status.error}\n\n"
+                f"Close anyway and lose them?",
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+            )
+            if confirm != QMessageBox.StandardButton.Yes:
+                event.ignore()
+                return
+        self.autosave.writer.close()
+
+        if self._run_history is not None:
+            self._run_history.close()
+        self.library_change_timer.stop()
+        self.cancel_library_load()
+        self.library.flush_backups()
+        if tracer.enabled:
+            try:
+                tracer.export()
+            except OSError as e:
+                logger.error(f"Could not write trace to {tracer.path}: {e}")
+        super().closeEvent(event)
+
     def show_not_implemented_dialog(self):
         QMessageBox.information(self, "Not Implemented", "This feature is not yet implemented.", QMessageBox.StandardButton.Ok)
 
 
 if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format = '%(name)s - %(levelname)s - %(message)s (line: %(lineno)d)',
+        handlers=[
+            logging.StreamHandler(),  # Log to console
+            # logging.FileHandler('app.log')  # Log to file
+        ]
+    )
+
+    configure_from_env()
+
     app = QApplication(sys.argv)
     window = PromptEditor()
     window.show()
@@ -0,0 +1,128 @@
+# model_catalog.py
+
+from typing import Optional
+
+from PySide6.QtCore import QObject, Signal
+import logging
+
+# Logger Configuration
+logger = logging.getLogger(__name__)
+
+from WrapSideSix import run_in_thread
+
+from cp_core import (MODEL_ATTRIBUTES_FULL, CatalogDiff, fetch_model_catalog, store_runtime_models,
+                     update_model_combo_list)
+
+
+class ModelCatalog(QObject):
+    """
+    The model catalog shared by the editor and its dialogs, held in RuntimeConfig as before.
+    Fetches run on a worker thread, one at a time; a request made meanwhile runs next, the newest
+    one replacing older ones. Attached comboboxes follow the catalog: when a fetch returns,
+    only the models added, removed or changed are applied to them, keeping their selection.
+
+    ``check_key`` fetches with a key that is not saved yet and reports whether it works.
+    """
+    refreshing_changed = Signal(bool)
+    catalog_changed = Signal(object)      # cp_core.CatalogDiff
+    refresh_failed = Signal(str)
+    key_checked = Signal(str, bool, str)  # api_key, valid, message
+
+    def __init__(self, run_time, parent=None):
+        super().__init__(parent)
+        self.run_time = run_time
+        self._fetching: Optional[str] = None  # api key of the fetch in progress
+        self._check_fetching = False
+        self._queued: Optional[tuple[str, bool]] = None
+        self._comboboxes = {}
+
+    @property
+    def models(self) -> dict:
+        return self.run_time.get_runtime_variable(MODEL_ATTRIBUTES_FULL) or {}
+
+    @property
+    def refreshing(self) -> bool:
+        return self._fetching is not None
+
+    def refresh(self, api_key, force: bool = True):
+        """Fetch the catalog in the background; without ``force`` only if none is loaded yet."""
+        if not api_key or (not force and self.models):
+            return
+        self._request(api_key, check=False)
+
+    def check_key(self, api_key):
+        """Fetch with ``api_key`` in the background and emit key_checked; a catalog it returns is kept."""
+        if api_key:
+            self._request(api_key, check=True)
+
+    def attach(self, combobox, current_model=None):
+        """
+        Fill ``combobox`` from the catalog and keep it up to date until it is destroyed;
+        ``current_model`` is selected when the combobox has no selection the catalog still has.
+        """
+        update_model_combo_list(combobox, self.models, current_model)
+        key = id(combobox)
+        if key not in self._comboboxes:
+            combobox.destroyed.connect(lambda *args: self._comboboxes.pop(key, None))
+        self._comboboxes[key] = (combobox, current_model)
+
+    # Fetch methods
+    def _request(self, api_key, check: bool):
+        if self._fetching == api_key and self._queued is None:
+            self._check_fetching |= check
+            return
+        if self._fetching is not None:
+            queued_check = self._queued is not None and self._queued[0] == api_key and self._queued[1]
+            self._queued = (api_key, check or queued_check)
+            return
+        self._start(api_key, check)
+
+    def _start(self, api_key, check: bool):
+        started = self._fetching is None
+        self._fetching, self._check_fetching = api_key, check
+        if started:
+            self.refreshing_changed.emit(True)
+
+        def task(**kwargs):
+            return fetch_model_catalog(api_key)
+
+        def on_finish(full):
+            check_fetching = self._check_fetching
+            if full:
+                self._apply(store_runtime_models(self.run_time, full))
+                if check_fetching:
+                    self.key_checked.emit(api_key, True, f"{len(full)} models available")
+            else:
+                self._failed(api_key, check_fetching, "No models were returned")
+            self._next()
+
+        def on_error(error_info):
+            exception, tb = error_info
+            self._failed(api_key, self._check_fetching, str(exception))
+            self._next()
+
+        run_in_thread(task, on_finish=on_finish, on_error=on_error, parent=self)
+
+    def _apply(self, diff: CatalogDiff):
+        if diff:
+            models = self.models
+            for combobox, current_model in list(self._comboboxes.values()):
+                update_model_combo_list(combobox, models, current_model)
+        self.catalog_changed.emit(diff)
+
+    def _failed(self, api_key, check: bool, message: str):
+        if check:
+            logger.warning(f"API key check failed: {message}")
+            self.key_checked.emit(api_key, False, message)
+        else:
+            logger.error(f"Model catalog refresh failed: {message}")
+            self.refresh_failed.emit(message)
+
+    def _next(self):
+        if self._queued is not None:
+            api_key, check = self._queued
+            self._queued = None
+            self._start(api_key, check)
+        else:
+            self._fetching, self._check_fetching = None, False
+            self.refreshing_changed.emit(False)
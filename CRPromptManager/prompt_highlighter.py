@@ -0,0 +1,103 @@
+# prompt_highlighter.py
+
+from PySide6.QtGui import QSyntaxHighlighter, QTextCharFormat, QColor, QFont, QTextDocument
+from PySide6.QtCore import Signal
+import logging
+
+# Logger Configuration
+logger = logging.getLogger(__name__)
+
+from cp_placeholders import (PlaceholderIndex, scan_line,
+                             KIND_TEXT, KIND_FILE, KIND_OUTPUT, KIND_INCLUDE)
+
+KIND_COLORS = {
+    KIND_TEXT: "#1565c0",
+    KIND_FILE: "#2e7d32",
+    KIND_OUTPUT: "#6a1b9a",
+    KIND_INCLUDE: "#ef6c00",
+}
+UNMATCHED_COLOR = "#c62828"
+
+
+def _format(color: str, bold: bool = True) -> QTextCharFormat:
+    text_format = QTextCharFormat()
+    text_format.setForeground(QColor(color))
+    if bold:
+        text_format.setFontWeight(QFont.Weight.Bold)
+    return text_format
+
+
+class PlaceholderHighlighter(QSyntaxHighlighter):
+    """
+    Colours placeholders by kind and marks unmatched delimiters. Qt re-highlights only the
+    blocks an edit touched; the same edits keep ``index`` (a cp_placeholders.PlaceholderIndex)
+    up to date, re-lexing only the changed blocks.
+    """
+    index_changed = Signal()
+
+    def __init__(self, document: QTextDocument):
+        super().__init__(document)
+        self.formats = {kind: _format(color) for kind, color in KIND_COLORS.items()}
+        self.unmatched_format = _format(UNMATCHED_COLOR)
+        self.unmatched_format.setUnderlineStyle(QTextCharFormat.UnderlineStyle.WaveUnderline)
+        self.unmatched_format.setUnderlineColor(QColor(UNMATCHED_COLOR))
+
+        self.text_document = document  # kept while highlighting is off
+        self.index = PlaceholderIndex(document.toPlainText())
+        self._following = True
+        document.contentsChange.connect(self.on_contents_change)
+
+    def set_document_text(self, editor, text: str, highlight: bool = True):
+        """
+        Load ``text`` into ``editor`` and index it from the string rather than the document.
+        With ``highlight=False`` placeholders are indexed but not coloured, for very large texts.
+        """
+        if not highlight:
+            self.setDocument(None)
+        self._following = False
+        try:
+            editor.setPlainText(text)
+        finally:
+            self._following = True
+        if highlight and self.document() is None:
+            self.setDocument(self.text_document)  # after loading, so only the new text is highlighted
+        self.index.reset(text)
+        if self.index.line_count != self.text_document.blockCount():
+            self.index.reset(self.text_document.toPlainText())  # the editor split lines differently (\r, U+2029)
+        self.index_changed.emit()
+
+    def highlightBlock(self, text: str):
+        scan = scan_line(text)
+        for token in scan.tokens:
+            self.setFormat(token.start, token.end - token.start, self.formats[token.kind])
+        for start, length in scan.unmatched:
+            self.setFormat(start, length, self.unmatched_format)
+
+    def on_contents_change(self, position: int, removed: int, added: int):
+        """Re-lex the blocks from the one containing ``position`` to the end of the insertion."""
+        if not self._following:
+            return
+        document = self.text_document
+        block_count = document.blockCount()
+        first_block = document.findBlock(position)
+        last_block = document.findBlock(position + added)
+        if not first_block.isValid():
+            self.index.reset(document.toPlainText())
+            self.index_changed.emit()
+            return
+        if not last_block.isValid():
+            last_block = document.lastBlock()
+
+        first = first_block.blockNumber()
+        last = last_block.blockNumber()
+        old_lines = (last - first + 1) - (block_count - self.index.line_count)
+        if old_lines < 1 or first + old_lines > self.index.line_count:
+            self.index.reset(document.toPlainText())  # not a change the index can follow
+        else:
+            lines = []
+            block = first_block
+            while block.isValid() and block.blockNumber() <= last:
+                lines.append(block.text())
+                block = block.next()
+            self.index.replace_lines(first, old_lines, lines)
+        self.index_changed.emit()